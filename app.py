@@ -6,7 +6,7 @@ from datetime import datetime
 # Ensure project root is in path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "src")))
 
-from cbc_bot import CBCEngine, KnowledgeBase, Config
+from cbc_bot import CBCEngine, Config
 
 # Initialize Engine
 @st.cache_resource
@@ -165,15 +165,17 @@ with st.sidebar:
     """, unsafe_allow_html=True)
     
     if st.button("🗑️ Clear Conversation"):
-        st.session_state.messages = [{"role": "system", "content": KnowledgeBase.get_system_prompt()}]
+        st.session_state.messages = []
         st.rerun()
 
 # --- CHAT LOGIC ---
+# Only the visible turns are kept: the engine adds the system prompt and windows long histories itself
 if "messages" not in st.session_state:
-    st.session_state.messages = [{"role": "system", "content": KnowledgeBase.get_system_prompt()}]
+    st.session_state.messages = []
 
 # Display messages
-for message in st.session_state.messages[1:]:  # Skip system prompt
+for message in st.session_state.messages:
+    if message["role"] == "system": continue
     role_class = "user-bubble" if message["role"] == "user" else "bot-bubble"
     st.markdown(f"""
     <div class="chat-bubble {role_class}">
@@ -1,15 +1,17 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
 
+import asyncio
+import hmac
 import os
 import sys
-import shutil
-import tempfile
+import threading
 from typing import List, Optional
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request, Header, Depends
+from fastapi.responses import JSONResponse, Response, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-import requests
-import PyPDF2
-import trafilatura
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -17,21 +19,48 @@ load_dotenv()
 
 # Add src to path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "src")))
+from cbc_bot.admission import AdmissionController, Overloaded, client_key
 from cbc_bot.engine import CBCEngine
+from cbc_bot.config import Config
+from cbc_bot import facts, metrics
+from cbc_bot.profiling import ProfilerBusy, sampling
+from cbc_bot.retriever import precompute_term_embeddings
+from cbc_bot.warmup import Warmup
+
+# "chat" serves only /chat, /calculate, /ready, /metrics and profiling; the ingestion API and
+# its upload/extraction stack are never imported. Anything else serves everything.
+WORKER_MODE = os.getenv("WORKER_MODE", "all").lower()
+CHAT_ONLY = WORKER_MODE == "chat"
+# Enables the /admin/* profiling endpoints; they return 404 when unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# In-process keep-warm: re-probe providers every N seconds (0 disables) and, if a URL is known,
+# request our own public /ready so Render sees inbound traffic and does not idle the service
+KEEP_WARM_INTERVAL_S = float(os.getenv("KEEP_WARM_INTERVAL_S", "0"))
+KEEP_WARM_URL = os.getenv("KEEP_WARM_URL", os.getenv("RENDER_EXTERNAL_URL", ""))
 
 app = FastAPI(title="CBC Chatbot Master API")
 
-# Initialize Master Engine
-try:
-    master_engine = CBCEngine()
-except Exception as e:
-    print(f"Failed to load Master Engine: {e}")
-    master_engine = None
+# Master Engine, built on first use (startup warm-up or first chat) rather than at import
+_master_engine: Optional[CBCEngine] = None
+_engine_lock = threading.Lock()
+
+def get_engine() -> CBCEngine:
+    global _master_engine
+    if _master_engine is None:
+        with _engine_lock:
+            if _master_engine is None:
+                _master_engine = CBCEngine()
+    return _master_engine
 
 @app.on_event("startup")
 async def startup_event():
     print("🚀 Master Backend is starting up...")
     print(f"CHROMA_HOST: {os.getenv('CHROMA_HOST')}")
+    print(f"Worker mode: {WORKER_MODE}, imports took {STARTUP_REPORT['import_seconds']:.3f}s")
+    # Warm up in the background so the port opens immediately; /ready reports progress
+    app.state.background = [asyncio.create_task(run_in_threadpool(warmup.run))]
+    if KEEP_WARM_INTERVAL_S > 0:
+        app.state.background.append(asyncio.create_task(keep_warm_loop()))
 
 # Enable CORS for frontend communication
 app.add_middleware(
@@ -50,225 +79,178 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     messages: List[ChatMessage]
 
+class ScoreInput(BaseModel):
+    kjsea: Optional[float] = None
+    kpsea: Optional[float] = None
+    sba: Optional[float] = None
+
+class CalculateRequest(ScoreInput):
+    items: Optional[List[ScoreInput]] = None
+
 # --- CORE CHAT ENDPOINT ---
 
+# Bounds how many chats run at once and how long the rest may queue (see admission.py)
+chat_admission = AdmissionController("chat", Config.CHAT_MAX_CONCURRENCY, Config.CHAT_MAX_QUEUE,
+                                     Config.CHAT_QUEUE_TIMEOUT_S, Config.CHAT_MAX_QUEUED_PER_CLIENT)
+
 @app.post("/chat")
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, http_request: Request):
     """
     Main Chat Endpoint: Proxies messages to the Master AI Engine.
     Handles semantic retrieval and response synthesis.
     """
-    if not master_engine:
+    try:
+        engine = await run_in_threadpool(get_engine)
+    except Exception as e:
+        print(f"Failed to load Master Engine: {e}")
         raise HTTPException(status_code=500, detail="AI Engine not initialized correctly.")
-    
+
+    client = client_key(http_request.headers, http_request.client.host if http_request.client else None)
     try:
-        # Convert Pydantic models to dicts for the engine
-        message_dicts = [{"role": m.role, "content": m.content} for m in request.messages]
-        
-        # Get AI response
-        response_text = master_engine.get_chat_response(message_dicts)
+        async with chat_admission.slot(client):
+            # Convert Pydantic models to dicts for the engine
+            message_dicts = [{"role": m.role, "content": m.content} for m in request.messages]
+
+            # Get AI response; the engine blocks on HTTP calls, so keep it off the event loop
+            response_text = await run_in_threadpool(engine.get_chat_response, message_dicts)
         
         return {
             "role": "assistant",
             "content": response_text
         }
+    except Overloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         print(f"Chat error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# --- INGESTION LOGIC (Keeping for Admin) ---
-
-class ChromaHTTPClient:
-    def __init__(self):
-        self.host = os.getenv('CHROMA_HOST', 'https://api.trychroma.com').rstrip('/')
-        self.api_key = os.getenv('CHROMA_API_KEY')
-        self.tenant = os.getenv('CHROMA_TENANT', 'default_tenant')
-        self.database = os.getenv('CHROMA_DATABASE', 'default_database')
-        self.headers = {
-            "x-chroma-token": self.api_key,
-            "Content-Type": "application/json"
-        }
-        self.base_url = f"{self.host}/api/v2/tenants/{self.tenant}/databases/{self.database}"
-    
-    def get_collection_id(self, name: str):
-        url = f"{self.base_url}/collections"
-        resp = requests.get(url, headers=self.headers)
-        resp.raise_for_status()
-        for coll in resp.json():
-            if coll['name'] == name:
-                return coll['id']
-        create_resp = requests.post(url, headers=self.headers, json={"name": name})
-        create_resp.raise_for_status()
-        return create_resp.json()['id']
-
-    def upsert(self, collection_name: str, ids: List[str], embeddings: List[List[float]], 
-               documents: List[str], metadatas: List[dict]):
-        coll_id = self.get_collection_id(collection_name)
-        url = f"{self.base_url}/collections/{coll_id}/upsert"
-        payload = {
-            "ids": ids,
-            "embeddings": embeddings,
-            "documents": documents,
-            "metadatas": metadatas
-        }
-        response = requests.post(url, json=payload, headers=self.headers)
-        response.raise_for_status()
-        return response.json()
-
-def get_embeddings(texts: List[str]) -> List[List[float]]:
-    hf_token = os.getenv("HUGGINGFACE_TOKEN")
-    model_id = "BAAI/bge-small-en-v1.5"
-    api_url = f"https://router.huggingface.co/hf-inference/models/{model_id}"
-    headers = {"Authorization": f"Bearer {hf_token}"}
-    try:
-        response = requests.post(api_url, headers=headers, json={"inputs": texts, "options": {"wait_for_model": True}})
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        print(f"Embedding error: {e}")
-        raise HTTPException(status_code=500, detail=f"Embedding API failed: {str(e)}")
+# --- PLACEMENT CALCULATOR ---
 
-def extract_text_from_pdf(file_path: str) -> str:
-    text = ""
-    try:
-        with open(file_path, 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            for page in reader.pages:
-                extracted = page.extract_text()
-                if extracted: text += extracted + "\n"
-    except Exception as e:
-        print(f"Error reading PDF: {e}")
-    return text
-
-def chunk_text(text: str, chunk_size_lines: int = 15) -> List[str]:
-    lines = text.split('\n')
-    chunks = []
-    for i in range(0, len(lines), chunk_size_lines):
-        chunk = "\n".join(lines[i:i + chunk_size_lines]).strip()
-        if chunk: chunks.append(chunk)
-    return chunks
-
-def process_and_index_file(file_path: str, filename: str):
-    try:
-        if filename.lower().endswith('.pdf'):
-            content = extract_text_from_pdf(file_path)
-        else:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-        
-        if not content.strip(): return
-        chunks = chunk_text(content)
-        embeddings = get_embeddings(chunks)
-        chroma_client = ChromaHTTPClient()
-        ids = [f"cloud_{filename}_{i}" for i in range(len(chunks))]
-        metadatas = [{"source": filename, "type": "cloud_upload"} for _ in range(len(chunks))]
-        chroma_client.upsert("Curriculumnpdfs", ids, embeddings, chunks, metadatas)
-    except Exception as e:
-        print(f"Error processing {filename}: {e}")
+MAX_CALCULATE_ITEMS = 1000
+
+@app.post("/calculate")
+async def calculate_endpoint(request: CalculateRequest):
+    """
+    Achievement levels and the 60/20/20 placement score (percentages, 0-100).
+    Single: {"kjsea": 72, "kpsea": 65, "sba": 80}. Batch: {"items": [{...}, ...]},
+    where an invalid item gets an "error" instead of failing the whole batch.
+    """
+    if request.items is None:
+        try:
+            return facts.calculate(request.kjsea, request.kpsea, request.sba)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    if len(request.items) > MAX_CALCULATE_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_CALCULATE_ITEMS} items per request")
+    results = []
+    for item in request.items:
+        try:
+            results.append(facts.calculate(item.kjsea, item.kpsea, item.sba))
+        except ValueError as e:
+            results.append({"error": str(e)})
+    return {"results": results}
 
 @app.get("/")
 def health_check():
     return {"status": "ok", "service": "CBC Master AI Backend"}
 
-@app.post("/ingest")
-async def ingest_file(file: UploadFile = File(...), background_tasks: BackgroundTasks = None):
+# --- WARM-UP & READINESS ---
+
+def ping_self() -> dict:
+    import requests
+    resp = requests.get(f"{KEEP_WARM_URL.rstrip('/')}/ready", timeout=30)
+    return {"status": resp.status_code}
+
+def preload_shared_state():
+    """
+    Loads the read-only retrieval state (mapped snapshot index, drill-term
+    embeddings) into process-wide caches. gunicorn.conf.py calls this in the
+    master before forking so every worker shares the pages copy-on-write.
+    """
+    if Config.SNAPSHOT_PATH and Config.SNAPSHOT_MMAP:
+        from cbc_bot.local_index import shared_index
+        shared_index(Config.SNAPSHOT_PATH)
     try:
-        suffix = os.path.splitext(file.filename)[1]
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            shutil.copyfileobj(file.file, tmp)
-            tmp_path = tmp.name
-        if background_tasks:
-            background_tasks.add_task(process_and_cleanup, tmp_path, file.filename)
-        else:
-            process_and_cleanup(tmp_path, file.filename)
-        return {"success": True, "message": f"File {file.filename} queued."}
+        print(f"Preloaded {precompute_term_embeddings()} drill-term embeddings")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        print(f"Drill-term embeddings not preloaded: {e}")
 
-def process_and_cleanup(tmp_path: str, filename: str):
-    try:
-        process_and_index_file(tmp_path, filename)
-    finally:
-        if os.path.exists(tmp_path): os.remove(tmp_path)
+def build_engine() -> dict:
+    return {"local_index": get_engine().retriever.local_index is not None}
+
+warmup = Warmup()
+warmup.step("engine", build_engine)
+warmup.step("term_embeddings", precompute_term_embeddings)
+warmup.step("retrieval", lambda: get_engine().retriever.warm_up(), keep_warm=True)
+warmup.step("llm_connections", lambda: get_engine().warm_connections(), keep_warm=True)
+if KEEP_WARM_URL:
+    warmup.step("self_ping", ping_self, keep_warm=True, on_startup=False)
+
+async def keep_warm_loop():
+    while True:
+        await asyncio.sleep(KEEP_WARM_INTERVAL_S)
+        if warmup.done: await run_in_threadpool(warmup.refresh)
 
-@app.post("/ingest-url")
-async def ingest_url(data: dict, background_tasks: BackgroundTasks = None):
+@app.get("/ready")
+def readiness_check():
     """
-    Scrape a URL and index its content.
-    Expects json: {"url": "https://example.com"}
+    503 until the startup warm-up has finished, then 200. Steps that failed are
+    listed under "failed" and mark the service as degraded, not unready.
     """
-    url = data.get("url")
-    if not url:
-        raise HTTPException(status_code=400, detail="No URL provided")
-        
-    if background_tasks:
-        background_tasks.add_task(process_url, url)
-    else:
-        process_url(url)
-        
-    return {"success": True, "message": f"URL {url} queued for scraping and indexing."}
+    status = warmup.status()
+    status["startup"] = STARTUP_REPORT
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
 
-def process_url(url: str):
-    try:
-        print(f"Scraping URL: {url}")
-        downloaded = trafilatura.fetch_url(url)
-        if not downloaded:
-            print(f"Failed to fetch URL: {url}")
-            return
-            
-        content = trafilatura.extract(downloaded, include_comments=False, include_tables=True)
-        if not content:
-            print(f"Failed to extract content from: {url}")
-            return
-            
-        # Aligned Chunking and Indexing
-        chunks = chunk_text(content)
-        embeddings = get_embeddings(chunks)
-        
-        chroma_client = ChromaHTTPClient()
-        # Use safe characters for IDs
-        safe_url = "".join([c if c.isalnum() else "_" for c in url])[:100]
-        ids = [f"url_{safe_url}_{i}" for i in range(len(chunks))]
-        metadatas = [{"source": url, "type": "url_ingest"} for _ in range(len(chunks))]
-        
-        chroma_client.upsert("Curriculumnpdfs", ids, embeddings, chunks, metadatas)
-        print(f"Successfully indexed {len(chunks)} chunks from URL: {url}")
-        
-    except Exception as e:
-        print(f"Error processing URL {url}: {e}")
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus text exposition of stage latencies, provider outcomes, cache hits and ingest throughput."""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+# --- ADMIN PROFILING ---
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
 
-@app.post("/ingest-text")
-async def ingest_text(data: dict):
+@app.post("/admin/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def profile_window(seconds: float = 10.0, interval_ms: float = 5.0, include_idle: bool = False):
     """
-    Ingest raw text (e.g. from copy-paste).
-    Expects json: {"title": "foo", "text": "bar"}
+    Samples every thread of this worker for `seconds` while live requests keep
+    being served, and returns collapsed stacks (flamegraph.pl / speedscope input).
     """
-    title = data.get("title", "Untitled")
-    text = data.get("text", "")
-    
-    if not text:
-        raise HTTPException(status_code=400, detail="No text provided")
-        
-    # Process
+    if not 0 < seconds <= 120 or not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="seconds must be in (0, 120], interval_ms in [1, 1000]")
     try:
-        chunks = chunk_text(text)
-        embeddings = get_embeddings(chunks)
-        
-        chroma_client = ChromaHTTPClient()
-        
-        ids = [f"cloud_text_{title}_{i}" for i in range(len(chunks))]
-        metadatas = [{"source": title, "type": "cloud_text"} for _ in range(len(chunks))]
-        
-        chroma_client.upsert(
-            collection_name="Curriculumnpdfs",
-            ids=ids,
-            embeddings=embeddings,
-            documents=chunks,
-            metadatas=metadatas
-        )
-        return {"success": True, "indexed_chunks": len(chunks)}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        with sampling(interval_ms / 1000.0, include_idle) as sampler:
+            await asyncio.sleep(seconds)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    header = f"# {sampler.sample_count} samples over {sampler.elapsed:.2f}s at {interval_ms:g}ms\n"
+    return PlainTextResponse(header + sampler.collapsed())
+
+# --- INGESTION (Keeping for Admin; not mounted on chat-only workers) ---
+
+if not CHAT_ONLY:
+    from cbc_bot.ingest_api import ingest_tracer, live_collection, router as ingest_router
+
+    app.include_router(ingest_router)
+    warmup.step("ingest_collection", live_collection)
+
+    @app.post("/admin/trace-ingest", dependencies=[Depends(require_admin)])
+    def arm_ingest_tracing(runs: int = 1, frames: int = 25, top: int = 25):
+        """Traces allocations (tracemalloc) during the next `runs` /ingest indexing jobs."""
+        ingest_tracer.arm(max(0, runs), max(1, frames), max(1, top))
+        return {"success": True, "armed_runs": ingest_tracer.armed}
+
+    @app.get("/admin/trace-ingest", dependencies=[Depends(require_admin)])
+    def ingest_allocation_reports():
+        """Recent allocation reports: top allocating lines plus collapsed allocation stacks (bytes)."""
+        return {"armed_runs": ingest_tracer.armed, "reports": list(ingest_tracer.reports)}
+
+# Time spent importing this module (and everything it pulls in), reported on /ready
+STARTUP_REPORT = {"mode": WORKER_MODE, "import_seconds": round(time.perf_counter() - _IMPORT_STARTED, 3)}
 
 if __name__ == "__main__":
     import uvicorn
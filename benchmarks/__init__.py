@@ -0,0 +1,15 @@
+"""
+Offline benchmarks for the CBC backend.
+Everything runs against local stand-ins for Chroma, HuggingFace and the LLM
+providers (see fakes.py), so results are reproducible and cost nothing.
+
+    python -m benchmarks.run_e2e --help
+"""
+import os
+import sys
+
+# Make cbc_bot and backend_main importable without installing anything
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src"))
+REPO_DIR = os.path.dirname(SRC_DIR)
+for path in (SRC_DIR, REPO_DIR):
+    if path not in sys.path: sys.path.append(path)
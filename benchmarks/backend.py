@@ -0,0 +1,35 @@
+"""Runs backend_main's FastAPI app under uvicorn on a background thread."""
+import socket
+import threading
+import time
+from typing import Callable, Tuple
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_backend(timeout: float = 30.0) -> Tuple[str, Callable[[], None]]:
+    """
+    Imports backend_main (so the fakes' environment must already be applied)
+    and serves it on a free local port. Returns (base URL, stop function).
+    """
+    import uvicorn
+    import backend_main
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(backend_main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="bench-uvicorn", daemon=True)
+    thread.start()
+    deadline = time.monotonic() + timeout
+    while not server.started:
+        if time.monotonic() > deadline or not thread.is_alive():
+            raise RuntimeError("backend did not start")
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join(timeout=10)
+    return f"http://127.0.0.1:{port}", stop
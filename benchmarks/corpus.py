@@ -0,0 +1,46 @@
+"""The data/processed corpus, chunked the same ways the indexing scripts chunk it."""
+import os
+from typing import Callable, Dict, List, Tuple
+
+from . import REPO_DIR
+
+PROCESSED_DIR = os.path.join(REPO_DIR, "data", "processed")
+
+
+def chunk_chars(text: str, size: int = 1500, step: int = 1300) -> List[str]:
+    """Character windows with overlap, as in scripts/master_db_reset.py."""
+    return [text[i:i + size] for i in range(0, len(text), step)]
+
+
+def chunk_lines(text: str, lines: int = 15) -> List[str]:
+    """Line windows, as in extraction.chunk_text and scripts/index_local_docs.py."""
+    # Imported here: importing cbc_bot freezes Config, which must see the fakes' env first
+    from cbc_bot.extraction import LineChunker
+    chunker = LineChunker(lines)
+    chunker.feed(text)
+    chunker.close()
+    return chunker.chunks
+
+
+CHUNKERS: Dict[str, Callable[[str], List[str]]] = {
+    "chars1500": chunk_chars,
+    "lines15": chunk_lines,
+}
+
+
+def load_corpus(chunker: str = "chars1500", processed_dir: str = PROCESSED_DIR,
+                model_id: str = "") -> List[Tuple[str, str, dict]]:
+    """(id, document, metadata) records for every .txt file in `processed_dir`."""
+    split = CHUNKERS[chunker]
+    records = []
+    for filename in sorted(os.listdir(processed_dir)):
+        if not filename.endswith(".txt"): continue
+        with open(os.path.join(processed_dir, filename), "r", encoding="utf-8") as f:
+            content = f.read().strip()
+        if len(content) < 50: continue
+        stem = os.path.splitext(filename)[0]
+        for i, chunk in enumerate(split(content)):
+            metadata = {"source": filename}
+            if model_id: metadata["embedding_model"] = model_id
+            records.append((f"aligned_{stem}_{i}", chunk, metadata))
+    return records
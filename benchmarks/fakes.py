@@ -0,0 +1,394 @@
+"""
+Local stand-ins for the services the backend talks to.
+Each fake is a small threaded HTTP server with configurable latency, jitter
+and injected errors, and counts requests and bytes in both directions:
+
+* FakeChroma   - the subset of the Chroma v2 REST API used by cbc_bot.chroma
+* FakeHFRouter - the HF feature-extraction router (hashed bag-of-words vectors)
+* FakeLLM      - Groq and ModelsLab chat completions
+"""
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+EMBED_DIM = 384
+_TOKEN = re.compile(r"[a-z0-9/]+")
+
+
+def hashed_embedding(text: str, dim: int = EMBED_DIM) -> List[float]:
+    """Deterministic bag-of-words vector: each token (and bigram) hashes to a signed bucket."""
+    vector = np.zeros(dim, dtype=np.float32)
+    tokens = _TOKEN.findall((text or "").lower())
+    for token in tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]:
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = float(np.linalg.norm(vector))
+    if norm: vector /= norm
+    return vector.tolist()
+
+
+class Faults:
+    """Latency and error injection shared by all routes of one fake."""
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 error_status: int = 503, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """(delay seconds, inject error?) for one request."""
+        with self._lock:
+            delay = self.latency_ms + (self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0)
+            fail = self._random.random() < self.error_rate
+        return max(0.0, delay) / 1000.0, fail
+
+
+class FakeServer:
+    """Threaded HTTP server on 127.0.0.1 that dispatches JSON requests to `handle`."""
+    name = "fake"
+
+    def __init__(self, faults: Optional[Faults] = None, port: int = 0):
+        self.faults = faults or Faults()
+        self.stats = {"requests": 0, "bytes_in": 0, "bytes_out": 0, "injected_errors": 0}
+        self._stats_lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name=f"{self.name}-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_stats(self):
+        with self._stats_lock:
+            for key in self.stats: self.stats[key] = 0
+
+    def _count(self, bytes_in: int, bytes_out: int, injected: bool):
+        with self._stats_lock:
+            self.stats["requests"] += 1
+            self.stats["bytes_in"] += bytes_in
+            self.stats["bytes_out"] += bytes_out
+            if injected: self.stats["injected_errors"] += 1
+
+    def handle(self, method: str, path: str, body):
+        """Returns (status, json-serialisable payload)."""
+        raise NotImplementedError
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Headers and body are written separately; don't let Nagle add ~40ms per response
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def _dispatch(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                delay, fail = fake.faults.draw()
+                if delay: time.sleep(delay)
+                if fail:
+                    status, payload = fake.faults.error_status, {"error": "injected failure"}
+                else:
+                    try:
+                        status, payload = fake.handle(self.command, self.path, json.loads(raw) if raw else None)
+                    except Exception as e:
+                        status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                fake._count(len(raw), len(data), fail)
+
+            do_GET = do_POST = do_DELETE = _dispatch
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+class _Collection:
+    def __init__(self, name: str, metadata: Optional[dict]):
+        self.id = str(uuid.uuid4())
+        self.name = name
+        self.metadata = metadata or {}
+        self.records: Dict[str, tuple] = {}  # id -> (embedding, document, metadata)
+        self._matrix = None
+        self._order: List[str] = []
+
+    def describe(self) -> dict:
+        return {"id": self.id, "name": self.name, "metadata": self.metadata}
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        for i, record_id in enumerate(ids):
+            self.records[record_id] = (
+                embeddings[i] if embeddings else None,
+                documents[i] if documents else None,
+                (metadatas[i] if metadatas else None) or {},
+            )
+        self._matrix = None
+
+    def matrix(self):
+        if self._matrix is None:
+            self._order = sorted(self.records)
+            rows = np.asarray([self.records[i][0] for i in self._order], dtype=np.float32)
+            if rows.size:
+                norms = np.linalg.norm(rows, axis=1, keepdims=True)
+                rows = rows / np.where(norms == 0, 1, norms)
+            self._matrix = rows
+        return self._matrix
+
+
+def _matches(metadata: dict, where: Optional[dict]) -> bool:
+    if not where: return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, c) for c in condition): return False
+            continue
+        if key == "$or":
+            if not any(_matches(metadata, c) for c in condition): return False
+            continue
+        value = metadata.get(key)
+        if isinstance(condition, dict):
+            for op, operand in condition.items():
+                if op == "$eq" and value != operand: return False
+                if op == "$ne" and value == operand: return False
+                if op == "$in" and value not in operand: return False
+                if op == "$nin" and value in operand: return False
+        elif value != condition:
+            return False
+    return True
+
+
+class FakeChroma(FakeServer):
+    """In-memory Chroma v2: collections, upsert, get, query (cosine) and count."""
+    name = "chroma"
+    _route = re.compile(r"^/api/v2/tenants/[^/]+/databases/[^/]+/collections(?:/([^/]+)(?:/(\w+))?)?/?$")
+
+    def __init__(self, faults: Optional[Faults] = None, port: int = 0):
+        super().__init__(faults, port)
+        self.collections: Dict[str, _Collection] = {}
+        self._lock = threading.Lock()
+
+    def collection(self, name: str, metadata: Optional[dict] = None) -> _Collection:
+        with self._lock:
+            for coll in self.collections.values():
+                if coll.name == name: return coll
+            coll = _Collection(name, metadata)
+            self.collections[coll.id] = coll
+            return coll
+
+    def drop(self, name: str):
+        with self._lock:
+            for coll_id in [c.id for c in self.collections.values() if c.name == name]:
+                del self.collections[coll_id]
+
+    def handle(self, method, path, body):
+        match = self._route.match(path.split("?")[0])
+        if not match: return 404, {"error": f"no route for {path}"}
+        coll_ref, action = match.groups()
+        if coll_ref is None:
+            if method == "GET":
+                return 200, [c.describe() for c in self.collections.values()]
+            return 200, self.collection(body["name"], body.get("metadata")).describe()
+
+        coll = self.collections.get(coll_ref) or next(
+            (c for c in self.collections.values() if c.name == coll_ref), None)
+        if coll is None: return 404, {"error": f"collection {coll_ref} not found"}
+        if method == "DELETE" and action is None:
+            with self._lock: self.collections.pop(coll.id, None)
+            return 200, {}
+        if action == "count":
+            return 200, len(coll.records)
+        with self._lock:
+            if action in ("upsert", "add"):
+                coll.upsert(body["ids"], body.get("embeddings"), body.get("documents"), body.get("metadatas"))
+                return 200, True
+            if action == "get":
+                return 200, self._get(coll, body or {})
+            if action == "query":
+                return 200, self._query(coll, body)
+        return 404, {"error": f"unsupported action {action}"}
+
+    def _get(self, coll: _Collection, body: dict) -> dict:
+        include = body.get("include", ["documents", "metadatas"])
+        ids = body.get("ids")
+        candidates = [i for i in (ids if ids is not None else sorted(coll.records)) if i in coll.records]
+        selected = [i for i in candidates if _matches(coll.records[i][2], body.get("where"))]
+        offset = body.get("offset") or 0
+        limit = body.get("limit")
+        selected = selected[offset:offset + limit if limit is not None else None]
+        result = {"ids": selected}
+        if "embeddings" in include: result["embeddings"] = [coll.records[i][0] for i in selected]
+        if "documents" in include: result["documents"] = [coll.records[i][1] for i in selected]
+        if "metadatas" in include: result["metadatas"] = [coll.records[i][2] for i in selected]
+        return result
+
+    def _query(self, coll: _Collection, body: dict) -> dict:
+        include = body.get("include", ["documents", "metadatas"])
+        n_results = body.get("n_results", 10)
+        matrix = coll.matrix()
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for vector in body["query_embeddings"]:
+            if not len(coll._order):
+                ids, distances = [], []
+            else:
+                query = np.asarray(vector, dtype=np.float32)
+                query /= (np.linalg.norm(query) or 1.0)
+                scores = matrix @ query
+                k = min(n_results, len(scores))
+                top = np.argpartition(-scores, k - 1)[:k]
+                top = top[np.argsort(-scores[top])]
+                ids = [coll._order[i] for i in top]
+                distances = [float(1.0 - scores[i]) for i in top]
+            result["ids"].append(ids)
+            result["distances"].append(distances)
+            result["documents"].append([coll.records[i][1] for i in ids])
+            result["metadatas"].append([coll.records[i][2] for i in ids])
+        return {k: v for k, v in result.items() if k == "ids" or k in include}
+
+
+class FakeHFRouter(FakeServer):
+    """POST /hf-inference/models/<model> {"inputs": [...]} -> one vector per input."""
+    name = "hf"
+
+    def __init__(self, faults: Optional[Faults] = None, port: int = 0, dim: int = EMBED_DIM,
+                 embed_fn: Optional[Callable[[List[str]], List[List[float]]]] = None):
+        super().__init__(faults, port)
+        self.dim = dim
+        # Batch embedder; defaults to hashed bag-of-words vectors of `dim` dimensions
+        self.embed_fn = embed_fn or (lambda texts: [hashed_embedding(t, dim) for t in texts])
+
+    def handle(self, method, path, body):
+        if method != "POST" or "/models/" not in path: return 404, {"error": "not found"}
+        inputs = body.get("inputs")
+        if isinstance(inputs, str):
+            return 200, self.embed_fn([inputs])[0]
+        return 200, self.embed_fn(inputs)
+
+
+class FakeLLM(FakeServer):
+    """Groq (/openai/v1/chat/completions) and ModelsLab (/api/v7/llm/chat/completions) chat endpoints."""
+    name = "llm"
+
+    def __init__(self, faults: Optional[Faults] = None, port: int = 0, answer_chars: int = 600,
+                 per_token_ms: float = 0.0):
+        super().__init__(faults, port)
+        self.answer_chars = answer_chars
+        # Simulated generation time per output token (~4 chars), on top of Faults latency
+        self.per_token_ms = per_token_ms
+        self.prompt_chars: List[int] = []
+
+    def handle(self, method, path, body):
+        if method != "POST" or not path.endswith("/chat/completions"): return 404, {"error": "not found"}
+        messages = body.get("messages", [])
+        self.prompt_chars.append(sum(len(m.get("content") or "") for m in messages))
+        question = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        answer = f"According to the CBC guidelines on '{question[:80]}': " + "EE1 60/20/20 STEM " * (self.answer_chars // 18)
+        answer = answer[:self.answer_chars]
+        if self.per_token_ms:
+            time.sleep(self.per_token_ms * math.ceil(len(answer) / 4) / 1000.0)
+        return 200, {"choices": [{"message": {"role": "assistant", "content": answer}}],
+                     "model": body.get("model") or body.get("model_id")}
+
+
+class FakeStack:
+    """
+    Starts all three fakes and exposes the environment variables that point
+    cbc_bot at them. Set the variables before cbc_bot is imported, since
+    Config reads them at import time. The shared cache file lives in a fresh
+    temp directory. Neither answers nor retrievals are cached unless
+    `answer_cache_ttl` / `retrieval_cache_ttl` is set, and FAQ-style questions
+    skip the pipeline only with `intent_routing`, so by default every question
+    exercises the whole pipeline.
+    """
+    def __init__(self, chroma: Optional[Faults] = None, hf: Optional[Faults] = None, llm: Optional[Faults] = None,
+                 answer_chars: int = 600, per_token_ms: float = 0.0, embed_fn=None, answer_cache_ttl: float = 0.0,
+                 retrieval_cache_ttl: float = 0.0, intent_routing: bool = False):
+        self.chroma = FakeChroma(chroma)
+        self.hf = FakeHFRouter(hf, embed_fn=embed_fn)
+        self.llm = FakeLLM(llm, answer_chars=answer_chars, per_token_ms=per_token_ms)
+        self.answer_cache_ttl = answer_cache_ttl
+        self.retrieval_cache_ttl = retrieval_cache_ttl
+        self.intent_routing = intent_routing
+        self._cache_dir = tempfile.TemporaryDirectory(prefix="cbc-bench-cache-")
+
+    @property
+    def servers(self):
+        return [self.chroma, self.hf, self.llm]
+
+    def env(self) -> Dict[str, str]:
+        return {
+            "CHROMA_HOST": self.chroma.url,
+            "CHROMA_API_KEY": "bench",
+            "CHROMA_TENANT": "bench",
+            "CHROMA_DATABASE": "bench",
+            "HF_ROUTER_URL": f"{self.hf.url}/hf-inference/models",
+            "HUGGINGFACE_TOKEN": "bench",
+            "GROQ_URL": f"{self.llm.url}/openai/v1/chat/completions",
+            "MODELSLAB_URL": f"{self.llm.url}/api/v7/llm/chat/completions",
+            "GROQ_API_KEY": "bench",
+            "MODELSLAB_API_KEY": "bench",
+            "CBC_CACHE_PATH": os.path.join(self._cache_dir.name, "cache.sqlite"),
+            "ANSWER_CACHE_TTL_S": f"{self.answer_cache_ttl:g}",
+            "RETRIEVAL_CACHE_TTL_S": f"{self.retrieval_cache_ttl:g}",
+            "INTENT_ROUTING": "1" if self.intent_routing else "0",
+        }
+
+    def apply_env(self):
+        os.environ.update(self.env())
+        os.environ.pop("CBC_SNAPSHOT_PATH", None)
+
+    def seed(self, collection_name: str, records: List[tuple], metadata: Optional[dict] = None) -> int:
+        """Loads (id, document, metadata) records straight into the fake Chroma, embedded like FakeHFRouter."""
+        coll = self.chroma.collection(collection_name, metadata)
+        documents = [r[1] for r in records]
+        embeddings = []
+        for start in range(0, len(documents), 256):
+            embeddings.extend(self.hf.embed_fn(documents[start:start + 256]))
+        coll.upsert([r[0] for r in records], embeddings, documents, [r[2] for r in records])
+        return len(records)
+
+    def reset_stats(self):
+        for server in self.servers: server.reset_stats()
+        self.llm.prompt_chars.clear()
+
+    def __enter__(self):
+        for server in self.servers: server.start()
+        return self
+
+    def __exit__(self, *exc):
+        for server in self.servers: server.stop()
+        self._cache_dir.cleanup()
@@ -0,0 +1,232 @@
+"""
+Open-loop load generator and traffic replay for /chat and /ingest.
+
+Conversations (and uploads) arrive on a schedule, either Poisson at a fixed
+rate or replayed from a JSONL file, regardless of how fast the server
+answers. Within a conversation turns are sequential, separated by a think
+time, and carry the real assistant replies. Latency is measured from the
+intended send time, so queueing in front of a saturated worker is not hidden.
+
+    python -m benchmarks.loadgen --local --rates 1,2,4,8 --duration 30 --ingest-ratio 0.05
+    python -m benchmarks.loadgen --url https://cbc-chatbot-backend.onrender.com --replay traffic.jsonl --speed 2
+
+Replay lines: {"offset_s": 0.0, "kind": "chat", "turns": ["...", "..."], "think_s": 3}
+              {"offset_s": 1.5, "kind": "ingest", "path": "data/processed/KNEC_Portals.txt"}
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Optional
+
+from .corpus import PROCESSED_DIR
+from .run_e2e import ERROR_REPLY, add_stack_arguments, build_stack, seed_stack
+from .stats import format_table, summarize
+
+CONVERSATIONS = [
+    ["When do Grade 10 learners report to senior school?", "what are these dates?", "tell me more"],
+    ["Explain the 60/20/20 rule", "How are the achievement levels graded?"],
+    ["I want to become an engineer, which pathway should I pick?", "Which subjects are mandatory?"],
+    ["How is KJSEA different from the old KCPE system?"],
+    ["My child was placed in a school far from home", "How do I apply for a transfer?", "When is the review window?"],
+    ["Which course books are approved for Grade 10?"],
+    ["What careers are there in sports and recreation?", "Which pathway is that?"],
+]
+
+
+def synthetic_schedule(rate: float, duration: float, ingest_ratio: float = 0.0, think_s: float = 3.0,
+                       seed: int = 0) -> List[dict]:
+    """Poisson arrivals at `rate` per second for `duration` seconds."""
+    rng = random.Random(seed)
+    uploads = sorted(f for f in os.listdir(PROCESSED_DIR) if f.endswith(".txt"))
+    schedule, offset = [], 0.0
+    while True:
+        offset += rng.expovariate(rate)
+        if offset >= duration: return schedule
+        if uploads and rng.random() < ingest_ratio:
+            schedule.append({"offset_s": round(offset, 4), "kind": "ingest",
+                             "path": os.path.join(PROCESSED_DIR, rng.choice(uploads))})
+        else:
+            schedule.append({"offset_s": round(offset, 4), "kind": "chat",
+                             "turns": rng.choice(CONVERSATIONS), "think_s": think_s})
+
+
+def load_replay(path: str) -> List[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        schedule = [json.loads(line) for line in f if line.strip()]
+    return sorted(schedule, key=lambda a: a.get("offset_s", 0.0))
+
+
+class LoadRunner:
+    """Fires each scheduled arrival at its offset on its own worker thread."""
+    def __init__(self, base_url: str, timeout: float = 120.0, unique_uploads: bool = True, max_workers: int = 1024):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.unique_uploads = unique_uploads
+        self.max_workers = max_workers
+        self.results: List[dict] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _session(self):
+        if not hasattr(self._local, "session"):
+            import requests
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _record(self, kind: str, started: float, ok: bool, status: Optional[int]):
+        with self._lock:
+            self.results.append({"kind": kind, "latency": time.perf_counter() - started, "ok": ok, "status": status})
+
+    def _chat(self, arrival: dict, due: float, speed: float):
+        messages = []
+        for n, turn in enumerate(arrival["turns"]):
+            if n: time.sleep(arrival.get("think_s", 0.0) / speed)
+            started = due if n == 0 else time.perf_counter()
+            messages.append({"role": "user", "content": turn})
+            status = None
+            try:
+                resp = self._session().post(f"{self.base_url}/chat", json={"messages": messages}, timeout=self.timeout)
+                status = resp.status_code
+                reply = resp.json().get("content", "") if status == 200 else ""
+                ok = status == 200 and not reply.startswith(ERROR_REPLY)
+            except Exception:
+                reply, ok = "", False
+            self._record("chat", started, ok, status)
+            if not ok: return  # a parent who gets an error does not keep chatting
+            messages.append({"role": "assistant", "content": reply})
+
+    def _ingest(self, arrival: dict, due: float):
+        path = arrival["path"]
+        with open(path, "rb") as f:
+            content = f.read()
+        filename = os.path.basename(path)
+        if self.unique_uploads:
+            # Otherwise every repeat is answered by the duplicate check without indexing
+            content += f"\nloadgen-{uuid.uuid4().hex}\n".encode("utf-8")
+            filename = f"loadgen-{uuid.uuid4().hex[:8]}-{filename}"
+        status = None
+        try:
+            resp = self._session().post(f"{self.base_url}/ingest", files={"file": (filename, content)},
+                                        timeout=self.timeout)
+            status = resp.status_code
+            ok = status == 200
+        except Exception:
+            ok = False
+        self._record("ingest", due, ok, status)
+
+    def _execute(self, arrival: dict, due: float, speed: float):
+        if arrival.get("kind") == "ingest":
+            self._ingest(arrival, due)
+        else:
+            self._chat(arrival, due, speed)
+
+    def run(self, schedule: List[dict], speed: float = 1.0) -> float:
+        """Plays `schedule` (offsets divided by `speed`); returns the wall time until the last reply."""
+        self.results = []
+        start = time.perf_counter() + 0.1
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for arrival in schedule:
+                due = start + arrival.get("offset_s", 0.0) / speed
+                delay = due - time.perf_counter()
+                if delay > 0: time.sleep(delay)
+                futures.append(pool.submit(self._execute, arrival, due, speed))
+            wait(futures)
+        return time.perf_counter() - start
+
+
+def report_rows(results: List[dict], wall: float, label: str) -> List[dict]:
+    rows = []
+    for kind in ("chat", "ingest"):
+        subset = [r for r in results if r["kind"] == kind]
+        if not subset: continue
+        summary = summarize([r["latency"] for r in subset], wall, sum(1 for r in subset if not r["ok"]))
+        summary["shed_503"] = sum(1 for r in subset if r["status"] == 503)
+        rows.append({"run": label, "kind": kind, **summary})
+    return rows
+
+
+def is_saturated(rows: List[dict], slo_ms: float, max_error_rate: float) -> bool:
+    """Open-loop saturation shows up as queueing (p95 past the SLO) or shed/failed requests."""
+    chat = next((r for r in rows if r["kind"] == "chat"), None)
+    if chat is None: return False
+    return chat["p95_ms"] > slo_ms or chat["error_rate"] > max_error_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test / traffic replay for /chat and /ingest.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Base URL of a running backend_main")
+    target.add_argument("--local", action="store_true", help="Start the fakes and backend_main in-process")
+    parser.add_argument("--rates", default="1,2,4,8", help="Conversation arrival rates to sweep (per second)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of arrivals per rate")
+    parser.add_argument("--ingest-ratio", type=float, default=0.0, help="Share of arrivals that are /ingest uploads")
+    parser.add_argument("--think-s", type=float, default=3.0, help="Pause between turns of one conversation")
+    parser.add_argument("--replay", help="Replay this JSONL schedule instead of synthetic arrivals")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed-up factor")
+    parser.add_argument("--save-schedule", help="Write the synthetic schedule of the first rate as replay JSONL")
+    parser.add_argument("--slo-ms", type=float, default=8000.0, help="p95 /chat latency still considered healthy")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--no-unique-uploads", action="store_true", help="Upload files unchanged (exercises dedupe)")
+    parser.add_argument("--json", help="Also write raw results to this file")
+    add_stack_arguments(parser)
+    args = parser.parse_args()
+
+    stack = stop_backend = None
+    base_url = args.url
+    if args.local:
+        from .backend import start_backend
+        stack = build_stack(args).__enter__()
+        seed_stack(stack, args.chunker)
+        base_url, stop_backend = start_backend()
+
+    runner = LoadRunner(base_url, unique_uploads=not args.no_unique_uploads)
+    rows, raw, saturation = [], {}, None
+    try:
+        if args.replay:
+            schedule = load_replay(args.replay)
+            wall = runner.run(schedule, args.speed)
+            rows += report_rows(runner.results, wall, f"replay x{args.speed:g}")
+            raw["replay"] = runner.results
+        else:
+            for n, rate in enumerate(float(r) for r in args.rates.split(",")):
+                schedule = synthetic_schedule(rate, args.duration, args.ingest_ratio, args.think_s, seed=args.seed + n)
+                if n == 0 and args.save_schedule:
+                    with open(args.save_schedule, "w", encoding="utf-8") as f:
+                        f.writelines(json.dumps(a) + "\n" for a in schedule)
+                wall = runner.run(schedule)
+                issued = len(runner.results)
+                rate_rows = report_rows(runner.results, wall, f"{rate:g}/s")
+                rows += rate_rows
+                raw[f"{rate:g}"] = runner.results
+                print(f"rate {rate:g}/s: {issued} requests in {wall:.1f}s")
+                if is_saturated(rate_rows, args.slo_ms, args.max_error_rate):
+                    saturation = rate
+                    break
+    finally:
+        if stop_backend: stop_backend()
+        if stack: stack.__exit__(None, None, None)
+
+    print()
+    print(format_table(rows, ["run", "kind", "requests", "throughput_rps", "p50_ms", "p95_ms",
+                              "p99_ms", "error_rate", "shed_503"]))
+    if not args.replay:
+        if saturation:
+            print(f"\nSaturated at {saturation:g} conversations/s (/chat p95 > {args.slo_ms:g}ms "
+                  f"or errors > {args.max_error_rate:.0%}).")
+        else:
+            print("\nNot saturated at the highest rate tried; extend --rates.")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "rows": rows, "results": raw}, f, indent=2)
+        print(f"Raw results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
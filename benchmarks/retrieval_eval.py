@@ -0,0 +1,138 @@
+"""
+Retrieval quality vs. cost over the golden question set.
+
+For every chunker the fake Chroma is re-seeded from data/processed; every
+retriever configuration then answers each golden question. The report shows
+recall@k and MRR against the expected source files, plus the context size
+(estimated tokens) and retrieval latency, so settings such as n_results or
+the query-expansion rules can be cut without losing the right documents.
+
+    python -m benchmarks.retrieval_eval --configs n20,n10,n5,n20-noexpand --chunkers chars1500,lines15
+"""
+import argparse
+import json
+import os
+import re
+import time
+from typing import List
+
+from .corpus import CHUNKERS, PROCESSED_DIR, load_corpus
+from .fakes import FakeStack
+from .stats import estimate_tokens, format_table, percentile
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "golden", "cbc_questions_v1.json")
+_CONFIG = re.compile(r"^n(\d+)(-noexpand)?$")
+
+
+def parse_config(name: str) -> dict:
+    """"n20" -> 20 results with query expansion; "n20-noexpand" -> without the drill searches."""
+    match = _CONFIG.match(name)
+    if not match: raise ValueError(f"Unknown retriever config '{name}' (expected e.g. n20 or n10-noexpand)")
+    return {"name": name, "n_results": int(match.group(1)), "expand_queries": not match.group(2)}
+
+
+def load_golden(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        golden = json.load(f)
+    if not golden.get("questions"): raise ValueError(f"{path} has no questions")
+    return golden
+
+
+def score_question(sources: List[str], expected: List[str], ks: List[int]) -> dict:
+    """recall@k over the distinct expected sources, and the reciprocal rank of the first hit."""
+    expected = set(expected)
+    result = {}
+    for k in ks:
+        found = expected.intersection(sources[:k])
+        result[f"recall@{k}"] = len(found) / len(expected)
+    first = next((rank for rank, source in enumerate(sources, 1) if source in expected), None)
+    result["rr"] = 1.0 / first if first else 0.0
+    result["first_hit_rank"] = first
+    return result
+
+
+def sentence_transformer_embedder(model_id: str):
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(model_id)
+    return lambda texts: model.encode(list(texts), show_progress_bar=False, normalize_embeddings=True).tolist()
+
+
+def evaluate(retriever, golden: dict, n_results: int, ks: List[int]) -> dict:
+    rows, latencies, tokens = [], [], []
+    for question in golden["questions"]:
+        started = time.perf_counter()
+        fragments = retriever.retrieve(question["question"], question.get("history", ""), n_results)
+        latencies.append(time.perf_counter() - started)
+        context = "\n\n---\n\n".join(f["document"] for f in fragments)
+        tokens.append(estimate_tokens(context))
+        sources = [f["metadata"].get("source", "") for f in fragments]
+        scores = score_question(sources, question["expected_sources"], ks)
+        rows.append({"id": question["id"], "fragments": len(fragments), "context_tokens": tokens[-1],
+                     "latency_ms": 1000 * latencies[-1], **scores})
+
+    n = len(rows)
+    summary = {f"recall@{k}": sum(r[f"recall@{k}"] for r in rows) / n for k in ks}
+    summary.update({
+        "mrr": sum(r["rr"] for r in rows) / n,
+        "misses": sum(1 for r in rows if not r["first_hit_rank"]),
+        "mean_tokens": sum(tokens) / n,
+        "max_tokens": max(tokens),
+        "p50_ms": 1000 * percentile(latencies, 50),
+        "p95_ms": 1000 * percentile(latencies, 95),
+    })
+    return {"summary": summary, "questions": rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval recall/MRR vs. context size and latency.")
+    parser.add_argument("--golden", default=GOLDEN_PATH)
+    parser.add_argument("--configs", default="n20,n10,n5,n20-noexpand",
+                        help="Comma-separated retriever configs: n<results>[-noexpand]")
+    parser.add_argument("--chunkers", default="chars1500,lines15", help="Comma-separated corpus chunkers")
+    parser.add_argument("--ks", default="1,3,5,10", help="Cut-offs for recall@k (in fragments)")
+    parser.add_argument("--embedder", default="hashed",
+                        help="'hashed' (bag-of-words, no downloads) or st:<sentence-transformers model id>")
+    parser.add_argument("--json", help="Also write per-question results to this file")
+    args = parser.parse_args()
+
+    golden = load_golden(args.golden)
+    configs = [parse_config(c.strip()) for c in args.configs.split(",") if c.strip()]
+    chunkers = [c.strip() for c in args.chunkers.split(",") if c.strip()]
+    ks = [int(k) for k in args.ks.split(",")]
+    embed_fn = sentence_transformer_embedder(args.embedder[3:]) if args.embedder.startswith("st:") else None
+
+    report = {"golden_version": golden.get("version"), "embedder": args.embedder, "runs": []}
+    with FakeStack(embed_fn=embed_fn) as stack:
+        stack.apply_env()
+        from cbc_bot.config import Config
+        from cbc_bot.registry import namespace_metadata
+        from cbc_bot.retriever import CBCRetriever
+
+        missing = {s for q in golden["questions"] for s in q["expected_sources"]} - set(os.listdir(PROCESSED_DIR))
+        if missing: print(f"WARNING: expected sources not in data/processed: {sorted(missing)}")
+        print(f"Golden set v{golden.get('version')}: {len(golden['questions'])} questions, embedder: {args.embedder}")
+
+        for chunker in chunkers:
+            if chunker not in CHUNKERS: raise ValueError(f"Unknown chunker '{chunker}' (have {sorted(CHUNKERS)})")
+            stack.chroma.drop(Config.COLLECTION_NAME)
+            chunks = stack.seed(Config.COLLECTION_NAME, load_corpus(chunker, model_id=Config.EMBED_MODEL_ID),
+                                namespace_metadata(Config.EMBED_MODEL_ID))
+            for config in configs:
+                retriever = CBCRetriever(expand_queries=config["expand_queries"])
+                retriever.chroma.forget_collection(Config.COLLECTION_NAME)
+                result = evaluate(retriever, golden, config["n_results"], ks)
+                report["runs"].append({"chunker": chunker, "chunks": chunks, "config": config, **result})
+
+    columns = ["chunker", "config"] + [f"recall@{k}" for k in ks] + ["mrr", "misses", "mean_tokens", "max_tokens", "p50_ms", "p95_ms"]
+    rows = [{"chunker": r["chunker"], "config": r["config"]["name"], **r["summary"]} for r in report["runs"]]
+    print()
+    print(format_table(rows, columns))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nPer-question results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
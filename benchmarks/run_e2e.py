@@ -0,0 +1,205 @@
+"""
+End-to-end chat benchmark against local fakes.
+
+Seeds a fake Chroma with the data/processed corpus, points cbc_bot at the fake
+Chroma / HF router / LLM servers and drives either CBCEngine directly or the
+FastAPI app over HTTP. Reports throughput, p50/p95/p99 latency, bytes on the
+wire per service and the per-stage timings from cbc_bot.metrics.
+
+    python -m benchmarks.run_e2e --target both --requests 200 --concurrency 8 --llm-ms 300 --llm-error-rate 0.05
+"""
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Tuple
+
+from .fakes import Faults, FakeStack
+from .stats import format_table, summarize
+
+QUESTIONS = [
+    "When do Grade 10 learners report to senior school?",
+    "Explain the 60/20/20 rule for KJSEA placement",
+    "Which subjects are mandatory for the STEM pure sciences pathway?",
+    "How is KJSEA different from the old KCPE system?",
+    "What do the achievement levels EE1 and ME2 mean?",
+    "I want to become an engineer, which pathway should I pick?",
+    "When is the placement review window?",
+    "What subjects does a medicine student need in senior school?",
+    "How do I apply for a school transfer after placement?",
+    "What are these dates?",
+    "What does the Orange Book addendum change for engineering?",
+    "How many marks does SBA contribute?",
+]
+ERROR_REPLY = "Consultant Connection Error"
+
+
+def conversation(i: int) -> List[dict]:
+    """Single-turn chats, with every third one following up on a previous answer."""
+    question = QUESTIONS[i % len(QUESTIONS)]
+    if i % 3 == 2:
+        return [{"role": "user", "content": QUESTIONS[(i - 1) % len(QUESTIONS)]},
+                {"role": "assistant", "content": "Grade 10 reporting is on 12 January; the placement review window is 6-9 January."},
+                {"role": "user", "content": "tell me more"}]
+    return [{"role": "user", "content": question}]
+
+
+def run_closed_loop(call: Callable[[int], Tuple[bool, int, int]], requests: int, concurrency: int) -> dict:
+    """
+    Runs `call(i)` for i in range(requests) on `concurrency` threads.
+    `call` returns (ok, bytes sent, bytes received).
+    """
+    latencies, errors, sent, received = [], 0, 0, 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors, sent, received
+        started = time.perf_counter()
+        try:
+            ok, out_bytes, in_bytes = call(i)
+        except Exception:
+            ok, out_bytes, in_bytes = False, 0, 0
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            errors += 0 if ok else 1
+            sent += out_bytes
+            received += in_bytes
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    report = summarize(latencies, time.perf_counter() - started, errors)
+    report["client_bytes_out"] = sent
+    report["client_bytes_in"] = received
+    return report
+
+
+def engine_caller():
+    from cbc_bot.engine import CBCEngine
+    engine = CBCEngine()
+
+    def call(i):
+        messages = conversation(i)
+        reply = engine.get_chat_response(messages)
+        return bool(reply) and not reply.startswith(ERROR_REPLY), len(json.dumps(messages)), len(reply or "")
+    return call, lambda: None
+
+
+def api_caller():
+    import requests
+    from .backend import start_backend
+
+    base_url, stop = start_backend()
+    local = threading.local()
+    url = f"{base_url}/chat"
+
+    def call(i):
+        if not hasattr(local, "session"): local.session = requests.Session()
+        body = json.dumps({"messages": conversation(i)}).encode("utf-8")
+        resp = local.session.post(url, data=body, headers={"Content-Type": "application/json"}, timeout=120)
+        ok = resp.status_code == 200 and not resp.json().get("content", "").startswith(ERROR_REPLY)
+        return ok, len(body), len(resp.content)
+    return call, stop
+
+
+def stage_rows() -> List[dict]:
+    from cbc_bot.metrics import PROVIDER_SECONDS, STAGE_SECONDS
+    rows = []
+    for (stage, outcome), (count, total) in sorted(STAGE_SECONDS.totals().items()):
+        rows.append({"stage": stage, "outcome": outcome, "count": count, "mean_ms": 1000 * total / count})
+    for (provider, outcome), (count, total) in sorted(PROVIDER_SECONDS.totals().items()):
+        rows.append({"stage": f"llm:{provider}", "outcome": outcome, "count": count, "mean_ms": 1000 * total / count})
+    return rows
+
+
+def add_stack_arguments(parser: argparse.ArgumentParser):
+    """Latency / error-injection options for the fakes, shared by the benchmark CLIs."""
+    parser.add_argument("--chunker", default="chars1500", help="How the fake Chroma corpus is chunked")
+    for service, default_ms in (("chroma", 40), ("hf", 60), ("llm", 400)):
+        parser.add_argument(f"--{service}-ms", type=float, default=default_ms, help=f"Mean {service} latency")
+        parser.add_argument(f"--{service}-error-rate", type=float, default=0.0, help=f"Share of {service} requests failed with 503")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="Uniform +/- jitter added to every fake")
+    parser.add_argument("--answer-chars", type=int, default=600)
+    parser.add_argument("--answer-cache-ttl", type=float, default=0.0,
+                        help="Cache successful answers for this many seconds (0 = off, measures the full pipeline)")
+    parser.add_argument("--retrieval-cache-ttl", type=float, default=0.0,
+                        help="Cache ranked retrievals for this many seconds (0 = off)")
+    parser.add_argument("--intent-routing", action="store_true",
+                        help="Answer greetings and FAQ questions locally, as production does")
+    parser.add_argument("--seed", type=int, default=7)
+
+
+def build_stack(args) -> FakeStack:
+    faults = {service: Faults(getattr(args, f"{service}_ms"), args.jitter_ms,
+                              getattr(args, f"{service}_error_rate"), seed=args.seed + n)
+              for n, service in enumerate(("chroma", "hf", "llm"))}
+    return FakeStack(faults["chroma"], faults["hf"], faults["llm"], answer_chars=args.answer_chars,
+                     answer_cache_ttl=args.answer_cache_ttl, retrieval_cache_ttl=args.retrieval_cache_ttl,
+                     intent_routing=args.intent_routing)
+
+
+def seed_stack(stack: FakeStack, chunker: str) -> int:
+    """Points cbc_bot at the running fakes and loads data/processed into the fake Chroma."""
+    stack.apply_env()
+    from cbc_bot.config import Config
+    from cbc_bot.registry import namespace_metadata
+    from .corpus import load_corpus
+
+    seeded = stack.seed(Config.COLLECTION_NAME, load_corpus(chunker, model_id=Config.EMBED_MODEL_ID),
+                        namespace_metadata(Config.EMBED_MODEL_ID))
+    print(f"Fakes: chroma={stack.chroma.url} hf={stack.hf.url} llm={stack.llm.url}; {seeded} chunks seeded")
+    return seeded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end chat benchmark.")
+    parser.add_argument("--target", choices=["engine", "api", "both"], default="both")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=5)
+    add_stack_arguments(parser)
+    parser.add_argument("--json", help="Also write the full report to this file")
+    args = parser.parse_args()
+
+    report = {"config": vars(args), "runs": {}}
+
+    with build_stack(args) as stack:
+        seed_stack(stack, args.chunker)
+        from cbc_bot import metrics
+
+        targets = ["engine", "api"] if args.target == "both" else [args.target]
+        for target in targets:
+            call, stop = engine_caller() if target == "engine" else api_caller()
+            try:
+                for i in range(args.warmup): call(i)
+                stack.reset_stats()
+                metrics.REGISTRY.reset()
+                run = run_closed_loop(call, args.requests, args.concurrency)
+            finally:
+                stop()
+            run["services"] = {s.name: dict(s.stats) for s in stack.servers}
+            prompts = stack.llm.prompt_chars
+            run["mean_prompt_chars"] = sum(prompts) / len(prompts) if prompts else 0
+            run["stages"] = stage_rows()
+            report["runs"][target] = run
+
+            print(f"\n=== {target}: {args.requests} requests, concurrency {args.concurrency} ===")
+            print(format_table([run], ["requests", "errors", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms"]))
+            print()
+            print(format_table([{"service": name, **stats} for name, stats in run["services"].items()],
+                               ["service", "requests", "bytes_in", "bytes_out", "injected_errors"]))
+            print(f"client bytes out/in: {run['client_bytes_out']}/{run['client_bytes_in']}, "
+                  f"mean LLM prompt: {run['mean_prompt_chars']:.0f} chars")
+            print()
+            print(format_table(run["stages"], ["stage", "outcome", "count", "mean_ms"]))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
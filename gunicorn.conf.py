@@ -0,0 +1,28 @@
+"""
+Multi-worker launch: gunicorn -c gunicorn.conf.py backend_main:app
+
+The app is imported once in the master (preload_app), which also loads the
+read-only retrieval state (mapped snapshot index, drill-term embeddings) and
+freezes the GC so forked workers share those pages instead of copying them.
+Each worker still builds its own engine, connection pools and warm-up after
+the fork, so no sockets are shared between processes.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(4, multiprocessing.cpu_count()))))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    import backend_main
+    backend_main.preload_shared_state()
+    # Objects allocated so far move to a permanent generation the collector never
+    # scans, so GC passes in the workers do not dirty (and copy) the shared pages
+    gc.freeze()
@@ -0,0 +1,23 @@
+import os
+import sys
+import argparse
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+from cbc_bot.config import Config
+from cbc_bot.tables import TableIndex, load_tables
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Extract the course-book and subject-combination tables from data/processed.")
+    parser.add_argument("--source", default=Config.PROCESSED_DIR, help="Directory of processed .txt files")
+    parser.add_argument("--output", default=Config.TABLES_PATH, help="JSON file the backend loads")
+    parser.add_argument("--ask", help="Print the table answer for a question after building")
+    args = parser.parse_args()
+
+    tables = load_tables(args.output, args.source, rebuild=True)
+    for name, rows in tables.items():
+        print(f"{name}: {len(rows)} rows from {len({row['source'] for row in rows})} files")
+    print(f"Saved to {args.output}")
+    if args.ask:
+        print(TableIndex(tables).answer(args.ask) or "(not a table question)")
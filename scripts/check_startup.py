@@ -0,0 +1,82 @@
+"""
+Import-time budget check for backend_main.
+
+Imports backend_main in fresh interpreters (`python -X importtime`) for each
+worker mode, reports the slowest modules and fails (exit code 1) if the import
+takes longer than the budget or pulls in a module that must stay lazy.
+
+    python scripts/check_startup.py --budget-ms 1500
+    python scripts/check_startup.py --modes chat --top 25
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Never imported at startup: extraction libraries and the heavy numeric stack load on first use
+LAZY_EVERYWHERE = ["PyPDF2", "trafilatura", "lxml", "numpy", "torch", "sentence_transformers", "chromadb"]
+# Chat-only workers additionally never load the ingestion API
+LAZY_IN_CHAT = ["cbc_bot.ingest_api", "cbc_bot.uploads", "cbc_bot.extraction", "cbc_bot.embeddings"]
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def measure(mode: str) -> dict:
+    """One cold import of backend_main; times are in microseconds."""
+    env = dict(os.environ, WORKER_MODE=mode, PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import backend_main"],
+                          cwd=REPO_DIR, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import backend_main failed in mode {mode}:\n{proc.stderr[-2000:]}")
+    modules = {}
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return modules
+
+
+def check_mode(mode: str, runs: int, budget_ms: float, top: int) -> bool:
+    samples = [measure(mode) for _ in range(runs)]
+    # Best of N: the least disturbed by other work on the machine
+    modules = min(samples, key=lambda m: m["backend_main"][1])
+    total_ms = modules["backend_main"][1] / 1000
+    forbidden = LAZY_EVERYWHERE + (LAZY_IN_CHAT if mode == "chat" else [])
+    leaked = [name for name in forbidden if name in modules]
+
+    print(f"\n=== WORKER_MODE={mode}: import backend_main {total_ms:.0f}ms "
+          f"(best of {runs}, budget {budget_ms:.0f}ms), {len(modules)} modules ===")
+    print(f"{'cumulative_ms':>13}  {'self_ms':>8}  module")
+    for name, (own, cumulative) in sorted(modules.items(), key=lambda item: -item[1][0])[:top]:
+        print(f"{cumulative / 1000:>13.1f}  {own / 1000:>8.1f}  {name}")
+
+    ok = True
+    if total_ms > budget_ms:
+        print(f"FAIL: {total_ms:.0f}ms is over the {budget_ms:.0f}ms budget")
+        ok = False
+    if leaked:
+        print(f"FAIL: imported at startup but must load lazily: {', '.join(leaked)}")
+        ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if importing backend_main is slow or loads lazy modules.")
+    parser.add_argument("--modes", default="all,chat", help="Comma-separated WORKER_MODE values to check")
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="Max import time of backend_main")
+    parser.add_argument("--runs", type=int, default=3, help="Cold imports per mode; the fastest is judged")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules (by self time) to list")
+    args = parser.parse_args()
+
+    results = [check_mode(mode.strip(), args.runs, args.budget_ms, args.top)
+               for mode in args.modes.split(",") if mode.strip()]
+    if not all(results):
+        sys.exit(1)
+    print("\nStartup check passed.")
+
+
+if __name__ == "__main__":
+    main()
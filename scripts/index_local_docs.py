@@ -1,12 +1,20 @@
+import argparse
 import os
+import sys
 import chromadb
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+from cbc_bot.local_pipeline import LocalIndexPipeline, iter_file_records, iter_hf_records
 
 # Load environment variables
 load_dotenv()
 
-def index_local_docs():
+# Vectors here are MiniLM, not the bge model the cloud retriever queries with; tag them
+MODEL_ID = "sentence-transformers/all-MiniLM-L6-v2"
+
+def index_local_docs(batch_size=512, workers=None, include_hf=False):
     # 1. Initialize LOCAL Chroma Client
     db_path = "./chroma_db"
     print(f"Connecting to local ChromaDB at {db_path}...")
@@ -14,54 +22,43 @@ def index_local_docs():
     
     # 2. Get or create collection
     collection_name = "Curriculumnpdfs"
-    collection = client.get_or_create_collection(name=collection_name)
-    
-    # 3. Load Embedding Model
-    print("Loading embedding model...")
-    model = SentenceTransformer('all-MiniLM-L6-v2')
+    collection = client.get_or_create_collection(name=collection_name, metadata={"embedding_model": MODEL_ID})
+    # get_or_create keeps the metadata of an existing collection; older local DBs were built untagged
+    tagged = (collection.metadata or {}).get("embedding_model")
+    if tagged and tagged != MODEL_ID:
+        print(f"Local collection holds {tagged} vectors, not {MODEL_ID}; delete {db_path} to rebuild it.")
+        return
+    if not tagged:
+        # Chroma rejects changes to the hnsw:* settings, so only the tag is added
+        kept = {k: v for k, v in (collection.metadata or {}).items() if not k.startswith("hnsw:")}
+        collection.modify(metadata={**kept, "embedding_model": MODEL_ID})
+        print(f"Tagged existing collection '{collection_name}' as {MODEL_ID}.")
     
-    # 4. Process text files from data/processed
+    # 3. Stream chunks from data/processed (and optionally the HF dataset) into one pipeline
     processed_dir = "data/processed"
     if not os.path.exists(processed_dir):
         print(f"Directory {processed_dir} not found!")
         return
 
-    for filename in os.listdir(processed_dir):
-        if filename.endswith(".txt"):
-            file_path = os.path.join(processed_dir, filename)
-            print(f"Indexing: {filename}")
-            
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-            # Improved chunking: group lines into segments of ~10 lines
-            lines = content.split('\n')
-            chunks = []
-            chunk_size = 15 # lines per chunk
-            for i in range(0, len(lines), chunk_size):
-                chunk = "\n".join(lines[i:i + chunk_size]).strip()
-                if chunk:
-                    chunks = [c for c in chunks if c] + [chunk]
-            
-            if not chunks:
-                continue
-                
-            ids = [f"local_{filename}_{i}" for i in range(len(chunks))]
-            metadatas = [{"source": filename, "type": "local_pdf"} for _ in range(len(chunks))]
-            
-            # Generate embeddings
-            embeddings = model.encode(chunks, show_progress_bar=False).tolist()
-            
-            # Upsert into Chroma
-            collection.upsert(
-                ids=ids,
-                documents=chunks,
-                embeddings=embeddings,
-                metadatas=metadatas
-            )
-            print(f"Successfully indexed {len(chunks)} chunks from {filename}")
+    def records():
+        yield from iter_file_records(processed_dir, MODEL_ID)
+        if include_hf:
+            from datasets import load_dataset
+            print("Dataset: Streaming 'JK-TK/webCbdataset'...")
+            yield from iter_hf_records(load_dataset("JK-TK/webCbdataset", split="train"), MODEL_ID)
+
+    # 4. Encode in worker processes while earlier batches are upserted
+    pipeline = LocalIndexPipeline(collection, MODEL_ID, batch_size=batch_size, workers=workers)
+    print(f"Encoding with {pipeline.workers} worker process(es), {batch_size} chunks per batch...")
+    stats = pipeline.run(records())
 
-    print("Index update complete!")
+    print(f"Index update complete! {stats['records']} chunks in {stats['elapsed_s']:.1f}s "
+          f"({stats['records'] / max(stats['elapsed_s'], 1e-6):.1f} chunks/s)")
 
 if __name__ == "__main__":
-    index_local_docs()
+    parser = argparse.ArgumentParser(description="Index data/processed into the local ChromaDB.")
+    parser.add_argument("--batch-size", type=int, default=512, help="Chunks per encode batch (across files)")
+    parser.add_argument("--workers", type=int, help="Encoder processes (default: half the cores, max 4)")
+    parser.add_argument("--include-hf", action="store_true", help="Also index the JK-TK/webCbdataset rows")
+    args = parser.parse_args()
+    index_local_docs(args.batch_size, args.workers, args.include_hf)
@@ -1,14 +1,19 @@
+import argparse
 import os
+import sys
 import chromadb
 import time
 from datasets import load_dataset
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+from cbc_bot.local_pipeline import LocalIndexPipeline, iter_hf_records
 
 # Load environment variables
 load_dotenv()
 
-def ingest_data():
+def ingest_data(batch_size=512, workers=None):
     start_time = time.time()
     
     # 1. Initialize LOCAL Chroma Client
@@ -22,49 +27,28 @@ def ingest_data():
     
     # We use a default embedding function for faster setup, 
     # but we will manually provide embeddings for better control.
-    collection = client.get_or_create_collection(name=collection_name)
+    model_id = "sentence-transformers/all-MiniLM-L6-v2"
+    collection = client.get_or_create_collection(name=collection_name, metadata={"embedding_model": model_id})
 
     # 3. Load Dataset from Hugging Face
     print("Dataset: Downloading 'JK-TK/webCbdataset'...")
     ds = load_dataset("JK-TK/webCbdataset", split="train")
     
-    # 4. Initialize Embedding Model
-    print("Model: Loading 'all-MiniLM-L6-v2'... (Fastest for local use)")
-    model = SentenceTransformer('all-MiniLM-L6-v2')
-
-    # 5. Process and Ingest in smaller batches for responsiveness
-    total_records = len(ds)
-    print(f"Start: Ingesting {total_records} records locally...")
-    
-    batch_size = 100
-    for i in range(0, total_records, batch_size):
-        batch_start = time.time()
-        batch = ds[i : i + batch_size]
-        
-        documents = batch["text"]
-        metadatas = [{"source": "huggingface", "index": i + j} for j in range(len(documents))]
-        ids = [f"hf_{i + j}" for j in range(len(documents))]
-
-        # Generate embeddings in bulk
-        embeddings = model.encode(documents, show_progress_bar=False).tolist()
-
-        # Add to local Chroma
-        collection.upsert(
-            ids=ids,
-            documents=documents,
-            embeddings=embeddings,
-            metadatas=metadatas
-        )
-        
-        batch_end = time.time()
-        progress = min(100, ((i + batch_size) / total_records) * 100)
-        print(f"Progress: [{progress:.1f}%] Processed {i + len(documents)}/{total_records} records. (Batch: {batch_end - batch_start:.2f}s)")
+    # 4. Encode in worker processes ('all-MiniLM-L6-v2', fastest for local use) while
+    #    the previous batch is upserted
+    pipeline = LocalIndexPipeline(collection, model_id, batch_size=batch_size, workers=workers)
+    print(f"Start: Ingesting {len(ds)} records locally with {pipeline.workers} encoder process(es)...")
+    stats = pipeline.run(iter_hf_records(ds, model_id))
 
     end_time = time.time()
-    print(f"Done: Local Ingestion complete! Total time: {end_time - start_time:.2f} seconds.")
+    print(f"Done: Local Ingestion complete! {stats['records']} records, total time: {end_time - start_time:.2f} seconds.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest JK-TK/webCbdataset into the local ChromaDB.")
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--workers", type=int, help="Encoder processes (default: half the cores, max 4)")
+    args = parser.parse_args()
     try:
-        ingest_data()
+        ingest_data(args.batch_size, args.workers)
     except Exception as e:
         print(f"Error: {e}")
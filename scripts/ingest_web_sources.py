@@ -33,6 +33,9 @@ if sys.platform == "win32":
 from dotenv import load_dotenv
 load_dotenv()
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+from cbc_bot.epoch import bump_epoch
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -493,6 +496,7 @@ def sync_to_cloud():
     
     print()
     print(f"✅ Synced {synced}/{len(files)} files to Chroma Cloud")
+    if synced: bump_epoch(f"web sources sync ({synced} files)")
     return True
 
 # ============================================================================
@@ -1,25 +1,142 @@
 
 import os
+import sys
+import argparse
 import requests
-import json
 from pathlib import Path
 from dotenv import load_dotenv
 
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+from cbc_bot.chroma import ChromaHTTPClient, BulkUpserter
+from cbc_bot.config import Config
+from cbc_bot.embeddings import EmbeddingPlanner
+from cbc_bot.epoch import bump_epoch
+from cbc_bot.tables import load_tables
+from cbc_bot.registry import CollectionRegistry, namespace_key, namespace_metadata, validate_collection, versioned_name
+
 load_dotenv()
 
+# Records added through the backend API rather than from data/processed
+UPLOAD_TYPES = ["cloud_upload", "url_ingest", "cloud_text"]
+PROBE_QUERY = "Grade 10 reporting date and placement"
+
+def chunk_content(content):
+    # Chunking: 1500 chars with 200 char overlap for better context retention
+    chunks = []
+    step = 1300
+    for i in range(0, len(content), step):
+        chunks.append(content[i:i+1500])
+    return chunks
+
+def index_processed_files(client, planner, collection_name):
+    """Embeds every file in data/processed into `collection_name`; returns the record count."""
+    processed_files = sorted(Path("data/processed").glob("*.txt"))
+    print(f"Indexing {len(processed_files)} high-quality files...")
+
+    total = 0
+    with BulkUpserter(client, collection_name) as writer:
+        for file_path in processed_files:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+
+            if len(content) < 50: continue
+
+            chunks = chunk_content(content)
+            print(f" -> {file_path.name} ({len(chunks)} chunks)")
+
+            # Embed using the ALIGNED format (no prefix), split into size-bounded batches
+            try:
+                embeddings = planner.embed(chunks)
+            except Exception as e:
+                print(f"    ❌ Embedding failed, skipping file: {e}")
+                continue
+
+            writer.add(
+                [f"aligned_{file_path.stem}_{i}" for i in range(len(chunks))],
+                embeddings,
+                chunks,
+                [{"source": file_path.name, "embedding_model": planner.model_id} for _ in range(len(chunks))]
+            )
+            total += len(chunks)
+
+    # Same source files, so refresh the structured tables chat answers lookups from
+    try:
+        load_tables(rebuild=True)
+    except Exception as e:
+        print(f"    ⚠️ Could not rebuild tables: {e}")
+    return total
+
+def carry_over_uploads(client, source_name, target_name, page_size=200):
+    """Copies admin uploads (files, URLs, pasted text) from the live collection into the rebuild."""
+    copied = 0
+    with BulkUpserter(client, target_name) as writer:
+        offset = 0
+        while True:
+            page = client.get(source_name, where={"type": {"$in": UPLOAD_TYPES}},
+                              include=["documents", "metadatas", "embeddings"], limit=page_size, offset=offset)
+            if not page.get("ids"): break
+            writer.add(page["ids"], page["embeddings"], page["documents"], page["metadatas"])
+            copied += len(page["ids"])
+            offset += page_size
+    if copied:
+        print(f"Carried over {copied} uploaded records from {source_name}.")
+    return copied
+
+def blue_green_rebuild():
+    """
+    Builds a new versioned collection while the current one keeps serving chat,
+    validates it, then switches the alias. The old collection is kept for rollback.
+    """
+    client = ChromaHTTPClient()
+    registry = CollectionRegistry(client)
+    planner = EmbeddingPlanner()
+    logical_name = Config.COLLECTION_NAME
+    live_name = registry.resolve_namespace(logical_name, planner.model_id)
+    new_name = versioned_name(logical_name, planner.model_id)
+
+    print(f"--- BLUE/GREEN REBUILD ---")
+    print(f"Live collection: {live_name}")
+    print(f"Building: {new_name}")
+    client.get_collection_id(new_name, metadata=namespace_metadata(planner.model_id))
+
+    expected = index_processed_files(client, planner, new_name)
+    if client.get_collection_id(live_name, create=False):
+        expected += carry_over_uploads(client, live_name, new_name)
+
+    ok, detail = validate_collection(client, new_name, expected, planner.embed([PROBE_QUERY])[0])
+    if not ok:
+        print(f"❌ Validation failed, alias NOT switched: {detail}")
+        print(f"   {live_name} is still serving. Inspect or delete {new_name} manually.")
+        return
+    print(f"✅ {detail}")
+
+    record = registry.set_namespace_alias(logical_name, planner.model_id, new_name, promote=True)
+    print(f"\n✅ '{logical_name}' now serves {new_name} (previous: {record['previous']}).")
+    print("   Roll back with: python scripts/master_db_reset.py --rollback")
+
+def rollback():
+    registry = CollectionRegistry()
+    # The retriever prefers the namespace alias for its model, so both are rolled back
+    for alias in (namespace_key(Config.COLLECTION_NAME, Config.EMBED_MODEL_ID), Config.COLLECTION_NAME):
+        try:
+            record = registry.rollback(alias)
+            print(f"✅ '{alias}' rolled back to {record['target']}.")
+        except ValueError as e:
+            print(f"Skipped: {e}")
+
 def master_reset():
     host = os.getenv('CHROMA_HOST', 'https://api.trychroma.com').rstrip('/')
     api_key = os.getenv('CHROMA_API_KEY')
     tenant = os.getenv('CHROMA_TENANT')
     database = os.getenv('CHROMA_DATABASE')
-    hf_token = os.getenv("HUGGINGFACE_TOKEN")
-    
+
     headers = {"x-chroma-token": api_key, "Content-Type": "application/json"}
     base_url = f"{host}/api/v2/tenants/{tenant}/databases/{database}"
     collection_name = "Curriculumnpdfs"
 
-    print(f"--- DATABASE MASTER RESET ---")
-    
+    print(f"--- DATABASE MASTER RESET (IN PLACE) ---")
+
     # 1. DELETE OLD COLLECTION
     print(f"Deleting collection: {collection_name}...")
     try:
@@ -35,62 +152,31 @@ def master_reset():
 
     # 2. CREATE FRESH COLLECTION
     print(f"Creating fresh collection: {collection_name}...")
-    resp = requests.post(f"{base_url}/collections", headers=headers, json={"name": collection_name})
-    
-    if resp.status_code not in [200, 201]:
-        print(f"ERROR: Collection creation failed (Status {resp.status_code}): {resp.text}")
-        # Try one more time to just GET the ID in case it was created but timed out
-        resp = requests.get(f"{base_url}/collections", headers=headers)
-        for coll in resp.json():
-            if coll['name'] == collection_name:
-                coll_id = coll['id']
-                print(f"Found existing collection ID instead: {coll_id}")
-                break
-        else:
-            return # Exit if we truly can't get an ID
-    else:
-        coll_id = resp.json()['id']
+    client = ChromaHTTPClient()
+    client.forget_collection(collection_name)
+    try:
+        coll_id = client.get_collection_id(collection_name)
         print(f"✅ New Collection ID: {coll_id}")
+    except Exception as e:
+        print(f"ERROR: Collection creation failed: {e}")
+        return
 
     # 3. RE-INDEX ALL PROCESSED DATA
-    processed_files = list(Path("data/processed").glob("*.txt"))
-    print(f"Indexing {len(processed_files)} high-quality files...")
+    index_processed_files(client, EmbeddingPlanner(), collection_name)
+    bump_epoch("master reset (in place)", client=client)
 
-    for file_path in processed_files:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-        
-        if len(content) < 50: continue
-
-        # Chunking: 1500 chars with 200 char overlap for better context retention
-        chunks = []
-        step = 1300
-        for i in range(0, len(content), step):
-            chunks.append(content[i:i+1500])
-
-        print(f" -> {file_path.name} ({len(chunks)} chunks)")
-
-        # Embed using the ALIGNED format (no prefix)
-        e_resp = requests.post(
-            "https://router.huggingface.co/hf-inference/models/BAAI/bge-small-en-v1.5",
-            headers={"Authorization": f"Bearer {hf_token}"},
-            json={"inputs": chunks, "options": {"wait_for_model": True}}
-        )
-        embeddings = e_resp.json()
-
-        # Uppert
-        requests.post(
-            f"{base_url}/collections/{coll_id}/upsert",
-            headers=headers,
-            json={
-                "ids": [f"aligned_{file_path.stem}_{i}" for i in range(len(chunks))],
-                "embeddings": embeddings,
-                "documents": chunks,
-                "metadatas": [{"source": file_path.name} for _ in range(len(chunks))]
-            }
-        )
-    
     print("\n✅ DATABASE RESET COMPLETE: All context is now aligned and searchable.")
 
 if __name__ == "__main__":
-    master_reset()
+    parser = argparse.ArgumentParser(description="Rebuild the Curriculumnpdfs knowledge base from data/processed.")
+    parser.add_argument("--in-place", action="store_true",
+                        help="Legacy mode: delete and recreate the collection (chat gets no context until done)")
+    parser.add_argument("--rollback", action="store_true", help="Point the alias back at the previous collection")
+    args = parser.parse_args()
+
+    if args.rollback:
+        rollback()
+    elif args.in_place:
+        master_reset()
+    else:
+        blue_green_rebuild()
@@ -1,82 +1,117 @@
-import chromadb
+import argparse
 import os
+import sys
 from dotenv import load_dotenv
-from chromadb.config import Settings
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+from cbc_bot.chroma import ChromaHTTPClient
+from cbc_bot.config import Config
+from cbc_bot.epoch import bump_epoch
+from cbc_bot.registry import CollectionRegistry, model_slug, namespace_key, namespace_metadata
+from cbc_bot.migration import (
+    ChromaSink, MigrationCheckpoint, iter_collection_pages, migrate_pages,
+    open_snapshot_pages, open_snapshot_writer, read_any_snapshot_header
+)
 
 load_dotenv()
 
-def migrate():
-    # 1. Local Client
-    local_db_path = "./chroma_db"
-    print(f"Reading from local DB: {local_db_path}")
-    local_client = chromadb.PersistentClient(path=local_db_path)
-    
-    try:
-        local_col = local_client.get_collection("Curriculumnpdfs")
-        count = local_col.count()
-        print(f"Local collection 'Curriculumnpdfs' has {count} items.")
-    except Exception as e:
-        print(f"Error accessing local collection: {e}")
-        return
+COLLECTION_NAME = "Curriculumnpdfs"
+# The only writer of ./chroma_db (index_local_docs.py) has always used MiniLM; early versions did not tag it
+LOCAL_DB_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
-    # 2. Cloud Client
-    host_url = os.getenv('CHROMA_HOST', 'https://api.trychroma.com')
-    api_key = os.getenv('CHROMA_API_KEY')
-    tenant = os.getenv('CHROMA_TENANT', 'default_tenant')
-    database = os.getenv('CHROMA_DATABASE', 'default_database')
+def migrate(from_snapshot=None, to_snapshot=None, page_size=500,
+            checkpoint_path=".migrate_checkpoint.json", restart=False, model_id=None):
+    # 1. Source: local DB (default) or a snapshot file
+    if from_snapshot:
+        header = read_any_snapshot_header(from_snapshot)
+        source = f"snapshot:{os.path.abspath(from_snapshot)}"
+        print(f"Reading from snapshot: {from_snapshot} (collection '{header.get('collection')}')")
+        source_model = header.get("model_id")
+    else:
+        import chromadb
+        local_db_path = "./chroma_db"
+        print(f"Reading from local DB: {local_db_path}")
+        local_client = chromadb.PersistentClient(path=local_db_path)
+        try:
+            local_col = local_client.get_collection(COLLECTION_NAME)
+            print(f"Local collection '{COLLECTION_NAME}' has {local_col.count()} items.")
+            source_model = (local_col.metadata or {}).get("embedding_model") or LOCAL_DB_MODEL
+        except Exception as e:
+            print(f"Error accessing local collection: {e}")
+            return
+        source = f"local:{os.path.abspath(local_db_path)}"
 
-    print(f"Connecting to Cloud: {host_url}")
-    print(f"Tenant: {tenant}, DB: {database}")
+    # Vectors are copied as-is, so they must land in the namespace of the model that made them. Every model
+    # here is 384-dim, so a wrong guess would silently mix vector spaces: untagged sources need --model-id
+    if not model_id and not source_model:
+        print("ERROR: the source does not record its embedding model (snapshots written before model tagging "
+              "don't). Pass --model-id with the model that produced these vectors.")
+        return
+    model_id = model_id or source_model
+    print(f"Source vectors: {model_id}")
 
-    # Remove https:// for host argument if needed, or keep it. 
-    # Newer HttpClient handles it, but safer to strip protocol if it causes issues, 
-    # though usually with ssl=True, host is just the domain.
-    # However, let's try the direct settings approach.
-    
-    # Chroma Cloud Auth (Direct Header)
-    cloud_client = chromadb.HttpClient(
-        host=host_url.replace("https://", "").replace("http://", ""),
-        ssl=True,
-        tenant=tenant,
-        database=database,
-        headers={
-            "x-chroma-token": api_key,
-            "Content-Type": "application/json"
-        }
-    )
+    # 2. Destination: Chroma Cloud (default) or a snapshot file
+    if to_snapshot:
+        destination = f"snapshot:{os.path.abspath(to_snapshot)}"
+    else:
+        cloud_client = ChromaHTTPClient()
+        print(f"Connecting to Cloud: {cloud_client.host}")
+        print(f"Tenant: {cloud_client.tenant}, DB: {cloud_client.database}")
+        registry = CollectionRegistry(cloud_client)
+        if model_id == Config.EMBED_MODEL_ID:
+            target_name = registry.resolve_namespace(COLLECTION_NAME, model_id)
+        else:
+            # Not the model chat queries with: park it in its own namespace
+            alias = registry.get_alias(namespace_key(COLLECTION_NAME, model_id), use_cache=False)
+            target_name = alias["target"] if alias else f"{COLLECTION_NAME}__{model_slug(model_id)}"
+            if not alias:
+                registry.set_namespace_alias(COLLECTION_NAME, model_id, target_name)
+            print(f"NOTE: {model_id} vectors go to '{target_name}'. They are not served to chat until")
+            print(f"      re-embedded: python scripts/reembed_namespace.py --source {target_name}")
+        print(f"Getting/Creating Cloud Collection '{target_name}'...")
+        cloud_client.get_collection_id(
+            target_name,
+            metadata=namespace_metadata(model_id) # Cosine distance + embedding model tag
+        )
+        destination = f"chroma:{cloud_client.base_url}/{target_name}"
 
-    # 3. Cloud Collection
-    print("Getting/Creating Cloud Collection...")
-    cloud_col = cloud_client.get_or_create_collection(
-        name="Curriculumnpdfs",
-        metadata={"hnsw:space": "cosine"} # Ensure valid distance metric
-    )
+    # 3. Resume from the last confirmed page unless asked to start over
+    checkpoint = MigrationCheckpoint(checkpoint_path, source, destination)
+    if restart:
+        checkpoint.clear()
+    after_id = checkpoint.load()
+    if after_id is not None:
+        print(f"Resuming after id '{after_id}' ({checkpoint.migrated} items already migrated).")
 
-    # 4. Migrate Data
-    print("Fetching local data...")
-    # Fetch all data
-    data = local_col.get(include=["documents", "metadatas", "embeddings"])
-    
-    total_items = len(data['ids'])
-    if total_items == 0:
-        print("No data to migrate.")
-        return
+    if from_snapshot:
+        pages = open_snapshot_pages(from_snapshot, page_size=page_size, after_id=after_id)
+    else:
+        pages = iter_collection_pages(local_col, page_size=page_size, after_id=after_id)
 
-    print(f"Starting migration of {total_items} items...")
-    
-    batch_size = 50
-    for i in range(0, total_items, batch_size):
-        end = min(i + batch_size, total_items)
-        print(f"Upserting batch {i+1}-{end} / {total_items}...")
-        
-        cloud_col.upsert(
-            ids=data['ids'][i:end],
-            embeddings=data['embeddings'][i:end], # Use existing embeddings to save cost/time
-            documents=data['documents'][i:end],
-            metadatas=data['metadatas'][i:end]
-        )
+    if to_snapshot:
+        sink = open_snapshot_writer(to_snapshot, COLLECTION_NAME, model_id, resume_after=after_id)
+    else:
+        sink = ChromaSink(cloud_client, target_name)
 
-    print("Migration completed successfully!")
+    # 4. Stream pages: the next page is read while the current one is written
+    print(f"Starting migration in pages of {page_size}...")
+    migrated = migrate_pages(pages, sink, checkpoint)
+    checkpoint.clear()
+    if not to_snapshot and model_id == Config.EMBED_MODEL_ID:
+        bump_epoch(f"migrate {source}", client=cloud_client)
+    print(f"Migration completed successfully! ({migrated} items this run)")
 
 if __name__ == "__main__":
-    migrate()
+    parser = argparse.ArgumentParser(description="Stream the Curriculumnpdfs collection between local DB, snapshot files and Chroma Cloud.")
+    parser.add_argument("--from-snapshot", help="Read records from this snapshot file instead of ./chroma_db")
+    parser.add_argument("--to-snapshot", help="Write records to this snapshot file instead of Chroma Cloud "
+                                              "(.cbcsnap = compact float16/zstd format, anything else = JSON lines)")
+    parser.add_argument("--model-id",
+                        help="Embedding model of the source vectors (default: read from the source; "
+                             f"required for untagged snapshots, an untagged ./chroma_db is {LOCAL_DB_MODEL})")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--checkpoint", default=".migrate_checkpoint.json")
+    parser.add_argument("--restart", action="store_true", help="Ignore any saved checkpoint")
+    args = parser.parse_args()
+    migrate(args.from_snapshot, args.to_snapshot, args.page_size, args.checkpoint, args.restart, args.model_id)
@@ -0,0 +1,31 @@
+import os
+import sys
+import argparse
+from dotenv import load_dotenv
+
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+from cbc_bot.config import Config
+from cbc_bot.embeddings import EmbeddingPlanner
+from cbc_bot.reembed import ReembedWorker
+
+load_dotenv()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Re-embed the knowledge base into a new model namespace while the current one keeps serving.")
+    parser.add_argument("--target-model", default=Config.EMBED_MODEL_ID,
+                        help="HF model ID to re-embed with (default: the configured EMBED_MODEL_ID)")
+    parser.add_argument("--source", help="Physical collection to read (default: whatever Curriculumnpdfs points at)")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--promote", action="store_true",
+                        help="Also point the plain Curriculumnpdfs alias at the new namespace. "
+                             "Only do this once EMBED_MODEL_ID is set to the target model everywhere.")
+    args = parser.parse_args()
+
+    worker = ReembedWorker(EmbeddingPlanner(model_id=args.target_model), source_collection=args.source,
+                           page_size=args.page_size, promote=args.promote)
+    worker.start()
+    worker.join()
+    print(worker.status())
+    sys.exit(0 if worker.state == "done" else 1)
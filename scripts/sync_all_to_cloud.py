@@ -12,6 +12,9 @@ if sys.platform == "win32":
 
 load_dotenv()
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+from cbc_bot.epoch import bump_epoch
+
 def sync_all():
     host = "https://api.trychroma.com"
     api_key = os.getenv('CHROMA_API_KEY')
@@ -81,5 +84,8 @@ def sync_all():
         else:
             print(f"❌ {filename}: Embedding failed ({e_resp.status_code})")
 
+    # 3. Tell chat workers the corpus changed so their caches stop serving the old one
+    bump_epoch(f"sync_all_to_cloud ({len(files)} files)")
+
 if __name__ == "__main__":
     sync_all()
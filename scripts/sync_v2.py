@@ -1,9 +1,17 @@
 
 import os
+import sys
 import requests
 import json
 from dotenv import load_dotenv
 
+# Add src to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
+from cbc_bot.chroma import ChromaHTTPClient
+from cbc_bot.config import Config
+from cbc_bot.epoch import bump_epoch
+from cbc_bot.registry import CollectionRegistry
+
 load_dotenv()
 
 def sync_final():
@@ -18,26 +26,13 @@ def sync_final():
         "Content-Type": "application/json"
     }
 
-    # 1. Get Collection via v2 API
+    # 1. Get the collection serving our embedding model (never mix MiniLM and bge vectors)
     base_url = f"{host}/api/v2/tenants/{tenant}/databases/{database}"
+    client = ChromaHTTPClient(host=host, api_key=api_key, tenant=tenant, database=database)
+    collection_name = CollectionRegistry(client).resolve_namespace(Config.COLLECTION_NAME, Config.EMBED_MODEL_ID)
     
-    print(f"Syncing to Chroma Cloud v2...")
-    resp = requests.get(f"{base_url}/collections", headers=headers)
-    if resp.status_code != 200:
-        print(f"Error listing collections: {resp.status_code}")
-        return
-
-    collections = resp.json()
-    coll_id = None
-    for coll in collections:
-        if coll['name'] == "Curriculumnpdfs":
-            coll_id = coll['id']
-            break
-    
-    if not coll_id:
-        print("Creating collection...")
-        resp = requests.post(f"{base_url}/collections", headers=headers, json={"name": "Curriculumnpdfs"})
-        coll_id = resp.json()['id']
+    print(f"Syncing to Chroma Cloud v2 ({collection_name})...")
+    coll_id = client.get_collection_id(collection_name)
 
     # 2. Embed using the confirmed working endpoint
     content = """The Kenya Junior Secondary Education Assessment (KJSEA) is the national assessment replacing the KCPE. 
@@ -50,7 +45,7 @@ def sync_final():
     
     print("Embedding context...")
     e_resp = requests.post(
-        "https://router.huggingface.co/hf-inference/models/sentence-transformers/all-MiniLM-L6-v2",
+        f"https://router.huggingface.co/hf-inference/models/{Config.EMBED_MODEL_ID}",
         headers={"Authorization": f"Bearer {hf_token}"},
         json={"inputs": [content], "options": {"wait_for_model": True}}
     )
@@ -70,12 +65,13 @@ def sync_final():
             "ids": ["knowledge_kjsea"],
             "embeddings": [embedding],
             "documents": [content],
-            "metadatas": [{"source": "manual_sync"}]
+            "metadatas": [{"source": "manual_sync", "embedding_model": Config.EMBED_MODEL_ID}]
         }
     )
     
     if u_resp.status_code == 200:
         print("✅ SUCCESS! Knowledge is now in Chroma Cloud.")
+        bump_epoch("sync_v2 knowledge_kjsea", client=client)
     else:
         print(f"Upsert failed: {u_resp.text}")
 
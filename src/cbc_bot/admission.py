@@ -0,0 +1,130 @@
+"""
+Admission control for the async request handlers.
+
+At most `max_concurrent` requests hold a slot at a time. The rest wait in a
+bounded queue that is served round-robin across clients, so a single chatty
+client cannot starve everyone else. A request is shed immediately (and the
+handler answers 503 with Retry-After) when the queue is full, when its client
+already has too many requests waiting, or when the estimated wait (queue
+position x recent service time / slots) would exceed `queue_timeout`. A
+request that is still queued when `queue_timeout` runs out is shed too.
+
+All state is touched only from the event loop, so no locks are needed.
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+from .metrics import ADMISSION_ACTIVE, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS
+
+
+class Overloaded(Exception):
+    """Raised instead of admitting a request; `retry_after` is in whole seconds."""
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server busy ({reason}); retry in {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, route: str, max_concurrent: int, max_queue: int, queue_timeout: float,
+                 max_queued_per_client: Optional[int] = None):
+        self.route = route
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.max_queued_per_client = max_queued_per_client or self.max_queue
+        self.active = 0
+        self.queued = 0
+        # client -> waiting futures; the dict order is the round-robin order
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        # Exponentially weighted service time of admitted requests; None until one completes
+        self.service_time: Optional[float] = None
+
+    def estimated_wait(self, position: int) -> float:
+        if self.service_time is None: return 0.0
+        return math.ceil(position / self.max_concurrent) * self.service_time
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self.estimated_wait(self.queued + 1)))
+
+    def _shed(self, reason: str):
+        ADMISSION_REJECTED.inc(route=self.route, reason=reason)
+        raise Overloaded(reason, self._retry_after())
+
+    def _publish(self):
+        ADMISSION_ACTIVE.set(self.active, route=self.route)
+        ADMISSION_QUEUE_DEPTH.set(self.queued, route=self.route)
+
+    async def acquire(self, client: str):
+        if self.active < self.max_concurrent and not self.queued:
+            self.active += 1
+            self._publish()
+            ADMISSION_WAIT_SECONDS.observe(0.0, route=self.route)
+            return
+
+        if self.queued >= self.max_queue: self._shed("queue_full")
+        waiting = self._queues.get(client)
+        if waiting and len(waiting) >= self.max_queued_per_client: self._shed("client_limit")
+        if self.estimated_wait(self.queued + 1) > self.queue_timeout: self._shed("deadline")
+
+        future = asyncio.get_running_loop().create_future()
+        if waiting is None: waiting = self._queues[client] = deque()
+        waiting.append(future)
+        self.queued += 1
+        self._publish()
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._dequeue(client, future)
+            self._shed("timeout")
+        except asyncio.CancelledError:
+            # Client went away: give back a slot that was granted in the meantime
+            if future.done() and not future.cancelled(): self.release()
+            else: self._dequeue(client, future)
+            raise
+        ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - started, route=self.route)
+
+    def _dequeue(self, client: str, future: asyncio.Future):
+        waiting = self._queues.get(client)
+        if waiting is None or future not in waiting: return
+        waiting.remove(future)
+        if not waiting: del self._queues[client]
+        self.queued -= 1
+        self._publish()
+
+    def release(self, service_time: Optional[float] = None):
+        if service_time is not None:
+            self.service_time = service_time if self.service_time is None else \
+                0.8 * self.service_time + 0.2 * service_time
+        self.active -= 1
+        # Hand the slot to the next client in round-robin order
+        while self._queues and self.active < self.max_concurrent:
+            client, waiting = next(iter(self._queues.items()))
+            future = waiting.popleft()
+            self.queued -= 1
+            if waiting: self._queues.move_to_end(client)
+            else: del self._queues[client]
+            if future.done(): continue
+            future.set_result(None)
+            self.active += 1
+        self._publish()
+
+    @asynccontextmanager
+    async def slot(self, client: str):
+        await self.acquire(client)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+
+def client_key(headers, peer: Optional[str]) -> str:
+    """First X-Forwarded-For hop (Render and Vercel proxy every request), else the socket peer."""
+    forwarded = headers.get("x-forwarded-for", "")
+    return forwarded.split(",")[0].strip() or peer or "unknown"
@@ -0,0 +1,233 @@
+"""
+Two-tier cache: an in-process LRU in front of a shared SQLite file.
+
+Every worker on the box (and every restart, as long as the file survives)
+reads the same SQLite store, so a query embedded or answered by one worker is
+a hit for the others. Keys are namespaced and versioned: the version is a
+callable (e.g. the live corpus epoch), so a new corpus simply stops matching
+old entries and they age out through the size-bounded eviction. Values are
+JSON. Lookups and writes are batched (`get_many` / `set_many`), one SQLite
+transaction per batch.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .config import Config
+from .metrics import record_cache
+
+_MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._items: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None: return default
+            value, expires = item
+            if expires and expires < time.time():
+                del self._items[key]
+                return default
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, expires: float = 0.0):
+        if self.max_items <= 0: return
+        with self._lock:
+            self._items[key] = (value, expires)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SQLiteStore:
+    """
+    Shared key/value store on a local SQLite file (WAL mode, safe across processes).
+    When the stored values exceed `max_bytes`, the least recently read entries are
+    evicted down to 90% of the budget.
+    """
+    def __init__(self, path: str, max_bytes: int, check_every: int = 200):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.check_every = check_every
+        self._writes = 0
+        self._local = threading.local()
+        if os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                       "size INTEGER NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+
+    def _connect(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        # Connections must not cross a fork: a preloaded parent's handle is reopened in the child
+        if db is None or self._local.pid != os.getpid():
+            db = self._local.db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            self._local.pid = os.getpid()
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def get_many(self, keys: List[str]) -> Dict[str, Tuple[str, float]]:
+        """key -> (JSON text, expiry) for the live entries among `keys`."""
+        if not keys: return {}
+        now = time.time()
+        db = self._connect()
+        found = {}
+        for start in range(0, len(keys), 500):
+            part = keys[start:start + 500]
+            marks = ",".join("?" * len(part))
+            rows = db.execute(f"SELECT key, value, expires FROM entries WHERE key IN ({marks})", part).fetchall()
+            found.update({key: (value, expires) for key, value, expires in rows if not expires or expires >= now})
+        if found:
+            # Coarse recency for eviction; a failed update only costs eviction accuracy
+            try:
+                db.executemany("UPDATE entries SET accessed = ? WHERE key = ?", [(now, key) for key in found])
+            except sqlite3.OperationalError:
+                pass
+        return found
+
+    def set_many(self, items: List[Tuple[str, str, float]]):
+        """Writes (key, JSON text, expiry) rows in one transaction."""
+        if not items: return
+        now = time.time()
+        db = self._connect()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany("INSERT OR REPLACE INTO entries (key, value, size, expires, accessed) VALUES (?, ?, ?, ?, ?)",
+                           [(key, value, len(key) + len(value), expires, now) for key, value, expires in items])
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self._writes += len(items)
+        if self._writes >= self.check_every:
+            self._writes = 0
+            self.evict()
+
+    def evict(self) -> int:
+        """Drops expired entries, then the least recently read ones while over budget."""
+        db = self._connect()
+        removed = db.execute("DELETE FROM entries WHERE expires > 0 AND expires < ?", (time.time(),)).rowcount
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total > self.max_bytes:
+            # Shortest least-recently-read prefix (ties broken by insertion order) that frees enough
+            excess = total - int(self.max_bytes * 0.9)
+            removed += db.execute(
+                "DELETE FROM entries WHERE rowid IN (SELECT rid FROM (SELECT rowid AS rid, size, "
+                "SUM(size) OVER (ORDER BY accessed, rowid) AS running FROM entries) WHERE running - size < ?)",
+                (excess,)).rowcount
+        return removed
+
+    def size_bytes(self) -> int:
+        return self._connect().execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+
+class TwoTierCache:
+    """
+    LRU in front of an optional shared store. `version` is called on every batch;
+    its value is part of each key, so bumping it invalidates all entries at once.
+    """
+    def __init__(self, name: str, store: Optional[SQLiteStore] = None, lru_items: int = 1024,
+                 ttl: float = 0.0, version: Optional[Callable[[], str]] = None):
+        self.name = name
+        self.store = store
+        self.lru = LRUCache(lru_items)
+        self.ttl = ttl
+        self.version = version or (lambda: "")
+
+    def _current_version(self) -> Optional[str]:
+        """None when the version cannot be determined; the cache is then bypassed."""
+        try:
+            return str(self.version())
+        except Exception as e:
+            print(f"Cache {self.name}: version lookup failed, bypassing: {e}")
+            return None
+
+    def _full_key(self, version: str, key: str) -> str:
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return f"{self.name}:{version}:{digest}"
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Values for the keys that are cached, looked up in the LRU first, then in one store query."""
+        version = self._current_version()
+        if version is None: return {}
+        full = {key: self._full_key(version, key) for key in dict.fromkeys(keys)}
+        found, misses = {}, []
+        for key, full_key in full.items():
+            value = self.lru.get(full_key, _MISSING)
+            if value is _MISSING: misses.append(key)
+            else: found[key] = value
+        for key in full: record_cache(f"{self.name}_lru", key in found)
+
+        if misses and self.store is not None:
+            try:
+                rows = self.store.get_many([full[key] for key in misses])
+            except sqlite3.Error as e:
+                print(f"Cache {self.name}: shared store read failed: {e}")
+                rows = {}
+            for key in misses:
+                row = rows.get(full[key])
+                record_cache(f"{self.name}_shared", row is not None)
+                if row is None: continue
+                found[key] = json.loads(row[0])
+                self.lru.set(full[key], found[key], row[1])
+        return found
+
+    def get(self, key: str, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None):
+        if not items: return
+        version = self._current_version()
+        if version is None: return
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.time() + ttl if ttl else 0.0
+        rows = []
+        for key, value in items.items():
+            full_key = self._full_key(version, key)
+            self.lru.set(full_key, value, expires)
+            rows.append((full_key, json.dumps(value, separators=(",", ":")), expires))
+        if self.store is not None:
+            try:
+                self.store.set_many(rows)
+            except sqlite3.Error as e:
+                print(f"Cache {self.name}: shared store write failed: {e}")
+
+    def set(self, key: str, value, ttl: Optional[float] = None):
+        self.set_many({key: value}, ttl)
+
+
+_store: Optional[SQLiteStore] = None
+_store_lock = threading.Lock()
+
+
+def shared_store() -> Optional[SQLiteStore]:
+    """The process-wide store at Config.CACHE_PATH, or None when the shared tier is disabled."""
+    global _store
+    if not Config.CACHE_PATH: return None
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = SQLiteStore(Config.CACHE_PATH, Config.CACHE_MAX_MB * 1024 * 1024)
+            except sqlite3.Error as e:
+                print(f"Shared cache disabled ({Config.CACHE_PATH}): {e}")
+                return None
+        return _store
@@ -0,0 +1,253 @@
+"""
+Chroma v2 REST client used by the ingestion paths.
+Collection IDs are resolved once per process, and writes go through
+BulkUpserter, which sizes batches by payload bytes and keeps several in flight.
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import Config
+from .metrics import record_cache
+
+
+class ChromaHTTPClient:
+    # (base_url, collection name) -> collection id, shared by every client in the process
+    _collection_ids: Dict[Tuple[str, str], str] = {}
+    _collection_meta: Dict[Tuple[str, str], dict] = {}
+    _ids_lock = threading.Lock()
+
+    def __init__(self, host: Optional[str] = None, api_key: Optional[str] = None,
+                 tenant: Optional[str] = None, database: Optional[str] = None):
+        self.host = (host or os.getenv('CHROMA_HOST', 'https://api.trychroma.com')).rstrip('/')
+        self.api_key = api_key or os.getenv('CHROMA_API_KEY')
+        self.tenant = tenant or os.getenv('CHROMA_TENANT', 'default_tenant')
+        self.database = database or os.getenv('CHROMA_DATABASE', 'default_database')
+        self.headers = {
+            "x-chroma-token": self.api_key,
+            "Content-Type": "application/json"
+        }
+        self.base_url = f"{self.host}/api/v2/tenants/{self.tenant}/databases/{self.database}"
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_maxsize=max(10, Config.CHROMA_MAX_IN_FLIGHT * 2))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get_collection_id(self, name: str, create: bool = True, metadata: Optional[dict] = None) -> Optional[str]:
+        key = (self.base_url, name)
+        cached = self._collection_ids.get(key)
+        record_cache("collection_id", bool(cached))
+        if cached: return cached
+
+        with self._ids_lock:
+            if key in self._collection_ids:
+                return self._collection_ids[key]
+            url = f"{self.base_url}/collections"
+            resp = self.session.get(url, timeout=30)
+            resp.raise_for_status()
+            match = next((coll for coll in resp.json() if coll['name'] == name), None)
+            if match is None and create:
+                body = {"name": name}
+                if metadata: body["metadata"] = metadata
+                create_resp = self.session.post(url, json=body, timeout=30)
+                create_resp.raise_for_status()
+                match = create_resp.json()
+            if match:
+                self._collection_ids[key] = match['id']
+                self._collection_meta[key] = match.get('metadata') or {}
+                return match['id']
+            return None
+
+    def get_collection_metadata(self, name: str) -> dict:
+        """Collection-level metadata (e.g. embedding_model), cached with the ID."""
+        if not self.get_collection_id(name, create=False): return {}
+        return self._collection_meta.get((self.base_url, name), {})
+
+    def forget_collection(self, name: str):
+        """Drops a cached collection ID, e.g. after the collection was deleted."""
+        with self._ids_lock:
+            self._collection_ids.pop((self.base_url, name), None)
+            self._collection_meta.pop((self.base_url, name), None)
+
+    def upsert_batch(self, collection_name: str, payload: dict) -> dict:
+        """Sends one upsert request. Safe to repeat: upserts are keyed by ID."""
+        coll_id = self.get_collection_id(collection_name)
+        response = self.session.post(f"{self.base_url}/collections/{coll_id}/upsert", json=payload, timeout=120)
+        if response.status_code == 404:
+            self.forget_collection(collection_name)
+        response.raise_for_status()
+        return response.json()
+
+    def upsert(self, collection_name: str, ids: List[str], embeddings: List[List[float]],
+               documents: List[str], metadatas: List[dict]) -> dict:
+        with BulkUpserter(self, collection_name) as writer:
+            writer.add(ids, embeddings, documents, metadatas)
+        return writer.stats
+
+    def count(self, collection_name: str) -> int:
+        coll_id = self.get_collection_id(collection_name, create=False)
+        if not coll_id: return 0
+        resp = self.session.get(f"{self.base_url}/collections/{coll_id}/count", timeout=30)
+        resp.raise_for_status()
+        return int(resp.json())
+
+    def query(self, collection_name: str, query_embeddings: List[List[float]], n_results: int,
+              include: Optional[List[str]] = None, timeout: int = 30) -> dict:
+        coll_id = self.get_collection_id(collection_name, create=False)
+        if not coll_id: return {}
+        resp = self.session.post(f"{self.base_url}/collections/{coll_id}/query", json={
+            "query_embeddings": query_embeddings,
+            "n_results": n_results,
+            "include": include or ["documents", "metadatas"]
+        }, timeout=timeout)
+        if resp.status_code == 404:
+            self.forget_collection(collection_name)
+        resp.raise_for_status()
+        return resp.json()
+
+    def get(self, collection_name: str, ids: Optional[List[str]] = None, where: Optional[dict] = None,
+            include: Optional[List[str]] = None, limit: Optional[int] = None, offset: Optional[int] = None) -> dict:
+        coll_id = self.get_collection_id(collection_name, create=False)
+        if not coll_id: return {"ids": []}
+        body = {"include": include if include is not None else ["documents", "metadatas"]}
+        if ids is not None: body["ids"] = ids
+        if where: body["where"] = where
+        if limit is not None: body["limit"] = limit
+        if offset is not None: body["offset"] = offset
+        resp = self.session.post(f"{self.base_url}/collections/{coll_id}/get", json=body, timeout=60)
+        resp.raise_for_status()
+        return resp.json()
+
+    def has_content_hash(self, collection_name: str, content_hash: str) -> bool:
+        """True if any stored chunk was indexed from a file with this SHA-256."""
+        try:
+            coll_id = self.get_collection_id(collection_name)
+            resp = self.session.post(f"{self.base_url}/collections/{coll_id}/get", json={
+                "where": {"content_hash": content_hash},
+                "limit": 1,
+                "include": []
+            }, timeout=10)
+            resp.raise_for_status()
+            return bool(resp.json().get("ids"))
+        except Exception as e:
+            print(f"Duplicate check failed, indexing anyway: {e}")
+            return False
+
+
+class BulkUpserter:
+    """
+    Buffers records and writes them in batches bounded by serialized bytes and
+    record count, with up to `max_in_flight` requests running concurrently.
+    Failed batches are retried individually. `flush_async()` returns a Future
+    (usable with asyncio.wrap_future) that resolves once everything is written.
+    """
+    def __init__(self, client: ChromaHTTPClient, collection_name: str,
+                 max_batch_bytes: int = Config.CHROMA_BATCH_BYTES, max_batch_items: int = Config.CHROMA_BATCH_ITEMS,
+                 max_in_flight: int = Config.CHROMA_MAX_IN_FLIGHT, max_retries: int = 3):
+        self.client = client
+        self.collection_name = collection_name
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_items = max_batch_items
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.stats = {"records": 0, "batches": 0, "bytes": 0, "retries": 0}
+
+        self._pool = ThreadPoolExecutor(max_workers=max_in_flight)
+        self._slots = threading.BoundedSemaphore(max_in_flight * 2)
+        self._lock = threading.Lock()
+        self._outstanding: List[Future] = []
+        self._pending: List[tuple] = []
+        self._pending_bytes = 0
+
+    def add(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[dict]):
+        for record_id, embedding, document, metadata in zip(ids, embeddings, documents, metadatas):
+            if hasattr(embedding, "tolist"): embedding = embedding.tolist()
+            record = (record_id, embedding, document, metadata)
+            size = _record_bytes(*record)
+            if self._pending and (self._pending_bytes + size > self.max_batch_bytes
+                                  or len(self._pending) >= self.max_batch_items):
+                self._submit()
+            self._pending.append(record)
+            self._pending_bytes += size
+
+    def _submit(self):
+        batch, size = self._pending, self._pending_bytes
+        self._pending, self._pending_bytes = [], 0
+        # Backpressure: never queue more than 2x max_in_flight batches in memory
+        self._slots.acquire()
+        future = self._pool.submit(self._send, batch, size)
+        future.add_done_callback(lambda _: self._slots.release())
+        with self._lock:
+            self._outstanding.append(future)
+
+    def _send(self, batch: List[tuple], size: int):
+        ids, embeddings, documents, metadatas = (list(col) for col in zip(*batch))
+        payload = {"ids": ids, "embeddings": embeddings, "documents": documents, "metadatas": metadatas}
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.client.upsert_batch(self.collection_name, payload)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise RuntimeError(f"Upsert of {len(ids)} records ({ids[0]}..) failed: {e}")
+                with self._lock:
+                    self.stats["retries"] += 1
+                time.sleep(min(2 ** attempt, 8) * 0.5)
+        with self._lock:
+            self.stats["records"] += len(ids)
+            self.stats["batches"] += 1
+            self.stats["bytes"] += size
+
+    def flush_async(self) -> Future:
+        """Submits any buffered records and returns a Future for all outstanding writes."""
+        if self._pending:
+            self._submit()
+        with self._lock:
+            waiting, self._outstanding = self._outstanding, []
+        done: Future = Future()
+        remaining = [len(waiting)]
+        errors = []
+
+        def _on_done(f: Future):
+            if f.exception(): errors.append(f.exception())
+            with self._lock:
+                remaining[0] -= 1
+                finished = remaining[0] == 0
+            if finished:
+                if errors: done.set_exception(errors[0])
+                else: done.set_result(dict(self.stats))
+
+        if not waiting:
+            done.set_result(dict(self.stats))
+        for f in waiting:
+            f.add_done_callback(_on_done)
+        return done
+
+    def flush(self) -> dict:
+        return self.flush_async().result()
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._pool.shutdown(wait=True)
+
+
+def _record_bytes(record_id: str, embedding: List[float], document: str, metadata: dict) -> int:
+    return len(record_id) + len(json.dumps(embedding)) + len(document.encode("utf-8")) + len(json.dumps(metadata)) + 16
@@ -8,6 +8,68 @@ class Config:
     MODEL_NAME = "llama-3.3-70b-versatile"
     TEMPERATURE = 0.1
     MAX_TOKENS = 1000
+
+    # Embeddings (HF router); batches are bounded by count and total characters
+    HF_ROUTER_URL = os.getenv("HF_ROUTER_URL", "https://router.huggingface.co/hf-inference/models").rstrip("/")
+    EMBED_MODEL_ID = os.getenv("EMBED_MODEL_ID", "BAAI/bge-small-en-v1.5")
+    EMBED_BATCH_ITEMS = int(os.getenv("EMBED_BATCH_ITEMS", "32"))
+    EMBED_BATCH_CHARS = int(os.getenv("EMBED_BATCH_CHARS", "24000"))
+    EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+    # Query embedding during chat; a stuck HF connection must not hold an admission slot indefinitely
+    EMBED_QUERY_TIMEOUT_S = float(os.getenv("EMBED_QUERY_TIMEOUT_S", "20"))
+
+    # Chroma bulk writes; batches are bounded by serialized bytes and record count
+    CHROMA_BATCH_BYTES = int(os.getenv("CHROMA_BATCH_BYTES", str(4 * 1024 * 1024)))
+    CHROMA_BATCH_ITEMS = int(os.getenv("CHROMA_BATCH_ITEMS", "250"))
+    CHROMA_MAX_IN_FLIGHT = int(os.getenv("CHROMA_MAX_IN_FLIGHT", "4"))
+
+    # Logical collection served to chat; resolved through the registry alias (see registry.py)
+    COLLECTION_NAME = "Curriculumnpdfs"
+    ALIAS_TTL_SECONDS = float(os.getenv("ALIAS_TTL_SECONDS", "30"))
+    # How often readers re-check the corpus epoch that every ingest bumps (see epoch.py)
+    EPOCH_POLL_SECONDS = float(os.getenv("EPOCH_POLL_SECONDS", "5"))
+
+    # Coalesce identical concurrent retrievals and LLM generations (see singleflight.py)
+    SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "1") != "0"
+
+    # /chat admission control (see admission.py): slots, bounded queue and how long a request may wait
+    CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "16"))
+    CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "64"))
+    CHAT_MAX_QUEUED_PER_CLIENT = int(os.getenv("CHAT_MAX_QUEUED_PER_CLIENT", "4"))
+    CHAT_QUEUE_TIMEOUT_S = float(os.getenv("CHAT_QUEUE_TIMEOUT_S", "10"))
+
+    # Local intent routing (see intents.py): greetings, FAQ hits and off-topic questions skip retrieval and the LLM.
+    # Raise the threshold if FAQ answers fire on questions that needed a tailored answer.
+    INTENT_ROUTING = os.getenv("INTENT_ROUTING", "1") != "0"
+    INTENT_FAQ_THRESHOLD = float(os.getenv("INTENT_FAQ_THRESHOLD", "0.6"))
+
+    # Chat history sent to providers (see history.py): the last HISTORY_MAX_TURNS turns verbatim within
+    # HISTORY_TOKEN_BUDGET (estimated) tokens; older turns are folded into a summary of at most HISTORY_SUMMARY_TOKENS
+    HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "6"))
+    HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+    HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", "300"))
+
+    # Course-book and subject-combination tables (see tables.py), rebuilt from PROCESSED_DIR when a file changes.
+    # TABLE_ANSWERS=0 sends those questions to retrieval and the LLM again.
+    PROCESSED_DIR = os.getenv("CBC_PROCESSED_DIR", "data/processed")
+    TABLES_PATH = os.getenv("CBC_TABLES_PATH", "data/tables/cbc_tables.json")
+    TABLE_ANSWERS = os.getenv("TABLE_ANSWERS", "1") != "0"
+
+    # Two-tier cache (see cache.py): per-process LRU over a SQLite file shared by workers and restarts.
+    # An empty CBC_CACHE_PATH keeps only the in-process tier. ANSWER_CACHE_TTL_S=0 stops caching answers;
+    # answers are keyed on the corpus epoch, so an ingest invalidates them long before the TTL runs out.
+    CACHE_PATH = os.getenv("CBC_CACHE_PATH", "data/cache/cbc_cache.sqlite")
+    CACHE_MAX_MB = int(os.getenv("CBC_CACHE_MAX_MB", "256"))
+    EMBED_CACHE_ITEMS = int(os.getenv("EMBED_CACHE_ITEMS", "4096"))
+    ANSWER_CACHE_TTL_S = float(os.getenv("ANSWER_CACHE_TTL_S", "86400"))
+    # Ranked fragment ids per expanded term list (fragments themselves are stored once by id); 0 disables
+    RETRIEVAL_CACHE_TTL_S = float(os.getenv("RETRIEVAL_CACHE_TTL_S", "86400"))
+    RETRIEVAL_CACHE_ITEMS = int(os.getenv("RETRIEVAL_CACHE_ITEMS", "1024"))
+
+    # Optional .cbcsnap file; when set the retriever queries it in-process instead of Chroma Cloud
+    SNAPSHOT_PATH = os.getenv("CBC_SNAPSHOT_PATH")
+    # Serve it from <snapshot>.mmap/ (unpacked once, memory-mapped by every worker) instead of per-process copies
+    SNAPSHOT_MMAP = os.getenv("CBC_SNAPSHOT_MMAP", "1") != "0"
     
     # UI Constants
     APP_TITLE = "Kenya CBC/CBE Expert Guide"
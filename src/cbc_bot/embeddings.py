@@ -0,0 +1,145 @@
+"""
+Embedding request planner for the HuggingFace feature-extraction router.
+Splits large input lists into batches bounded by count and characters, sends
+them concurrently and reassembles the vectors in input order.
+"""
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import requests
+
+from .config import Config
+
+HF_ROUTER_URL = Config.HF_ROUTER_URL + "/{model_id}"
+
+
+class EmbeddingError(Exception):
+    """A batch could not be embedded even after retries and splitting."""
+
+
+# HF answers oversized batches with 413, or with a 400 that says so
+_PAYLOAD_TOO_LARGE = re.compile(r"too (large|long|many)|payload|exceed|maximum (input|sequence|length)", re.I)
+
+
+def classify_error(error: Exception) -> str:
+    """
+    "retry" for transient failures (network, timeouts, 429, 5xx, malformed replies),
+    "split" when the batch itself is too large, "fatal" for any other client error
+    (bad token, unknown model): retrying or splitting those only multiplies requests.
+    """
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return "retry"
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        if status == 413 or (status == 400 and _PAYLOAD_TOO_LARGE.search(error.response.text or "")):
+            return "split"
+        if status == 429 or status >= 500:
+            return "retry"
+        return "fatal"
+    return "retry"
+
+
+def plan_batches(texts: List[str], max_items: int, max_chars: int) -> List[Tuple[int, int]]:
+    """
+    Returns (start, end) ranges over `texts`. A batch closes when adding the
+    next text would pass either limit; a single oversized text gets its own batch.
+    """
+    batches = []
+    start, chars = 0, 0
+    for i, text in enumerate(texts):
+        size = len(text)
+        if i > start and (i - start >= max_items or chars + size > max_chars):
+            batches.append((start, i))
+            start, chars = i, 0
+        chars += size
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
+class EmbeddingPlanner:
+    """
+    Size-aware batching client for HF embeddings.
+    Transient failures are retried per batch; a batch rejected as too large is
+    split in half; any other client error (401, 403, 404...) fails at once.
+    """
+    def __init__(self, model_id: str = Config.EMBED_MODEL_ID, hf_token: Optional[str] = None,
+                 max_items: int = Config.EMBED_BATCH_ITEMS, max_chars: int = Config.EMBED_BATCH_CHARS,
+                 concurrency: int = Config.EMBED_CONCURRENCY, max_retries: int = 2, timeout: int = 60):
+        self.model_id = model_id
+        self.api_url = HF_ROUTER_URL.format(model_id=model_id)
+        self.hf_token = hf_token or os.getenv("HUGGINGFACE_TOKEN")
+        self.max_items = max_items
+        self.max_chars = max_chars
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.last_report: List[dict] = []
+
+    def _request(self, texts: List[str]) -> List[List[float]]:
+        resp = self.session.post(
+            self.api_url,
+            headers={"Authorization": f"Bearer {self.hf_token}"},
+            json={"inputs": texts, "options": {"wait_for_model": True}},
+            timeout=self.timeout
+        )
+        resp.raise_for_status()
+        vectors = resp.json()
+        if not isinstance(vectors, list) or len(vectors) != len(texts):
+            raise EmbeddingError(f"Expected {len(texts)} vectors, got {str(vectors)[:200]}")
+        return vectors
+
+    def _embed_range(self, texts: List[str], start: int, end: int, report: List[dict]) -> List[List[float]]:
+        batch = texts[start:end]
+        last_error = None
+        for attempt in range(1, self.max_retries + 2):
+            began = time.perf_counter()
+            try:
+                vectors = self._request(batch)
+                report.append({
+                    "start": start, "size": len(batch), "chars": sum(len(t) for t in batch),
+                    "latency_s": time.perf_counter() - began, "attempts": attempt
+                })
+                return vectors
+            except Exception as e:
+                last_error = e
+                kind = classify_error(e)
+                if kind == "fatal":
+                    raise EmbeddingError(f"Embedding batch {start}-{end} rejected: {e}") from e
+                if kind == "split":
+                    break
+                if attempt <= self.max_retries:
+                    time.sleep(min(2 ** (attempt - 1), 8) * 0.5)
+
+        # Only an oversized batch is worth splitting; transient failures that outlast the retries are reported
+        if classify_error(last_error) == "split" and len(batch) > 1:
+            mid = start + len(batch) // 2
+            print(f"Embedding batch {start}-{end} too large ({last_error}); splitting.")
+            return self._embed_range(texts, start, mid, report) + self._embed_range(texts, mid, end, report)
+        raise EmbeddingError(f"Embedding failed for inputs {start}-{end}: {last_error}") from last_error
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embeds `texts`, returning one vector per input in the same order."""
+        if not texts: return []
+        batches = plan_batches(texts, self.max_items, self.max_chars)
+        report: List[dict] = []
+        results: List[Optional[List[List[float]]]] = [None] * len(batches)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.concurrency, len(batches)))) as pool:
+            futures = [pool.submit(self._embed_range, texts, start, end, report) for start, end in batches]
+            try:
+                for i, future in enumerate(futures):
+                    results[i] = future.result()
+            except Exception:
+                # The document fails as a whole; don't send the batches still queued
+                for future in futures: future.cancel()
+                raise
+
+        self.last_report = sorted(report, key=lambda r: r["start"])
+        slowest = max(r["latency_s"] for r in report)
+        print(f"Embedded {len(texts)} texts in {len(report)} batches (slowest batch {slowest:.2f}s)")
+        return [vector for batch in results for vector in batch]
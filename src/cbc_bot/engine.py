@@ -1,24 +1,52 @@
+import json
 import os
 import requests
 import time
 import re
 from datetime import datetime, timedelta, timezone
+from .cache import TwoTierCache, shared_store
 from .config import Config
+from .facts import format_answer, parse_score_question
+from .history import HistoryManager, estimate_tokens
+from .intents import GREETING_ANSWER, Intent, IntentClassifier
 from .retriever import CBCRetriever
 from .knowledge import KnowledgeBase
+from .tables import shared_tables
+from .metrics import HISTORY_TOKENS, INTENT_ROUTES, PROVIDER_ATTEMPTS, PROVIDER_SECONDS, span
+from .singleflight import SingleFlight, normalize_text
 
 class CBCEngine:
     """
     MASTER AI ENGINE (v8.0): Brutal Precision Edition.
     Forces the AI to use specific numbers, labels, and learning areas.
     """
-    MODELSLAB_URL = "https://modelslab.com/api/v7/llm/chat/completions"
-    GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+    MODELSLAB_URL = os.getenv("MODELSLAB_URL", "https://modelslab.com/api/v7/llm/chat/completions")
+    GROQ_URL = os.getenv("GROQ_URL", "https://api.groq.com/openai/v1/chat/completions")
 
     def __init__(self):
         self.modelslab_key = os.getenv("MODELSLAB_API_KEY")
         self.groq_key = os.getenv("GROQ_API_KEY")
         self.retriever = CBCRetriever()
+        # Pooled provider connections; warm_connections() opens them ahead of the first chat
+        self.session = requests.Session()
+        # Identical conversations in flight at the same moment get one LLM answer
+        self.inflight = SingleFlight("generation") if Config.SINGLE_FLIGHT else None
+        # Recent turns verbatim, older ones summarized (see history.py)
+        self.history = HistoryManager()
+        # Greetings, FAQ hits and off-topic questions are answered locally (see intents.py)
+        self.intents = IntentClassifier() if Config.INTENT_ROUTING else None
+        # Course-book and subject-combination lookups are answered from extracted tables (see tables.py)
+        self.tables = None
+        if Config.TABLE_ANSWERS:
+            try:
+                self.tables = shared_tables()
+            except Exception as e:
+                print(f"Table answers disabled, could not load tables: {e}")
+        # Successful answers, per corpus version, shared across workers and restarts
+        self.answer_cache = None
+        if Config.ANSWER_CACHE_TTL_S > 0:
+            self.answer_cache = TwoTierCache("answer", shared_store(), 512, ttl=Config.ANSWER_CACHE_TTL_S,
+                                             version=self.retriever.corpus_version)
 
     def is_greeting(self, text: str) -> bool:
         greetings = {r'\bhi\b', r'\bhello\b', r'\bhey\b', r'\bhabari\b', r'\bjambo\b', r'\bsasa\b'}
@@ -26,21 +54,77 @@ class CBCEngine:
         clean_text = re.sub(r'[?.!,]', '', text)
         return any(re.search(pattern, clean_text) for pattern in greetings) or len(clean_text.split()) <= 1
 
+    def route_intent(self, text: str) -> Intent:
+        """Intent of the latest message; with INTENT_ROUTING off only the legacy greeting check applies."""
+        if self.intents is None:
+            return Intent("greeting", GREETING_ANSWER, 1.0) if self.is_greeting(text) else Intent("open", None, 0.0)
+        return self.intents.classify(text)
+
+    def warm_connections(self) -> list:
+        """Opens (or refreshes) a pooled TLS connection to every configured LLM provider."""
+        urls = []
+        if self.modelslab_key and self.modelslab_key != "your_modelslab_key_here": urls.append(self.MODELSLAB_URL)
+        if self.groq_key: urls.append(self.GROQ_URL)
+        for url in urls:
+            # Any HTTP status means the connection is up; only network errors propagate
+            self.session.head(url, timeout=10)
+        return urls
+
     def get_chat_response(self, messages: list) -> str:
+        with span("chat") as timer:
+            response, timer.outcome = self._chat_response(messages)
+            return response
+
+    def _chat_response(self, messages: list):
+        """Returns (response, outcome) so the chat span can tell fast paths and failures apart."""
         user_query = messages[-1].get("content", "")
         
         eat_tz = timezone(timedelta(hours=3))
         now_eat = datetime.now(eat_tz)
         today = now_eat.strftime("%B %d, %Y")
         
+        # Duplicate system prompts dropped, old turns folded into a summary; this also keeps cache keys short
+        messages = self.history.window(messages)
+        HISTORY_TOKENS.observe(sum(estimate_tokens(m.get("content", "")) for m in messages))
         last_bot_message = ""
-        if len(messages) > 1:
+        if len(messages) > 1 and messages[-2].get("role") == "assistant":
             last_bot_message = messages[-2].get("content", "")
 
-        # 1. Handle Simple Greetings
-        if self.is_greeting(user_query):
-            return "Habari! I am your Master CBC Consultant. Tell me specifically what you need to know about Grade 10 pathways or placement."
+        # 1. Local fast paths. "My child got X in KJSEA..." is arithmetic on the 60/20/20 rule
+        # (see facts.py), not a generation task
+        scores = parse_score_question(user_query)
+        if scores:
+            INTENT_ROUTES.inc(intent="calculator")
+            return format_answer(scores), "calculated"
+
+        # "Which Physics books are approved?", "what is ST1044?": exact lookups in the extracted tables
+        table_answer = self.tables.answer(user_query) if self.tables is not None else None
+        if table_answer:
+            INTENT_ROUTES.inc(intent="table")
+            return table_answer, "table"
+
+        # Greetings, FAQ hits and off-topic questions get precomputed answers, no retrieval or LLM
+        intent = self.route_intent(user_query)
+        INTENT_ROUTES.inc(intent=intent.name)
+        if intent.answer:
+            return intent.answer, "faq" if intent.name.startswith("faq_") else intent.name
+
+        key = json.dumps([today] + [[m.get("role", ""), normalize_text(m.get("content", ""))] for m in messages])
+        if self.answer_cache is not None:
+            cached = self.answer_cache.get(key)
+            if cached: return cached, "cached"
+
+        if self.inflight is None:
+            response, outcome = self._generate(messages, user_query, last_bot_message, today)
+            shared = False
+        else:
+            (response, outcome), shared = self.inflight.do(
+                key, lambda: self._generate(messages, user_query, last_bot_message, today))
+        if outcome == "ok" and response and not shared and self.answer_cache is not None:
+            self.answer_cache.set(key, response)
+        return response, "coalesced" if shared else outcome
 
+    def _generate(self, messages: list, user_query: str, last_bot_message: str, today: str):
         # 2. Perform Data-Dense Deep Search
         # Increase n_results to 20 to find all specific subject lists
         context = self.retriever.find_relevant_context(user_query, history_context=last_bot_message, n_results=20)
@@ -75,22 +159,29 @@ PRECISION PROTOCOL:
             key = self.groq_key if p["type"] == "groq" else self.modelslab_key
             if not key or key == "your_modelslab_key_here": continue
             
+            outcome = "exception"
+            started = time.perf_counter()
             try:
                 if p["type"] == "modelslab":
-                    resp = requests.post(self.MODELSLAB_URL, json={
+                    resp = self.session.post(self.MODELSLAB_URL, json={
                         "key": key, "model_id": p["model"], 
                         "messages": [{"role": "system", "content": system_prompt}] + messages,
                         "temp": 0.0 # ZERO temp for absolute factual strictness
                     }, timeout=30)
                 else:
-                    resp = requests.post(self.GROQ_URL, headers={"Authorization": f"Bearer {key}"}, json={
+                    resp = self.session.post(self.GROQ_URL, headers={"Authorization": f"Bearer {key}"}, json={
                         "model": p["model"], "messages": [{"role": "system", "content": system_prompt}] + messages,
                         "temperature": 0.0
                     }, timeout=20)
 
+                outcome = f"http_{resp.status_code}"
                 if resp.status_code == 200:
                     data = resp.json()
-                    return data.get("choices", [{}])[0].get("message", {}).get("content") or data.get("output") or data.get("message")
+                    outcome = "ok"
+                    return data.get("choices", [{}])[0].get("message", {}).get("content") or data.get("output") or data.get("message"), "ok"
             except: continue
+            finally:
+                PROVIDER_ATTEMPTS.inc(provider=p["name"], outcome=outcome)
+                PROVIDER_SECONDS.observe(time.perf_counter() - started, provider=p["name"], outcome=outcome)
 
-        return "Consultant Connection Error. Please refresh the CBC Dashboard."
+        return "Consultant Connection Error. Please refresh the CBC Dashboard.", "providers_failed"
@@ -0,0 +1,95 @@
+"""
+Corpus epoch: a monotonically increasing number per logical collection that
+changes whenever the corpus chat reads from changes.
+
+Every writer (the /ingest* endpoints, the sync and rebuild scripts, alias
+switches) calls `bump()` after its upsert lands. The epoch is stored as one
+record ("epoch:<logical name>") in the cbc_registry collection next to the
+aliases. Readers call `current()`, which serves the last value from memory and
+re-reads that single record at most every `poll_interval` seconds, so it is
+cheap enough to put into every cache key. Caches keyed on the epoch can use
+long TTLs: an ingest anywhere invalidates them within one poll interval.
+
+The new epoch is max(previous + 1, wall-clock milliseconds). Concurrent
+writers may land on the same value, which is harmless, but an epoch never
+moves backwards.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from .chroma import ChromaHTTPClient
+from .config import Config
+from .metrics import CORPUS_EPOCH
+from .registry import REGISTRY_COLLECTION, _PLACEHOLDER_EMBEDDING
+
+
+def epoch_record_id(logical_name: str) -> str:
+    return f"epoch:{logical_name}"
+
+
+class CorpusEpoch:
+    # logical name -> (monotonic time of last read, epoch), shared by every instance in the process
+    _cache: Dict[str, Tuple[float, int]] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, client: Optional[ChromaHTTPClient] = None, logical_name: str = Config.COLLECTION_NAME,
+                 poll_interval: float = Config.EPOCH_POLL_SECONDS):
+        self.client = client or ChromaHTTPClient()
+        self.logical_name = logical_name
+        self.poll_interval = poll_interval
+
+    def _read(self) -> int:
+        data = self.client.get(REGISTRY_COLLECTION, ids=[epoch_record_id(self.logical_name)], include=["metadatas"])
+        if not data.get("ids"): return 0
+        return int((data["metadatas"][0] or {}).get("epoch", 0))
+
+    def _remember(self, epoch: int):
+        with self._lock:
+            _, known = self._cache.get(self.logical_name, (0.0, 0))
+            self._cache[self.logical_name] = (time.monotonic(), max(known, epoch))
+        CORPUS_EPOCH.set(max(known, epoch), collection=self.logical_name)
+
+    def current(self) -> int:
+        """The corpus epoch as of at most `poll_interval` seconds ago (0 if none was ever recorded)."""
+        cached = self._cache.get(self.logical_name)
+        if cached and time.monotonic() - cached[0] < self.poll_interval:
+            return cached[1]
+        try:
+            self._remember(self._read())
+        except Exception as e:
+            if cached is None: raise
+            print(f"Epoch poll failed for {self.logical_name}, keeping {cached[1]}: {e}")
+            self._remember(cached[1])
+        return self._cache[self.logical_name][1]
+
+    def bump(self, reason: str = "") -> int:
+        """Records that the corpus changed; returns the new epoch."""
+        try:
+            previous = self._read()
+        except Exception:
+            previous = self._cache.get(self.logical_name, (0.0, 0))[1]
+        epoch = max(previous + 1, int(time.time() * 1000))
+        self.client.get_collection_id(REGISTRY_COLLECTION)
+        self.client.upsert_batch(REGISTRY_COLLECTION, {
+            "ids": [epoch_record_id(self.logical_name)],
+            "embeddings": [_PLACEHOLDER_EMBEDDING],
+            "documents": [reason or "corpus changed"],
+            "metadatas": [{"epoch": epoch, "reason": reason[:200],
+                           "updated_at": datetime.now(timezone.utc).isoformat()}]
+        })
+        self._remember(epoch)
+        return epoch
+
+
+def bump_epoch(reason: str, logical_name: str = Config.COLLECTION_NAME,
+               client: Optional[ChromaHTTPClient] = None) -> Optional[int]:
+    """Writer-side helper: bumps the epoch and logs instead of raising, so a failed bump never fails an ingest."""
+    try:
+        epoch = CorpusEpoch(client, logical_name).bump(reason)
+        print(f"Corpus epoch for {logical_name} is now {epoch} ({reason})")
+        return epoch
+    except Exception as e:
+        print(f"Could not bump corpus epoch for {logical_name}: {e}")
+        return None
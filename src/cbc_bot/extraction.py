@@ -0,0 +1,79 @@
+"""
+Text extraction for the ingestion paths.
+PyPDF2 and trafilatura (which pulls in lxml, courlan and friends) are imported
+on first use, so a process that never ingests never pays for loading them.
+"""
+from typing import List, Optional
+
+
+def extract_pdf_text(file_path: str) -> str:
+    import PyPDF2
+
+    text = ""
+    try:
+        with open(file_path, 'rb') as f:
+            reader = PyPDF2.PdfReader(f)
+            for page in reader.pages:
+                extracted = page.extract_text()
+                if extracted: text += extracted + "\n"
+    except Exception as e:
+        print(f"Error reading PDF: {e}")
+    return text
+
+
+def fetch_url_text(url: str) -> Optional[str]:
+    """Main content of a web page (tables kept, comments dropped); None if it cannot be fetched or parsed."""
+    import trafilatura
+
+    downloaded = trafilatura.fetch_url(url)
+    if not downloaded:
+        print(f"Failed to fetch URL: {url}")
+        return None
+    content = trafilatura.extract(downloaded, include_comments=False, include_tables=True)
+    if not content:
+        print(f"Failed to extract content from: {url}")
+        return None
+    return content
+
+
+def chunk_text(text: str, chunk_size_lines: int = 15) -> List[str]:
+    lines = text.split('\n')
+    chunks = []
+    for i in range(0, len(lines), chunk_size_lines):
+        chunk = "\n".join(lines[i:i + chunk_size_lines]).strip()
+        if chunk: chunks.append(chunk)
+    return chunks
+
+
+class LineChunker:
+    """
+    Incremental version of chunk_text.
+    Text can be fed in arbitrary pieces; chunks are emitted as soon as
+    `chunk_size_lines` complete lines are available.
+    """
+    def __init__(self, chunk_size_lines: int = 15):
+        self.chunk_size_lines = chunk_size_lines
+        self.chunks: List[str] = []
+        self._lines: List[str] = []
+        self._partial = ""
+
+    def feed(self, text: str) -> List[str]:
+        parts = (self._partial + text).split("\n")
+        self._partial = parts.pop()
+        self._lines.extend(parts)
+
+        emitted = []
+        while len(self._lines) >= self.chunk_size_lines:
+            chunk = "\n".join(self._lines[:self.chunk_size_lines]).strip()
+            del self._lines[:self.chunk_size_lines]
+            if chunk: emitted.append(chunk)
+        self.chunks.extend(emitted)
+        return emitted
+
+    def close(self) -> List[str]:
+        chunk = "\n".join(self._lines + [self._partial]).strip()
+        self._lines, self._partial = [], ""
+        if chunk:
+            self.chunks.append(chunk)
+            return [chunk]
+        return []
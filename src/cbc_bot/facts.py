@@ -0,0 +1,181 @@
+"""
+Placement-score and achievement-level rules as code.
+
+The 60/20/20 weights and the EE1..ME2 bands are the ones stated in
+KnowledgeBase.SYSTEM_PROMPT; the lower AE/BE bands complete the KNEC 8-level
+scale so every percentage maps to a level. `calculate()` backs the /calculate
+endpoint, and `parse_score_question()` lets the engine answer "my child got X
+in KJSEA, Y in KPSEA, Z in SBA" without retrieval or an LLM call.
+"""
+import re
+from typing import Dict, NamedTuple, Optional
+
+# Share of the final placement score contributed by each assessment
+PLACEMENT_WEIGHTS = {"kjsea": 0.60, "kpsea": 0.20, "sba": 0.20}
+COMPONENT_NAMES = {"kjsea": "KJSEA (Grade 9)", "kpsea": "KPSEA (Grade 6)", "sba": "School-Based Assessments"}
+
+
+class AchievementLevel(NamedTuple):
+    code: str
+    label: str
+    low: int   # inclusive, percent
+    high: int  # inclusive, percent
+    points: int
+
+    def describe(self) -> str:
+        return f"{self.code} ({self.label}, {self.low}-{self.high}%)"
+
+    def as_dict(self) -> dict:
+        return {"code": self.code, "label": self.label, "range": [self.low, self.high], "points": self.points}
+
+
+# Highest first
+ACHIEVEMENT_LEVELS = [
+    AchievementLevel("EE1", "Exceptional Mastery", 90, 100, 8),
+    AchievementLevel("EE2", "Excellent Achievement", 75, 89, 7),
+    AchievementLevel("ME1", "Moderate Achievement", 58, 74, 6),
+    AchievementLevel("ME2", "Developing Competence", 41, 57, 5),
+    AchievementLevel("AE1", "Approaching Expectations", 31, 40, 4),
+    AchievementLevel("AE2", "Approaching Expectations", 21, 30, 3),
+    AchievementLevel("BE1", "Below Expectations", 11, 20, 2),
+    AchievementLevel("BE2", "Below Expectations", 0, 10, 1),
+]
+
+
+def achievement_level(percent: float) -> AchievementLevel:
+    """Band for a 0-100 percentage; fractional scores are rounded to the nearest whole percent first."""
+    if not 0 <= percent <= 100:
+        raise ValueError(f"score must be between 0 and 100, got {percent:g}")
+    rounded = int(percent + 0.5)
+    return next(level for level in ACHIEVEMENT_LEVELS if rounded >= level.low)
+
+
+def placement_score(kjsea: float, kpsea: float, sba: float) -> float:
+    """The 60/20/20 composite, in percent."""
+    scores = {"kjsea": kjsea, "kpsea": kpsea, "sba": sba}
+    for name, value in scores.items():
+        if not 0 <= value <= 100:
+            raise ValueError(f"{name} must be between 0 and 100, got {value:g}")
+    return round(sum(PLACEMENT_WEIGHTS[name] * value for name, value in scores.items()), 2)
+
+
+def calculate(kjsea: Optional[float] = None, kpsea: Optional[float] = None, sba: Optional[float] = None) -> dict:
+    """
+    Level of every score given and, when all three are present, the placement
+    score and its level. Raises ValueError for out-of-range or missing input.
+    """
+    given = {name: value for name, value in (("kjsea", kjsea), ("kpsea", kpsea), ("sba", sba)) if value is not None}
+    if not given:
+        raise ValueError("provide at least one of kjsea, kpsea, sba")
+    result = {
+        "inputs": given,
+        "levels": {name: achievement_level(value).as_dict() for name, value in given.items()},
+        "placement_score": None,
+        "placement_level": None,
+        "missing": [name for name in PLACEMENT_WEIGHTS if name not in given],
+    }
+    if not result["missing"]:
+        score = placement_score(given["kjsea"], given["kpsea"], given["sba"])
+        result["placement_score"] = score
+        result["placement_level"] = achievement_level(score).as_dict()
+    return result
+
+
+def levels_table() -> str:
+    return "\n".join(f"- {level.describe()}" for level in ACHIEVEMENT_LEVELS)
+
+
+# --- Score questions in chat ---
+
+_COMPONENTS = [
+    ("kjsea", r"kjsea|grade\s*9\s+(?:exam|assessment)"),
+    ("kpsea", r"kpsea|grade\s*6\s+(?:exam|assessment)"),
+    ("sba", r"sba|school[\s-]*based(?:\s+assessments?)?"),
+]
+_COMPONENT = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in _COMPONENTS), re.I)
+# 72, 72%, 72.5 percent, 360 out of 500; never the N of "grade N"
+_NUMBER = re.compile(r"(?<![\w.])(?<!grade )(?<!grade)(\d{1,3}(?:\.\d+)?)"
+                     r"(?:\s*(%|percent\b)|\s*(?:out of|/)\s*(\d{2,4})\b)?", re.I)
+_ASKS_FOR_RESULT = re.compile(r"\b(got|scored?|scores|obtained|attained|had|marks|results?|level|grade is|"
+                              r"calculate|what is \d|is \d)\b", re.I)
+# "has 90 in KJSEA" is a result only because an assessment is named; "has 100% bursary" is not
+_HAS = re.compile(r"\b(has|have)\b", re.I)
+# Without a named assessment, a percentage is a score only next to one of these ("100% bursary" is not)
+_SCORE_WORD = re.compile(r"\b(scored?|scores|marks?|results?|average|(?:achievement )?level)\b", re.I)
+# How a number is tied to an assessment: "72 in KJSEA" binds tighter than "KJSEA: 72", which binds tighter
+# than mere proximity ("KJSEA, 65 ..."), so "72 in KJSEA, 65 in KPSEA" pairs up correctly
+_NUMBER_THEN_NAME = re.compile(r"^\s*(?:in|on|for|at)(?:\s+(?:the|his|her|their))?\s*$", re.I)
+_NAME_THEN_NUMBER = re.compile(r"^\s*(?:[:=\-–]|scored?|score of|results?|marks|of|was|is|got|had|\s)*$", re.I)
+# Questions about the rule itself ("does KJSEA contribute 60%?") are left to the FAQ and the LLM
+_ABOUT_RULE = re.compile(r"\b(contributes?|weights?|weighted|worth|counts? for|percentage of|60\s*/\s*20)\b", re.I)
+
+
+def parse_score_question(text: str) -> Optional[Dict[str, float]]:
+    """
+    Scores mentioned in a chat message, e.g. {"kjsea": 72.0, "kpsea": 65.0, "sba": 80.0},
+    or {"score": 68.0} for a bare "what level is 68%?". None if it is not a score question.
+    """
+    if _ABOUT_RULE.search(text):
+        return None
+    components = [(m.start(), m.end(), m.lastgroup) for m in _COMPONENT.finditer(text)]
+    if not (_ASKS_FOR_RESULT.search(text) or (components and _HAS.search(text))):
+        return None
+    numbers = []
+    for match in _NUMBER.finditer(text):
+        value = float(match.group(1))
+        if match.group(3):
+            total = float(match.group(3))
+            if total <= 0 or value > total: continue
+            value = round(100.0 * value / total, 2)
+        if value > 100: continue
+        numbers.append((match.start(), match.end(), value, bool(match.group(2) or match.group(3))))
+    if not numbers: return None
+
+    if not components:
+        # Only an explicit percentage within a few words of "score", "marks", "level"... is read as a score
+        explicit = [(start, end, value) for start, end, value, is_percent in numbers if is_percent]
+        if len(explicit) != 1: return None
+        start, end, value = explicit[0]
+        return {"score": value} if _SCORE_WORD.search(text[max(0, start - 30):end + 30]) else None
+
+    # Pair assessments with numbers, tightest links first; each side is used once
+    pairs = []
+    for c, (c_start, c_end, name) in enumerate(components):
+        for n, (n_start, n_end, _, _) in enumerate(numbers):
+            if n_end <= c_start:
+                gap = text[n_end:c_start]
+                rank = 0 if _NUMBER_THEN_NAME.match(gap) else 2
+            else:
+                gap = text[c_end:n_start]
+                rank = 1 if _NAME_THEN_NUMBER.match(gap) else 2
+            if len(gap) <= 25: pairs.append((rank, len(gap), c, n))
+    scores: Dict[str, float] = {}
+    used_components, used_numbers = set(), set()
+    for _, _, c, n in sorted(pairs):
+        name = components[c][2]
+        if c in used_components or n in used_numbers or name in scores: continue
+        used_components.add(c)
+        used_numbers.add(n)
+        scores[name] = numbers[n][2]
+    return scores or None
+
+
+def format_answer(scores: Dict[str, float]) -> str:
+    """Chat reply for the output of parse_score_question."""
+    if "score" in scores:
+        level = achievement_level(scores["score"])
+        return f"A score of {scores['score']:g}% is {level.describe()}.\n\nAll achievement levels:\n{levels_table()}"
+
+    result = calculate(**scores)
+    lines = [f"- {COMPONENT_NAMES[name]}: {value:g}% → {achievement_level(value).describe()}"
+             for name, value in result["inputs"].items()]
+    if result["placement_score"] is not None:
+        weights = " + ".join(f"{int(PLACEMENT_WEIGHTS[name] * 100)}% × {result['inputs'][name]:g}"
+                             for name in PLACEMENT_WEIGHTS)
+        level = achievement_level(result["placement_score"])
+        lines.append(f"\nPlacement score (60/20/20 rule): {weights} = **{result['placement_score']:g}%** "
+                     f"→ {level.describe()}")
+    else:
+        missing = ", ".join(COMPONENT_NAMES[name] for name in result["missing"])
+        lines.append(f"\nFor the combined 60/20/20 placement score I also need: {missing}.")
+    return "\n".join(lines)
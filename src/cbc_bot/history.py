@@ -0,0 +1,135 @@
+"""
+Conversation windowing for long chat sessions.
+
+Clients send the whole transcript on every turn (app.py even sends the system
+prompt the engine adds itself), so without a window the prompt, and provider
+latency, grow with every turn. `HistoryManager.window()` keeps the most recent
+turns verbatim within a token budget, folds everything older into a short
+extractive summary, and drops the knowledge-base prompt and repeated system
+messages. The summary is built locally (no LLM call) and rolled forward: the
+summary of the previous fold point is cached, so each new turn only adds the
+lines for the messages that just left the window.
+"""
+import hashlib
+import json
+import re
+from typing import Dict, List, Tuple
+
+from .cache import LRUCache
+from .config import Config
+from .knowledge import KnowledgeBase
+from .metrics import record_cache
+
+SUMMARY_HEADER = "Summary of the earlier conversation (older turns, condensed):"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English); no tokenizer dependency."""
+    return len(text) // 4 + 1
+
+
+def _squash(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _clip(text: str, limit: int) -> str:
+    """First sentence(s) of `text` that fit in `limit` characters."""
+    text = _squash(text)
+    if len(text) <= limit: return text
+    cut = max(text.rfind(". ", 0, limit), text.rfind("? ", 0, limit))
+    return text[:cut + 1] if cut > limit // 3 else text[:limit].rsplit(" ", 1)[0] + "…"
+
+
+def summary_line(message: dict) -> str:
+    """One bullet per folded message: what the user asked, and the gist of the reply."""
+    content = message.get("content", "")
+    if message.get("role") == "user":
+        return f"- User asked: {_clip(content, 160)}"
+    # Replies lead with the answer; list items and bold text carry the facts worth keeping
+    facts = re.findall(r"\*\*(.+?)\*\*", content)[:3]
+    lead = content.strip().split("\n\n")[0]
+    line = f"- Assistant answered: {_clip(lead, 200)}"
+    if facts: line += f" (key points: {'; '.join(_squash(f) for f in facts)})"
+    return line
+
+
+def _key(messages: List[dict]) -> str:
+    payload = json.dumps([[m.get("role", ""), m.get("content", "")] for m in messages], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class HistoryManager:
+    def __init__(self, max_turns: int = Config.HISTORY_MAX_TURNS, token_budget: int = Config.HISTORY_TOKEN_BUDGET,
+                 summary_tokens: int = Config.HISTORY_SUMMARY_TOKENS, cache_items: int = 1024):
+        self.max_turns = max(1, max_turns)
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        # hash of the folded messages -> summary lines
+        self.summaries = LRUCache(cache_items)
+
+    def _system_messages(self, messages: List[dict]) -> List[dict]:
+        """Client system messages other than the knowledge-base prompt (the engine adds its own), each once."""
+        seen = {_squash(KnowledgeBase.get_system_prompt())}
+        kept = []
+        for message in messages:
+            content = _squash(message.get("content", ""))
+            if message.get("role") != "system" or content in seen: continue
+            seen.add(content)
+            kept.append(message)
+        return kept
+
+    def _summary(self, folded: List[dict]) -> List[str]:
+        """Summary lines for `folded`, extending the cached summary of the previous fold point."""
+        key = _key(folded)
+        lines = self.summaries.get(key)
+        record_cache("history_summary", lines is not None)
+        if lines is not None: return lines
+
+        # The window moves by a turn (user + assistant) at a time; look one and two messages back
+        lines, start = [], 0
+        for back in (2, 1):
+            if len(folded) > back:
+                previous = self.summaries.get(_key(folded[:-back]))
+                if previous is not None:
+                    lines, start = list(previous), len(folded) - back
+                    break
+        lines.extend(summary_line(m) for m in folded[start:])
+        # Rolling: the oldest lines go first when the summary outgrows its budget
+        while len(lines) > 1 and estimate_tokens("\n".join(lines)) > self.summary_tokens:
+            lines.pop(0)
+        self.summaries.set(key, lines)
+        return lines
+
+    def split(self, messages: List[dict]) -> Tuple[List[dict], List[dict], List[dict]]:
+        """(system messages to keep, folded older messages, recent messages kept verbatim)."""
+        conversation = [m for m in messages if m.get("role") != "system"]
+        # Whole turns only: each starts at a user message, so a reply is never kept without its question
+        turns: List[List[dict]] = []
+        for message in conversation:
+            if message.get("role") == "user" or not turns: turns.append([])
+            turns[-1].append(message)
+        kept = 0
+        used = 0
+        for turn in reversed(turns):
+            cost = sum(estimate_tokens(m.get("content", "")) for m in turn)
+            # The latest turn is always kept, whatever its size
+            if kept and (kept >= self.max_turns or used + cost > self.token_budget): break
+            kept += 1
+            used += cost
+        recent = [m for turn in turns[len(turns) - kept:] for m in turn]
+        return self._system_messages(messages), conversation[:len(conversation) - len(recent)], recent
+
+    def window(self, messages: List[dict]) -> List[dict]:
+        """The messages to send to the provider: kept system messages, the summary (if any), recent turns."""
+        system, folded, recent = self.split(messages)
+        if not folded:
+            return system + recent
+        summary = {"role": "system", "content": SUMMARY_HEADER + "\n" + "\n".join(self._summary(folded))}
+        return system + [summary] + recent
+
+    def stats(self, messages: List[dict]) -> Dict[str, int]:
+        """Token estimates before and after windowing, e.g. for benchmarks."""
+        windowed = self.window(messages)
+        return {"messages_in": len(messages), "messages_out": len(windowed),
+                "tokens_in": sum(estimate_tokens(m.get("content", "")) for m in messages),
+                "tokens_out": sum(estimate_tokens(m.get("content", "")) for m in windowed)}
@@ -0,0 +1,185 @@
+"""
+Ingestion API: /ingest (streamed uploads), /ingest-url and /ingest-text.
+backend_main mounts this router unless the worker runs in chat-only mode, so
+chat-only workers never import the upload, embedding-batching or extraction
+code. PDF and HTML extraction libraries load on first use (see extraction.py).
+"""
+import os
+from typing import List, Optional
+
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+
+from .chroma import ChromaHTTPClient
+from .config import Config
+from .embeddings import EmbeddingPlanner
+from .epoch import bump_epoch
+from .extraction import chunk_text, fetch_url_text
+from .metrics import record_ingest, span
+from .profiling import AllocationTracer
+from .registry import CollectionRegistry
+from .uploads import StreamingUpload, UploadRejected, UploadTooLarge, read_multipart_upload
+
+# Uploads larger than this are rejected while they stream in
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_MB", "25")) * 1024 * 1024
+
+router = APIRouter()
+
+embedding_planner = EmbeddingPlanner()
+collection_registry = CollectionRegistry()
+
+def live_collection() -> str:
+    """
+    Physical collection currently serving Curriculumnpdfs for our embedding model;
+    all writes go there. Raises EmbeddingModelMismatch rather than mixing models.
+    """
+    return collection_registry.resolve_namespace(Config.COLLECTION_NAME, embedding_planner.model_id)
+
+def get_embeddings(texts: List[str]) -> List[List[float]]:
+    try:
+        return embedding_planner.embed(texts)
+    except Exception as e:
+        print(f"Embedding error: {e}")
+        raise HTTPException(status_code=500, detail=f"Embedding API failed: {str(e)}")
+
+def index_chunks(chunks: List[str], filename: str, content_hash: Optional[str] = None):
+    with span("ingest") as timer:
+        embeddings = get_embeddings(chunks)
+        chroma_client = ChromaHTTPClient()
+        ids = [f"cloud_{filename}_{i}" for i in range(len(chunks))]
+        metadata = {"source": filename, "type": "cloud_upload", "embedding_model": embedding_planner.model_id}
+        if content_hash: metadata["content_hash"] = content_hash
+        metadatas = [dict(metadata) for _ in range(len(chunks))]
+        chroma_client.upsert(live_collection(), ids, embeddings, chunks, metadatas)
+    record_ingest("cloud_upload", len(chunks), timer.elapsed)
+    bump_epoch(f"ingest {filename}", client=chroma_client)
+
+# Hashes of uploads currently being indexed, so concurrent re-uploads are rejected too
+_uploads_in_flight = set()
+
+# Armed through /admin/trace-ingest to record allocations of the next /ingest runs
+ingest_tracer = AllocationTracer()
+
+def process_and_index_upload(upload: StreamingUpload):
+    try:
+        with ingest_tracer.trace(f"ingest:{upload.filename}"):
+            chunks = upload.chunks()
+            if chunks: index_chunks(chunks, upload.filename, upload.sha256)
+    except Exception as e:
+        print(f"Error processing {upload.filename}: {e}")
+    finally:
+        upload.close()
+        _uploads_in_flight.discard(upload.sha256)
+
+@router.post("/ingest", openapi_extra={"requestBody": {"required": True, "content": {"multipart/form-data": {
+    "schema": {"type": "object", "required": ["file"], "properties": {"file": {"type": "string", "format": "binary"}}}
+}}}})
+async def ingest_file(request: Request, background_tasks: BackgroundTasks):
+    """
+    Streams a multipart upload: the file is hashed, size-checked and chunked
+    as it arrives, and exact duplicates are rejected before any parsing or embedding.
+    """
+    try:
+        upload = await read_multipart_upload(request, max_bytes=MAX_UPLOAD_BYTES)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if upload.sha256 in _uploads_in_flight:
+        upload.close()
+        return {"success": True, "duplicate": True, "message": f"File {upload.filename} is already being indexed."}
+    # Claimed before the await below, so an identical upload arriving meanwhile sees it as in flight
+    _uploads_in_flight.add(upload.sha256)
+    queued = False
+    try:
+        if await run_in_threadpool(lambda: ChromaHTTPClient().has_content_hash(live_collection(), upload.sha256)):
+            return {"success": True, "duplicate": True, "message": f"File {upload.filename} is already indexed."}
+        background_tasks.add_task(process_and_index_upload, upload)
+        queued = True
+    finally:
+        # The background task releases both once indexing ends
+        if not queued:
+            upload.close()
+            _uploads_in_flight.discard(upload.sha256)
+    return {"success": True, "message": f"File {upload.filename} queued."}
+
+@router.post("/ingest-url")
+async def ingest_url(data: dict, background_tasks: BackgroundTasks = None):
+    """
+    Scrape a URL and index its content.
+    Expects json: {"url": "https://example.com"}
+    """
+    url = data.get("url")
+    if not url:
+        raise HTTPException(status_code=400, detail="No URL provided")
+        
+    if background_tasks:
+        background_tasks.add_task(process_url, url)
+    else:
+        process_url(url)
+        
+    return {"success": True, "message": f"URL {url} queued for scraping and indexing."}
+
+def process_url(url: str):
+    try:
+        print(f"Scraping URL: {url}")
+        content = fetch_url_text(url)
+        if not content: return
+
+        # Aligned Chunking and Indexing
+        chunks = chunk_text(content)
+        with span("ingest") as timer:
+            embeddings = get_embeddings(chunks)
+            
+            chroma_client = ChromaHTTPClient()
+            # Use safe characters for IDs
+            safe_url = "".join([c if c.isalnum() else "_" for c in url])[:100]
+            ids = [f"url_{safe_url}_{i}" for i in range(len(chunks))]
+            metadatas = [{"source": url, "type": "url_ingest", "embedding_model": embedding_planner.model_id}
+                         for _ in range(len(chunks))]
+            
+            chroma_client.upsert(live_collection(), ids, embeddings, chunks, metadatas)
+        record_ingest("url_ingest", len(chunks), timer.elapsed)
+        bump_epoch(f"ingest-url {url}", client=chroma_client)
+        print(f"Successfully indexed {len(chunks)} chunks from URL: {url}")
+        
+    except Exception as e:
+        print(f"Error processing URL {url}: {e}")
+
+@router.post("/ingest-text")
+async def ingest_text(data: dict):
+    """
+    Ingest raw text (e.g. from copy-paste).
+    Expects json: {"title": "foo", "text": "bar"}
+    """
+    title = data.get("title", "Untitled")
+    text = data.get("text", "")
+    
+    if not text:
+        raise HTTPException(status_code=400, detail="No text provided")
+        
+    # Process
+    try:
+        chunks = chunk_text(text)
+        with span("ingest") as timer:
+            embeddings = get_embeddings(chunks)
+            
+            chroma_client = ChromaHTTPClient()
+            
+            ids = [f"cloud_text_{title}_{i}" for i in range(len(chunks))]
+            metadatas = [{"source": title, "type": "cloud_text", "embedding_model": embedding_planner.model_id}
+                         for _ in range(len(chunks))]
+            
+            chroma_client.upsert(
+                collection_name=live_collection(),
+                ids=ids,
+                embeddings=embeddings,
+                documents=chunks,
+                metadatas=metadatas
+            )
+        record_ingest("cloud_text", len(chunks), timer.elapsed)
+        bump_epoch(f"ingest-text {title}", client=chroma_client)
+        return {"success": True, "indexed_chunks": len(chunks)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
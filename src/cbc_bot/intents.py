@@ -0,0 +1,186 @@
+"""
+Local intent routing: greetings, FAQ hits and out-of-scope questions get a
+precomputed answer without touching HF, Chroma or an LLM.
+
+The classifier is a nearest-example match over TF-IDF vectors of word
+unigrams, word bigrams and character trigrams (the trigrams absorb typos like
+"reportng"). The example set is small and fixed, so the model is built once at
+import in pure Python and a lookup is a walk over an inverted index, well under
+a millisecond. Anything that does not clear the thresholds is "open" and goes
+to retrieval and generation as before.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .config import Config
+from .facts import levels_table
+from .singleflight import normalize_text
+
+GREETING_ANSWER = ("Habari! I am your Master CBC Consultant. Tell me specifically what you need to know "
+                   "about Grade 10 pathways or placement.")
+THANKS_ANSWER = "Karibu! Ask me anything else about Senior School placement, pathways or KJSEA."
+OUT_OF_SCOPE_ANSWER = ("I only cover Kenya's CBC/CBE system: KJSEA, Grade 10 placement, Senior School pathways "
+                       "and subject choices. Ask me about one of those and I will give you the exact details.")
+
+# intent -> (answer, example utterances). FAQ answers restate KnowledgeBase.SYSTEM_PROMPT facts.
+# "open" examples have no answer: they pull follow-ups and personal questions away from the fast paths.
+INTENTS: Dict[str, Tuple[Optional[str], List[str]]] = {
+    "greeting": (GREETING_ANSWER, [
+        "hi", "hello", "hey", "hey there", "hallo", "habari", "habari yako", "jambo", "sasa", "mambo", "niaje",
+        "good morning", "good afternoon", "good evening", "hi there", "hello bot", "are you there",
+    ]),
+    "thanks": (THANKS_ANSWER, [
+        "thanks", "thank you", "thank you so much", "asante", "asante sana", "ok thanks", "great thanks",
+        "that helps", "much appreciated",
+    ]),
+    "faq_placement_weights": (
+        "Final placement scores follow the 60/20/20 rule:\n"
+        "- 60% from KJSEA (Grade 9 exam)\n"
+        "- 20% from KPSEA (Grade 6 exam)\n"
+        "- 20% from School-Based Assessments (SBA)", [
+        "how is the placement score calculated", "what is the 60/20/20 rule", "explain the 60 20 20 rule",
+        "how are kjsea kpsea and sba weighted", "what percentage does kjsea contribute to placement",
+        "how much does kpsea count for placement", "what are the placement weights",
+        "how is the final score for grade 10 placement computed", "how much do school based assessments count",
+    ]),
+    "faq_achievement_levels": (
+        "CBC Achievement Levels:\n" + levels_table(), [
+        "what are the achievement levels", "what does ee1 mean", "what is ee2", "what is me1 and me2",
+        "explain ee1 ee2 me1 me2", "what are the cbc grades", "what is the cbc grading system",
+        "what percentage is ee1", "achievement level bands", "how does cbc grading work",
+    ]),
+    "faq_reporting_date": (
+        "Grade 10 reporting began on January 12, 2026. The placement review window ran January 6-9, 2026 "
+        "and is now closed; the current phase is late reporting and KEMIS reconciliation.", [
+        "when is grade 10 reporting", "what is the grade 10 reporting date", "when do grade 10 learners report",
+        "when do students report to senior school", "when does senior school start",
+        "when was the placement review window", "is the review window still open",
+        "when do form one students report", "what date do grade 10 students report to school",
+    ]),
+    "faq_engineering_subjects": (
+        "For engineering, take the STEM (Pure Sciences) pathway:\n"
+        "- Mandatory: Core Mathematics, Physics, Chemistry, Biology\n"
+        "- Recommended: Computer Science or Essential Mathematics", [
+        "what subjects do i need for engineering", "which subjects are needed to become an engineer",
+        "subjects for engineering in senior school", "what pathway is engineering",
+        "what are the stem pure sciences subjects", "mandatory subjects for stem",
+    ]),
+    "faq_social_sciences": (
+        "Social Sciences core subjects: English, Kiswahili, History & Citizenship, Geography, Business Studies, "
+        "Religious Education (CRE/IRE) and CSL.", [
+        "what are the social sciences subjects", "which subjects are in the social sciences pathway",
+        "social sciences core subjects", "what subjects are in humanities pathway",
+    ]),
+    "open": (None, [
+        "tell me more", "what are these", "explain more", "what about the others", "and the rest",
+        "can you elaborate", "what does that mean for my child", "give me more details",
+        "which one is better for my child",
+        "my child got ee2 which school can she join", "what should my son choose",
+    ]),
+    "out_of_scope": (OUT_OF_SCOPE_ANSWER, [
+        "what is the weather today", "will it rain tomorrow", "who won the football match",
+        "tell me a joke", "write me a poem", "what is the price of bitcoin", "give me a recipe for chapati",
+        "who is the best musician", "what is the capital of france", "how do i lose weight",
+        "recommend a good movie", "what is the exchange rate of the dollar", "who will win the election",
+        "how do i fix my car", "what time is it in london",
+    ]),
+}
+
+# Words that make a message about the education system; such a message is never sent to out_of_scope
+DOMAIN_WORDS = {
+    "cbc", "cbe", "kjsea", "kpsea", "kcpe", "kcse", "sba", "grade", "grades", "school", "schools", "pathway",
+    "pathways", "placement", "subject", "subjects", "stem", "knec", "kemis", "learner", "learners", "student",
+    "students", "teacher", "teachers", "exam", "exams", "score", "scores", "marks", "ee1", "ee2", "me1", "me2",
+    "career", "course", "university", "senior", "junior", "transfer", "reporting", "curriculum",
+}
+
+# Opinion and advice cues: "is the 60/20/20 rule fair?" or "which pathway should I pick?" shares words with an
+# FAQ but wants a tailored answer, so such messages never get a canned FAQ reply
+_ADVICE = re.compile(r"\b(fair|unfair|should|best|better|worse|why|recommend\w*|advi[cs]e|worth|good idea|"
+                     r"opinion|think|pick|choose)\b", re.I)
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:/[a-z0-9]+)*")
+
+
+class Intent(NamedTuple):
+    name: str  # an INTENTS key; "open" goes to retrieval and generation
+    answer: Optional[str]
+    score: float
+    example: Optional[str] = None
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN.findall(normalize_text(text))
+
+
+def _features(text: str) -> Counter:
+    tokens = _tokens(text)
+    features = Counter(f"w:{t}" for t in tokens)
+    features.update(f"b:{a}_{b}" for a, b in zip(tokens, tokens[1:]))
+    for token in tokens:
+        padded = f"^{token}$"
+        features.update(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return features
+
+
+class IntentClassifier:
+    """
+    Nearest-example classifier. A message gets an intent when its best example
+    scores at least the intent's threshold and beats the best example of any
+    other intent by `margin`; otherwise it is "open". FAQ answers are also
+    refused for messages much longer than the matched example, since the extra
+    words usually carry a personal detail the canned answer ignores, and for
+    opinion or advice questions (see _ADVICE).
+    """
+    def __init__(self, intents: Dict[str, Tuple[Optional[str], List[str]]] = INTENTS,
+                 faq_threshold: float = Config.INTENT_FAQ_THRESHOLD, margin: float = 0.05):
+        self.answers = {name: answer for name, (answer, _) in intents.items()}
+        self.thresholds = {name: faq_threshold if name.startswith("faq_") else 0.5 for name in intents}
+        self.margin = margin
+        examples = [(name, text) for name, (_, texts) in intents.items() for text in texts]
+        self.labels = [name for name, _ in examples]
+        self.texts = [text for _, text in examples]
+
+        counts = [_features(text) for text in self.texts]
+        document_frequency = Counter(feature for c in counts for feature in c)
+        self.idf = {f: math.log((1 + len(counts)) / (1 + df)) + 1.0 for f, df in document_frequency.items()}
+        # feature -> [(example index, weight)]
+        self.index: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        for i, c in enumerate(counts):
+            for feature, weight in self._vector(c).items():
+                self.index[feature].append((i, weight))
+
+    def _vector(self, counts: Counter) -> Dict[str, float]:
+        vector = {f: (1 + math.log(n)) * self.idf[f] for f, n in counts.items() if f in self.idf}
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+        return {f: w / norm for f, w in vector.items()}
+
+    def classify(self, text: str) -> Intent:
+        tokens = _tokens(text)
+        if not tokens:
+            return Intent("greeting", self.answers["greeting"], 1.0)
+        scores: Dict[int, float] = defaultdict(float)
+        for feature, weight in self._vector(_features(text)).items():
+            for i, example_weight in self.index.get(feature, ()):
+                scores[i] += weight * example_weight
+
+        best: Dict[str, Tuple[float, int]] = {}
+        for i, score in scores.items():
+            if score > best.get(self.labels[i], (0.0, -1))[0]:
+                best[self.labels[i]] = (score, i)
+        ranked = sorted(best.items(), key=lambda item: -item[1][0])
+        if ranked:
+            name, (score, i) = ranked[0]
+            runner_up = ranked[1][1][0] if len(ranked) > 1 else 0.0
+            in_domain = any(t in DOMAIN_WORDS for t in tokens)
+            too_long = name.startswith("faq_") and len(tokens) > len(_tokens(self.texts[i])) + 4
+            advice = name.startswith("faq_") and _ADVICE.search(text)
+            if (score >= self.thresholds[name] and score - runner_up >= self.margin and not too_long and not advice
+                    and not (name == "out_of_scope" and in_domain)):
+                return Intent(name, self.answers[name], score, self.texts[i])
+        # A single unrecognised word gets the greeting, which asks for a specific question
+        if len(tokens) == 1:
+            return Intent("greeting", self.answers["greeting"], ranked[0][1][0] if ranked else 0.0)
+        return Intent("open", None, ranked[0][1][0] if ranked else 0.0)
@@ -0,0 +1,176 @@
+"""
+In-process vector index loaded from a compact snapshot.
+Answers queries with the same response shape as Chroma's /query endpoint, so
+the retriever can run without a round trip to Chroma Cloud.
+
+For multi-worker serving the snapshot is unpacked once into a mapped
+directory (<snapshot>.mmap/: normalised float32 matrix as .npy, ids, documents
+and metadata as UTF-8 blobs with offset tables). Every worker memory-maps the
+same files, so the OS page cache holds one copy however many workers run,
+and a gunicorn master that preloads it shares it with its children for free.
+"""
+import json
+import os
+import shutil
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .snapshot import CompactSnapshotReader
+
+MAPPED_VERSION = 1
+
+
+class MappedStrings(Sequence):
+    """Read-only list of strings stored as one mmapped UTF-8 blob plus an offsets table."""
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray, as_json: bool = False):
+        self._blob = blob
+        self._offsets = offsets
+        self._as_json = as_json
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice): return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0: i += len(self)
+        text = self._blob[self._offsets[i]:self._offsets[i + 1]].tobytes().decode("utf-8")
+        return json.loads(text) if self._as_json else text
+
+
+def _write_strings(directory: str, name: str, values):
+    offsets, total = [0], 0
+    with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+        for value in values:
+            data = value.encode("utf-8")
+            f.write(data)
+            total += len(data)
+            offsets.append(total)
+    np.save(os.path.join(directory, f"{name}.offsets.npy"), np.asarray(offsets, dtype=np.int64))
+
+
+def _map_strings(directory: str, name: str, as_json: bool = False) -> MappedStrings:
+    path = os.path.join(directory, f"{name}.bin")
+    blob = np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.zeros(0, np.uint8)
+    return MappedStrings(blob, np.load(os.path.join(directory, f"{name}.offsets.npy"), mmap_mode="r"), as_json)
+
+
+def _source_stamp(path: str) -> dict:
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class LocalVectorIndex:
+    def __init__(self, ids: Sequence[str], matrix: np.ndarray, documents: Sequence[str], metadatas: Sequence[dict],
+                 model_id: str, normalized: bool = False):
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.model_id = model_id
+        self.dimension = matrix.shape[1]
+        # Normalised once so cosine similarity is a single matrix product per query
+        if normalized:
+            self.matrix = matrix
+        else:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            self.matrix = matrix / np.where(norms == 0, 1, norms)
+
+    @classmethod
+    def from_snapshot(cls, path: str) -> "LocalVectorIndex":
+        reader = CompactSnapshotReader(path)
+        ids, matrix, documents, metadatas = reader.load()
+        print(f"Loaded local index from {path}: {len(ids)} vectors ({reader.model_id}, {reader.dimension}d)")
+        return cls(ids, matrix, documents, metadatas, reader.model_id)
+
+    @classmethod
+    def from_mapped(cls, directory: str) -> "LocalVectorIndex":
+        """Memory-maps a directory written by `save_mapped`; nothing is copied into the process."""
+        with open(os.path.join(directory, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        matrix = np.load(os.path.join(directory, "matrix.npy"), mmap_mode="r")
+        return cls(_map_strings(directory, "ids"), matrix, _map_strings(directory, "documents"),
+                   _map_strings(directory, "metadatas", as_json=True), manifest["model_id"], normalized=True)
+
+    def save_mapped(self, directory: str, source: Optional[dict] = None):
+        """Writes the mapped layout into `directory` (created, must not exist yet)."""
+        os.makedirs(directory)
+        np.save(os.path.join(directory, "matrix.npy"), np.ascontiguousarray(self.matrix, dtype=np.float32))
+        _write_strings(directory, "ids", self.ids)
+        _write_strings(directory, "documents", self.documents)
+        _write_strings(directory, "metadatas", (json.dumps(m or {}) for m in self.metadatas))
+        manifest = {"version": MAPPED_VERSION, "model_id": self.model_id, "dimension": self.dimension,
+                    "count": len(self), "source": source}
+        # Written last: a directory without a manifest is an interrupted build
+        with open(os.path.join(directory, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+    @classmethod
+    def load_shared(cls, snapshot_path: str, directory: Optional[str] = None) -> "LocalVectorIndex":
+        """
+        Maps `<snapshot>.mmap/`, unpacking the snapshot into it first when it is
+        missing or was built from a different version of the file.
+        """
+        directory = directory or snapshot_path + ".mmap"
+        stamp = _source_stamp(snapshot_path)
+        try:
+            with open(os.path.join(directory, "manifest.json"), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            fresh = manifest.get("version") == MAPPED_VERSION and manifest.get("source") == stamp
+        except (OSError, ValueError):
+            fresh = False
+
+        if not fresh:
+            index = cls.from_snapshot(snapshot_path)
+            staging = f"{directory}.tmp{os.getpid()}"
+            shutil.rmtree(staging, ignore_errors=True)
+            index.save_mapped(staging, stamp)
+            shutil.rmtree(directory, ignore_errors=True)
+            try:
+                os.replace(staging, directory)
+            except OSError:
+                # Another worker published the same build first
+                shutil.rmtree(staging, ignore_errors=True)
+            print(f"Unpacked {snapshot_path} into {directory} for shared memory-mapping")
+
+        index = cls.from_mapped(directory)
+        print(f"Mapped local index {directory}: {len(index)} vectors ({index.model_id}, {index.dimension}d)")
+        return index
+
+    def __len__(self):
+        return len(self.ids)
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 15) -> dict:
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim != 2 or queries.shape[1] != self.dimension:
+            raise ValueError(f"Query vectors must be {self.dimension}d, got shape {queries.shape}")
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        k = min(n_results, len(self.ids))
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if k == 0:
+            for key in result: result[key] = [[] for _ in range(len(queries))]
+            return result
+
+        scores = queries @ self.matrix.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        for row, candidates in enumerate(top):
+            ranked = candidates[np.argsort(-scores[row, candidates])]
+            result["ids"].append([self.ids[i] for i in ranked])
+            result["documents"].append([self.documents[i] for i in ranked])
+            result["metadatas"].append([self.metadatas[i] for i in ranked])
+            result["distances"].append([float(1 - scores[row, i]) for i in ranked])
+        return result
+
+
+_shared: Dict[str, LocalVectorIndex] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_index(snapshot_path: str) -> LocalVectorIndex:
+    """One mapped index per snapshot per process, reused by every retriever (and preloaded before fork)."""
+    key = os.path.abspath(snapshot_path)
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key] = LocalVectorIndex.load_shared(snapshot_path)
+        return _shared[key]
@@ -0,0 +1,124 @@
+"""
+Pipelined local indexing for the on-disk Chroma DB.
+Chunks from every source are streamed into large cross-file batches. Batches
+are encoded by SentenceTransformer worker processes while the main process
+upserts earlier results, so building the local index scales with cores.
+"""
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from .extraction import LineChunker
+
+# (id, document, metadata)
+Record = Tuple[str, str, dict]
+
+_encoder = None
+
+
+def _init_encoder(model_id: str, threads: int):
+    """Worker-process initializer: load the model once per process."""
+    global _encoder
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(max(1, threads))
+    _encoder = SentenceTransformer(model_id)
+
+
+def _encode(texts: List[str]):
+    return _encoder.encode(texts, show_progress_bar=False, batch_size=64)
+
+
+def iter_file_records(processed_dir: str, model_id: str, chunk_size_lines: int = 15) -> Iterator[Record]:
+    """Line-window chunks of every .txt file in `processed_dir`, streamed file by file."""
+    for filename in sorted(os.listdir(processed_dir)):
+        if not filename.endswith(".txt"): continue
+        chunker = LineChunker(chunk_size_lines)
+        metadata = {"source": filename, "type": "local_pdf", "embedding_model": model_id}
+        i = 0
+        with open(os.path.join(processed_dir, filename), "r", encoding="utf-8") as f:
+            for line in f:
+                for chunk in chunker.feed(line):
+                    yield f"local_{filename}_{i}", chunk, dict(metadata)
+                    i += 1
+        for chunk in chunker.close():
+            yield f"local_{filename}_{i}", chunk, dict(metadata)
+
+
+def iter_hf_records(dataset, model_id: str, text_field: str = "text") -> Iterator[Record]:
+    """Rows of a HuggingFace dataset as records, without materialising the column."""
+    for i, row in enumerate(dataset):
+        text = row.get(text_field)
+        if text:
+            yield f"hf_{i}", text, {"source": "huggingface", "index": i, "embedding_model": model_id}
+
+
+def batched(records: Iterable[Record], batch_size: int) -> Iterator[List[Record]]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class LocalIndexPipeline:
+    """
+    Encodes record batches in `workers` processes and upserts them into a local
+    chromadb collection in submission order. Up to `workers + 1` batches are in
+    flight, so encoding never waits for the previous upsert to finish.
+    """
+    def __init__(self, collection, model_id: str, batch_size: int = 512, workers: Optional[int] = None):
+        self.collection = collection
+        self.model_id = model_id
+        self.batch_size = batch_size
+        self.workers = workers or max(1, min(4, (os.cpu_count() or 2) // 2))
+        self.stats = {"records": 0, "batches": 0, "encode_wait_s": 0.0, "upsert_s": 0.0, "elapsed_s": 0.0}
+
+    def _upsert(self, batch: List[Record], embeddings):
+        started = time.perf_counter()
+        self.collection.upsert(
+            ids=[r[0] for r in batch],
+            documents=[r[1] for r in batch],
+            embeddings=embeddings.tolist(),
+            metadatas=[r[2] for r in batch]
+        )
+        self.stats["upsert_s"] += time.perf_counter() - started
+        self.stats["records"] += len(batch)
+        self.stats["batches"] += 1
+
+    def _report(self, started: float):
+        elapsed = time.perf_counter() - started
+        rate = self.stats["records"] / max(elapsed, 1e-6)
+        print(f"Progress: {self.stats['records']} records in {self.stats['batches']} batches "
+              f"({rate:.1f} records/s, waiting on encoders {self.stats['encode_wait_s']:.1f}s, "
+              f"upserting {self.stats['upsert_s']:.1f}s)")
+
+    def run(self, records: Iterable[Record]) -> dict:
+        started = time.perf_counter()
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_encoder,
+                                 initargs=(self.model_id, threads)) as pool:
+            for batch in batched(records, self.batch_size):
+                pending.append((batch, pool.submit(_encode, [r[1] for r in batch])))
+                if len(pending) > self.workers:
+                    self._drain_one(pending)
+                    self._report(started)
+            while pending:
+                self._drain_one(pending)
+                self._report(started)
+        self.stats["elapsed_s"] = time.perf_counter() - started
+        return self.stats
+
+    def _drain_one(self, pending: deque):
+        batch, future = pending.popleft()
+        waited = time.perf_counter()
+        embeddings = future.result()
+        self.stats["encode_wait_s"] += time.perf_counter() - waited
+        self._upsert(batch, embeddings)
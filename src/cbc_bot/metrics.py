@@ -0,0 +1,239 @@
+"""
+Lightweight in-process metrics with Prometheus text exposition.
+Stages are timed with `span("stage")`, which records into the
+cbc_stage_seconds histogram; counters and other histograms cover provider
+attempts, cache hits, context size and ingestion throughput. No client
+library is required; `render()` produces the /metrics payload.
+"""
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (0, 500, 1000, 2500, 5000, 10000, 20000, 40000, 80000)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_str(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in zip(labelnames, values)]
+    if extra: parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(k, "")) for k in self.labelnames)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def collect(self):
+        lines = self._header()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                # Whole numbers are written out in full: large counters and epochs must not round
+                text = str(int(value)) if float(value).is_integer() else f"{value:g}"
+                lines.append(f"{self.name}{_label_str(self.labelnames, key)} {text}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound: series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def count(self, **labels) -> int:
+        series = self._values.get(self._key(labels))
+        return series[-2] if series else 0
+
+    def totals(self) -> Dict[Tuple[str, ...], Tuple[int, float]]:
+        """(count, sum) per label set."""
+        with self._lock:
+            return {key: (series[-2], series[-1]) for key, series in self._values.items()}
+
+    def collect(self):
+        lines = self._header()
+        with self._lock:
+            for key, series in sorted(self._values.items()):
+                for bound, n in zip(self.buckets, series):
+                    le = 'le="%g"' % bound
+                    lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, le)} {n}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, le)} {series[-2]}")
+                lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {series[-1]:.6f}")
+                lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {series[-2]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, labelnames=(), **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, labelnames=()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def reset(self):
+        """Clears every series, e.g. between benchmark runs."""
+        for metric in list(self._metrics.values()):
+            with metric._lock:
+                metric._values.clear()
+
+    def render(self) -> str:
+        lines = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = REGISTRY.histogram("cbc_stage_seconds", "Latency of each pipeline stage.", ["stage", "outcome"])
+PROVIDER_ATTEMPTS = REGISTRY.counter("cbc_llm_provider_attempts_total",
+                                     "LLM provider calls by provider and outcome.", ["provider", "outcome"])
+PROVIDER_SECONDS = REGISTRY.histogram("cbc_llm_provider_seconds", "Latency of each LLM provider call.",
+                                      ["provider", "outcome"])
+CACHE_LOOKUPS = REGISTRY.counter("cbc_cache_lookups_total", "Cache lookups by cache and result (hit/miss).",
+                                 ["cache", "result"])
+CONTEXT_CHARS = REGISTRY.histogram("cbc_context_chars", "Characters of retrieved context sent to the LLM.",
+                                   buckets=SIZE_BUCKETS)
+HISTORY_TOKENS = REGISTRY.histogram("cbc_history_tokens", "Estimated tokens of chat history per chat, after windowing.",
+                                    buckets=(0, 100, 250, 500, 1000, 1500, 2500, 5000, 10000))
+CONTEXT_FRAGMENTS = REGISTRY.histogram("cbc_context_fragments", "Unique fragments in the retrieved context.",
+                                       buckets=COUNT_BUCKETS)
+COALESCED = REGISTRY.counter("cbc_singleflight_total",
+                             "Single-flight calls by layer and role (leader ran it, follower shared it).",
+                             ["layer", "role"])
+ADMISSION_ACTIVE = REGISTRY.gauge("cbc_admission_active", "Requests currently holding an admission slot.", ["route"])
+ADMISSION_QUEUE_DEPTH = REGISTRY.gauge("cbc_admission_queue_depth", "Requests waiting for an admission slot.", ["route"])
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram("cbc_admission_wait_seconds", "Time admitted requests spent queued.",
+                                            ["route"])
+ADMISSION_REJECTED = REGISTRY.counter("cbc_admission_rejected_total",
+                                      "Requests shed with 503, by reason (queue_full/client_limit/deadline/timeout).",
+                                      ["route", "reason"])
+INTENT_ROUTES = REGISTRY.counter("cbc_intent_total", "Chats by routed intent (\"open\" went to retrieval and the LLM).",
+                                 ["intent"])
+CORPUS_EPOCH = REGISTRY.gauge("cbc_corpus_epoch", "Corpus epoch this worker last saw (see epoch.py).", ["collection"])
+INGEST_RECORDS = REGISTRY.counter("cbc_ingest_records_total", "Chunks indexed, by ingestion source.", ["source"])
+INGEST_THROUGHPUT = REGISTRY.gauge("cbc_ingest_last_records_per_second",
+                                   "Throughput of the most recent ingestion job.", ["source"])
+
+
+class _Span:
+    __slots__ = ("stage", "outcome", "elapsed")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.outcome = "ok"
+        self.elapsed = 0.0
+
+
+@contextmanager
+def span(stage: str):
+    """
+    Times the enclosed block into cbc_stage_seconds{stage=...}. The outcome
+    label is "ok" unless the block raises (or the caller sets span.outcome).
+    """
+    state = _Span(stage)
+    started = time.perf_counter()
+    try:
+        yield state
+    except BaseException:
+        state.outcome = "error"
+        raise
+    finally:
+        state.elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(state.elapsed, stage=stage, outcome=state.outcome)
+
+
+def timed(stage: str):
+    """Decorator form of `span`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_ingest(source: str, records: int, seconds: Optional[float] = None):
+    """Counts indexed chunks and, when the job duration is known, its throughput."""
+    INGEST_RECORDS.inc(records, source=source)
+    if seconds:
+        INGEST_THROUGHPUT.set(records / seconds, source=source)
+
+
+def render() -> str:
+    return REGISTRY.render()
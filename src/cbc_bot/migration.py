@@ -0,0 +1,265 @@
+"""
+Paged, resumable collection migration.
+Collections are read in ID-ordered pages and streamed to a sink (Chroma over
+HTTP or a snapshot file). The next page is read while the current one uploads,
+and a checkpoint records the last migrated ID so an interrupted run can resume.
+"""
+import gzip
+import json
+import os
+import queue
+import threading
+import zlib
+from typing import Iterator, List, Optional
+
+from .chroma import BulkUpserter, ChromaHTTPClient
+
+SNAPSHOT_FORMAT = "cbc-snapshot-jsonl"
+SNAPSHOT_VERSION = 1
+PAGE_FIELDS = ("ids", "embeddings", "documents", "metadatas")
+
+
+def _as_list(vector) -> List[float]:
+    return vector.tolist() if hasattr(vector, "tolist") else list(vector)
+
+
+def iter_collection_pages(collection, page_size: int = 500, after_id: Optional[str] = None) -> Iterator[dict]:
+    """
+    Yields pages of a local chromadb collection in ID order. Only the ID list
+    is held in memory; documents and embeddings are fetched one page at a time.
+    """
+    all_ids = sorted(collection.get(include=[])["ids"])
+    if after_id is not None:
+        all_ids = [i for i in all_ids if i > after_id]
+
+    for start in range(0, len(all_ids), page_size):
+        page_ids = all_ids[start:start + page_size]
+        data = collection.get(ids=page_ids, include=["documents", "metadatas", "embeddings"])
+        position = {record_id: n for n, record_id in enumerate(data["ids"])}
+        order = [position[i] for i in page_ids if i in position]
+        yield {
+            "ids": [data["ids"][n] for n in order],
+            "embeddings": [_as_list(data["embeddings"][n]) for n in order],
+            "documents": [data["documents"][n] for n in order],
+            "metadatas": [data["metadatas"][n] or {} for n in order],
+        }
+
+
+def prefetch(pages: Iterator[dict], depth: int = 2) -> Iterator[dict]:
+    """Reads ahead up to `depth` pages on a background thread."""
+    buffer: queue.Queue = queue.Queue(maxsize=depth)
+    done = object()
+
+    def _reader():
+        try:
+            for page in pages:
+                buffer.put(page)
+        except Exception as e:
+            buffer.put(e)
+        buffer.put(done)
+
+    threading.Thread(target=_reader, daemon=True).start()
+    while True:
+        item = buffer.get()
+        if item is done: return
+        if isinstance(item, Exception): raise item
+        yield item
+
+
+class MigrationCheckpoint:
+    """Last migrated ID for one source/destination pair, stored as JSON."""
+    def __init__(self, path: str, source: str, destination: str):
+        self.path = path
+        self.source = source
+        self.destination = destination
+        self.last_id: Optional[str] = None
+        self.migrated = 0
+
+    def load(self) -> Optional[str]:
+        if not os.path.exists(self.path): return None
+        with open(self.path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("source") == self.source and state.get("destination") == self.destination:
+            self.last_id = state.get("last_id")
+            self.migrated = state.get("migrated", 0)
+        return self.last_id
+
+    def save(self, last_id: str, count: int):
+        self.last_id = last_id
+        self.migrated += count
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"source": self.source, "destination": self.destination,
+                       "last_id": self.last_id, "migrated": self.migrated}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path): os.remove(self.path)
+
+
+class SnapshotWriter:
+    """
+    Portable gzip'd JSON-lines snapshot: one header line, then one record per line.
+    Records are appended page by page, so the file is written without holding
+    the collection in memory. The header records the embedding model and the
+    vector dimension (taken from the first page, as CompactSnapshotWriter does).
+    """
+    def __init__(self, path: str, collection_name: str = "Curriculumnpdfs", model_id: Optional[str] = None,
+                 resume_after: Optional[str] = None):
+        self.path = path
+        self.records = 0
+        exists = resume_after is not None
+        if exists:
+            self._truncate_after(resume_after)
+            self.header = read_snapshot_header(path)
+            if model_id and self.header.get("model_id") not in (None, model_id):
+                raise ValueError(f"Cannot append {model_id} vectors to a {self.header['model_id']} snapshot")
+        else:
+            self.header = {"format": SNAPSHOT_FORMAT, "version": SNAPSHOT_VERSION, "collection": collection_name,
+                           "model_id": model_id, "dimension": None}
+        self._header_written = exists
+        self._file = gzip.open(path, "at" if exists else "wt", encoding="utf-8")
+
+    def _truncate_after(self, resume_after: str):
+        """
+        Keeps the records up to the checkpointed id and drops the rest: a page written
+        just before a crash (but never checkpointed) or a torn final line or gzip member.
+        gzip can't be cut in place, so the kept records are copied to a new file.
+        """
+        if not os.path.exists(self.path):
+            raise ValueError(f"Checkpoint is at {resume_after!r} but {self.path} is missing; rerun with --restart")
+        tmp_path = f"{self.path}.tmp"
+        last_id = None
+        with gzip.open(self.path, "rt", encoding="utf-8") as src, gzip.open(tmp_path, "wt", encoding="utf-8") as dst:
+            dst.write(src.readline())
+            try:
+                for line in src:
+                    if not line.endswith("\n"): break
+                    record = json.loads(line)
+                    if record["id"] > resume_after: break
+                    dst.write(line)
+                    last_id = record["id"]
+            except (EOFError, OSError, zlib.error, ValueError):
+                pass
+        if last_id != resume_after:
+            os.remove(tmp_path)
+            raise ValueError(f"{self.path} ends at {last_id!r}, not at the checkpoint {resume_after!r}; "
+                             f"rerun with --restart")
+        os.replace(tmp_path, self.path)
+
+    def _write_header(self):
+        self._file.write(json.dumps(self.header) + "\n")
+        self._header_written = True
+
+    def write_page(self, page: dict):
+        if not page["ids"]: return
+        if not self._header_written:
+            self.header["dimension"] = len(page["embeddings"][0])
+            self._write_header()
+        dimension = self.header.get("dimension")
+        for record_id, embedding, document, metadata in zip(*(page[k] for k in PAGE_FIELDS)):
+            vector = _as_list(embedding)
+            if dimension is not None and len(vector) != dimension:
+                raise ValueError(f"Record {record_id} has {len(vector)} dimensions, snapshot has {dimension}")
+            self._file.write(json.dumps({"id": record_id, "embedding": vector,
+                                         "document": document, "metadata": metadata}) + "\n")
+            self.records += 1
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            if not self._header_written: self._write_header()
+            self._file.close()
+
+
+def read_snapshot_header(path: str) -> dict:
+    """The header line; snapshots written before model tagging have no model_id/dimension."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+    if header.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"{path} is not a {SNAPSHOT_FORMAT} file")
+    return header
+
+
+def iter_snapshot_pages(path: str, page_size: int = 500, after_id: Optional[str] = None) -> Iterator[dict]:
+    """Yields pages from a snapshot file, skipping records up to `after_id`."""
+    read_snapshot_header(path)
+    page = {k: [] for k in PAGE_FIELDS}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        f.readline()
+        for line in f:
+            if not line.strip(): continue
+            record = json.loads(line)
+            # Ids are written in increasing order; anything else is a page repeated by an old resumed run
+            if after_id is not None and record["id"] <= after_id: continue
+            after_id = record["id"]
+            page["ids"].append(record["id"])
+            page["embeddings"].append(record["embedding"])
+            page["documents"].append(record["document"])
+            page["metadatas"].append(record["metadata"])
+            if len(page["ids"]) >= page_size:
+                yield page
+                page = {k: [] for k in PAGE_FIELDS}
+    if page["ids"]:
+        yield page
+
+
+def open_snapshot_pages(path: str, page_size: int = 500, after_id: Optional[str] = None) -> Iterator[dict]:
+    """Pages from either snapshot format, picked by file extension."""
+    if path.endswith(".cbcsnap"):
+        from .snapshot import CompactSnapshotReader
+        return CompactSnapshotReader(path).iter_pages(page_size=page_size, after_id=after_id)
+    return iter_snapshot_pages(path, page_size=page_size, after_id=after_id)
+
+
+def open_snapshot_writer(path: str, collection_name: str, model_id: str, resume_after: Optional[str] = None):
+    """
+    A snapshot sink: compact binary for .cbcsnap paths, JSON lines otherwise.
+    With `resume_after` (the checkpointed id) the existing file is cut back to that
+    record and appended to, so a page written before a crash is not written twice.
+    """
+    if path.endswith(".cbcsnap"):
+        from .snapshot import CompactSnapshotWriter
+        return CompactSnapshotWriter(path, model_id, collection_name=collection_name, resume_after=resume_after)
+    return SnapshotWriter(path, collection_name, model_id, resume_after=resume_after)
+
+
+def read_any_snapshot_header(path: str) -> dict:
+    if path.endswith(".cbcsnap"):
+        from .snapshot import CompactSnapshotReader
+        return CompactSnapshotReader(path).header
+    return read_snapshot_header(path)
+
+
+class ChromaSink:
+    """Writes pages to a Chroma collection; each page is confirmed before the checkpoint moves."""
+    def __init__(self, client: ChromaHTTPClient, collection_name: str = "Curriculumnpdfs"):
+        self.client = client
+        self.collection_name = collection_name
+        self.writer = BulkUpserter(client, collection_name)
+
+    def write_page(self, page: dict):
+        self.writer.add(*(page[k] for k in PAGE_FIELDS))
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+
+
+def migrate_pages(pages: Iterator[dict], sink, checkpoint: Optional[MigrationCheckpoint] = None,
+                  depth: int = 2) -> int:
+    """
+    Streams `pages` into `sink`, reading ahead while each page is written.
+    Returns the number of records migrated in this run.
+    """
+    migrated = 0
+    try:
+        for page in prefetch(pages, depth):
+            if not page["ids"]: continue
+            sink.write_page(page)
+            migrated += len(page["ids"])
+            if checkpoint: checkpoint.save(page["ids"][-1], len(page["ids"]))
+            print(f"  ... {migrated} records migrated (last id: {page['ids'][-1]})")
+    finally:
+        sink.close()
+    return migrated
@@ -0,0 +1,159 @@
+"""
+On-demand profiling for a live worker.
+StackSampler is a statistical profiler: a background thread snapshots every
+thread's Python stack at a fixed interval and folds the samples into
+collapsed stacks ("frame;frame;frame count"), the input format of
+flamegraph.pl and speedscope. AllocationTracer wraps selected runs (e.g. /ingest
+indexing) in tracemalloc and keeps a short history of where memory was allocated.
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import List, Optional
+
+# Leaf frames of threads that are parked rather than working
+IDLE_LEAVES = {
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"), ("queue.py", "get"), ("thread.py", "_worker"),
+}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+class StackSampler:
+    """Samples all thread stacks every `interval` seconds until stopped."""
+    def __init__(self, interval: float = 0.005, include_idle: bool = False, max_depth: int = 64):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.max_depth = max_depth
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample_once(self, own_id: int):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id: continue
+            code = frame.f_code
+            if not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, f"thread-{thread_id}"))
+            self.samples[";".join(reversed(stack))] += 1
+        self.sample_count += 1
+
+    def _run(self):
+        own_id = threading.get_ident()
+        started = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            self._sample_once(own_id)
+        self.elapsed = time.perf_counter() - started
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="cbc-stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread: self._thread.join()
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+
+_profile_lock = threading.Lock()
+
+
+@contextmanager
+def sampling(interval: float = 0.005, include_idle: bool = False):
+    """Runs a StackSampler for the duration of the block; one profile at a time per process."""
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running in this worker")
+    sampler = StackSampler(interval, include_idle)
+    try:
+        sampler.start()
+        yield sampler
+    finally:
+        sampler.stop()
+        _profile_lock.release()
+
+
+class AllocationTracer:
+    """
+    Traces memory allocations for the next `runs` calls of `trace()`.
+    tracemalloc is process-wide, so only one run is traced at a time; others
+    running concurrently show up inside that trace.
+    """
+    def __init__(self, history: int = 10):
+        self.reports = deque(maxlen=history)
+        self._remaining = 0
+        self._frames = 25
+        self._top = 25
+        self._lock = threading.Lock()
+        self._active = False
+
+    def arm(self, runs: int = 1, frames: int = 25, top: int = 25):
+        with self._lock:
+            self._remaining = runs
+            self._frames = frames
+            self._top = top
+
+    @property
+    def armed(self) -> int:
+        return self._remaining
+
+    def _claim(self) -> bool:
+        with self._lock:
+            if self._remaining <= 0 or self._active or tracemalloc.is_tracing():
+                return False
+            self._remaining -= 1
+            self._active = True
+            return True
+
+    @contextmanager
+    def trace(self, label: str):
+        if not self._claim():
+            yield
+            return
+        tracemalloc.start(self._frames)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.reports.append(self._report(label, snapshot, peak, time.perf_counter() - started))
+            with self._lock:
+                self._active = False
+
+    def _report(self, label: str, snapshot, peak: int, elapsed: float) -> dict:
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+        top = [{"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_bytes": stat.size, "count": stat.count}
+               for stat in snapshot.statistics("lineno")[:self._top]]
+        collapsed: List[str] = []
+        for stat in snapshot.statistics("traceback")[:self._top * 4]:
+            frames = [f"{os.path.basename(f.filename)}:{f.lineno}" for f in stat.traceback]
+            collapsed.append(f"{';'.join(frames)} {stat.size}")
+        return {"label": label, "seconds": round(elapsed, 3), "peak_bytes": peak,
+                "top": top, "collapsed": "\n".join(collapsed)}
@@ -0,0 +1,113 @@
+"""
+Background re-embedding of a namespace into a new embedding model.
+Documents are read from the source collection page by page, embedded with the
+target model and written into a fresh versioned collection. Once it validates,
+the target namespace alias is switched (and optionally promoted to serve chat),
+so a model change never takes the knowledge base offline or mixes vectors.
+"""
+import threading
+import time
+from typing import Optional
+
+from .chroma import BulkUpserter, ChromaHTTPClient
+from .config import Config
+from .embeddings import EmbeddingPlanner
+from .registry import CollectionRegistry, namespace_metadata, validate_collection, versioned_name
+
+
+class ReembedWorker:
+    def __init__(self, target_planner: EmbeddingPlanner, logical_name: str = Config.COLLECTION_NAME,
+                 source_collection: Optional[str] = None, client: Optional[ChromaHTTPClient] = None,
+                 registry: Optional[CollectionRegistry] = None, page_size: int = 100, promote: bool = False):
+        self.planner = target_planner
+        self.logical_name = logical_name
+        self.client = client or ChromaHTTPClient()
+        self.registry = registry or CollectionRegistry(self.client)
+        self.source = source_collection
+        self.target = versioned_name(logical_name, target_planner.model_id)
+        self.page_size = page_size
+        self.promote = promote
+        self.state = "pending"
+        self.copied = 0
+        self.total = 0
+        self.error: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def status(self) -> dict:
+        return {"state": self.state, "source": self.source, "target": self.target,
+                "model": self.planner.model_id, "copied": self.copied, "total": self.total, "error": self.error}
+
+    def start(self) -> threading.Thread:
+        self._thread = threading.Thread(target=self.run, name="reembed-worker", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def join(self, timeout: Optional[float] = None):
+        if self._thread: self._thread.join(timeout)
+
+    def _reembed(self, writer: BulkUpserter, page: dict):
+        page["documents"] = [doc or "" for doc in page["documents"]]
+        embeddings = self.planner.embed(page["documents"])
+        dimension = len(embeddings[0]) if embeddings else None
+        metadatas = []
+        for metadata in page["metadatas"]:
+            tagged = dict(metadata or {})
+            tagged["embedding_model"] = self.planner.model_id
+            if dimension: tagged["embedding_dim"] = dimension
+            metadatas.append(tagged)
+        writer.add(page["ids"], embeddings, page["documents"], metadatas)
+        writer.flush()
+        self.copied += len(page["ids"])
+
+    def _list_ids(self, name: str) -> set:
+        ids, offset = set(), 0
+        while True:
+            page = self.client.get(name, include=[], limit=1000, offset=offset)
+            if not page.get("ids"): return ids
+            ids.update(page["ids"])
+            offset += 1000
+
+    def run(self):
+        try:
+            self.state = "running"
+            self.source = self.source or self.registry.resolve(self.logical_name)
+            self.total = self.client.count(self.source)
+            self.client.get_collection_id(self.target, metadata=namespace_metadata(self.planner.model_id))
+            print(f"Re-embedding {self.total} records: {self.source} -> {self.target} ({self.planner.model_id})")
+
+            started = time.perf_counter()
+            with BulkUpserter(self.client, self.target) as writer:
+                offset = 0
+                while True:
+                    page = self.client.get(self.source, include=["documents", "metadatas"],
+                                           limit=self.page_size, offset=offset)
+                    if not page.get("ids"): break
+                    self._reembed(writer, page)
+                    offset += self.page_size
+                    rate = self.copied / max(time.perf_counter() - started, 1e-6)
+                    print(f"  ... {self.copied}/{self.total} re-embedded ({rate:.1f} docs/s)")
+
+                # Catch records written to the source while the main pass was running
+                missing = sorted(self._list_ids(self.source) - self._list_ids(self.target))
+                for start in range(0, len(missing), self.page_size):
+                    page = self.client.get(self.source, ids=missing[start:start + self.page_size],
+                                           include=["documents", "metadatas"])
+                    if page.get("ids"): self._reembed(writer, page)
+                if missing:
+                    print(f"  ... caught up {len(missing)} records added during the run")
+
+            self.state = "validating"
+            self.total = max(self.total, self.client.count(self.source))
+            probe = self.planner.embed(["Grade 10 reporting date and placement"])[0]
+            ok, detail = validate_collection(self.client, self.target, self.total, probe)
+            if not ok:
+                raise RuntimeError(detail)
+
+            self.registry.set_namespace_alias(self.logical_name, self.planner.model_id, self.target, promote=self.promote)
+            self.state = "done"
+            print(f"✅ {detail}; namespace {self.logical_name}@{self.planner.model_id} -> {self.target}"
+                  + (" (promoted)" if self.promote else ""))
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            print(f"❌ Re-embedding failed: {e}")
@@ -0,0 +1,156 @@
+"""
+Collection registry: logical collection names mapped to physical, versioned
+Chroma collections. The mapping lives in a small Chroma collection so the
+backend, the Streamlit app and the maintenance scripts all see the same alias,
+and a rebuild can switch the live collection in one write.
+
+Vectors from different embedding models never share a collection. Each
+(logical name, model) pair is a namespace with its own alias
+("Curriculumnpdfs@BAAI/bge-small-en-v1.5"); the plain logical alias points at
+whichever namespace is currently promoted.
+"""
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from .chroma import ChromaHTTPClient
+from .config import Config
+from .metrics import record_cache
+
+REGISTRY_COLLECTION = "cbc_registry"
+# Registry records carry no meaningful vector; Chroma still needs one per record
+_PLACEHOLDER_EMBEDDING = [1.0]
+
+
+class EmbeddingModelMismatch(Exception):
+    """A collection holds vectors from a different embedding model than the caller uses."""
+
+
+def model_slug(model_id: str) -> str:
+    return re.sub(r"[^A-Za-z0-9.-]+", "-", model_id.split("/")[-1]).strip("-.")
+
+
+def namespace_key(logical_name: str, model_id: str) -> str:
+    return f"{logical_name}@{model_id}"
+
+
+def namespace_metadata(model_id: str, dimension: Optional[int] = None) -> dict:
+    """Collection metadata recording which model produced its vectors."""
+    metadata = {"embedding_model": model_id, "hnsw:space": "cosine"}
+    if dimension: metadata["embedding_dim"] = dimension
+    return metadata
+
+
+def versioned_name(logical_name: str, model_id: Optional[str] = None) -> str:
+    """A fresh physical collection name, e.g. Curriculumnpdfs__bge-small-en-v1.5_v20260112T093000."""
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+    if model_id:
+        return f"{logical_name}__{model_slug(model_id)}_v{stamp}"
+    return f"{logical_name}_v{stamp}"
+
+
+class CollectionRegistry:
+    def __init__(self, client: Optional[ChromaHTTPClient] = None, ttl: float = Config.ALIAS_TTL_SECONDS):
+        self.client = client or ChromaHTTPClient()
+        self.ttl = ttl
+        self._cache: Dict[str, Tuple[float, Optional[dict]]] = {}
+        self._lock = threading.Lock()
+
+    def get_alias(self, logical_name: str, use_cache: bool = True) -> Optional[dict]:
+        """The alias record ({"target", "previous", "updated_at"}) or None if unaliased."""
+        now = time.monotonic()
+        cached = self._cache.get(logical_name)
+        if use_cache and cached and now - cached[0] < self.ttl:
+            record_cache("collection_alias", True)
+            return cached[1]
+        if use_cache: record_cache("collection_alias", False)
+
+        data = self.client.get(REGISTRY_COLLECTION, ids=[f"alias:{logical_name}"], include=["metadatas"])
+        record = data["metadatas"][0] if data.get("ids") else None
+        with self._lock:
+            self._cache[logical_name] = (now, record)
+        return record
+
+    def resolve(self, logical_name: str) -> str:
+        """Physical collection currently serving `logical_name` (the name itself if unaliased)."""
+        try:
+            record = self.get_alias(logical_name)
+        except Exception as e:
+            print(f"Alias lookup failed for {logical_name}: {e}")
+            cached = self._cache.get(logical_name)
+            record = cached[1] if cached else None
+        return record["target"] if record else logical_name
+
+    def resolve_namespace(self, logical_name: str, model_id: str) -> str:
+        """
+        Physical collection holding `model_id` vectors for `logical_name`.
+        Falls back to the plain alias when no namespace alias exists, but refuses
+        a collection tagged with a different model.
+        """
+        try:
+            record = self.get_alias(namespace_key(logical_name, model_id))
+        except Exception as e:
+            print(f"Namespace lookup failed for {logical_name}@{model_id}: {e}")
+            record = None
+        if record:
+            return record["target"]
+
+        target = self.resolve(logical_name)
+        tagged = self.client.get_collection_metadata(target).get("embedding_model")
+        if tagged and tagged != model_id:
+            raise EmbeddingModelMismatch(f"{target} holds {tagged} vectors, not {model_id}")
+        return target
+
+    def set_namespace_alias(self, logical_name: str, model_id: str, target: str, promote: bool = False) -> dict:
+        """Points the namespace alias at `target`; with `promote`, the plain alias too."""
+        try:
+            previous = self.resolve_namespace(logical_name, model_id)
+        except EmbeddingModelMismatch:
+            previous = target
+        record = self.set_alias(namespace_key(logical_name, model_id), target, previous=previous)
+        if promote:
+            self.set_alias(logical_name, target)
+        return record
+
+    def set_alias(self, logical_name: str, target: str, previous: Optional[str] = None) -> dict:
+        """Points `logical_name` at `target`, remembering the old target for rollback."""
+        if previous is None:
+            current = self.get_alias(logical_name, use_cache=False)
+            previous = current["target"] if current else logical_name
+        record = {"target": target, "previous": previous,
+                  "updated_at": datetime.now(timezone.utc).isoformat()}
+        self.client.get_collection_id(REGISTRY_COLLECTION)
+        self.client.upsert_batch(REGISTRY_COLLECTION, {
+            "ids": [f"alias:{logical_name}"],
+            "embeddings": [_PLACEHOLDER_EMBEDDING],
+            "documents": [target],
+            "metadatas": [record]
+        })
+        with self._lock:
+            self._cache[logical_name] = (time.monotonic(), record)
+        # Chat now reads a different collection: invalidate everything cached against the old one
+        from .epoch import bump_epoch
+        bump_epoch(f"alias {logical_name} -> {target}", logical_name.split("@")[0], self.client)
+        return record
+
+    def rollback(self, logical_name: str) -> dict:
+        current = self.get_alias(logical_name, use_cache=False)
+        if not current or current["previous"] == current["target"]:
+            raise ValueError(f"No previous collection recorded for {logical_name}")
+        return self.set_alias(logical_name, current["previous"])
+
+
+def validate_collection(client: ChromaHTTPClient, name: str, expected_count: int,
+                        probe_vector: Optional[list] = None) -> Tuple[bool, str]:
+    """Checks a freshly built collection before it is allowed to go live."""
+    count = client.count(name)
+    if count < expected_count:
+        return False, f"{name} holds {count} records, expected {expected_count}"
+    if probe_vector is not None:
+        result = client.query(name, [probe_vector], n_results=3)
+        docs = [d for d in (result.get("documents") or [[]])[0] if d]
+        if not docs:
+            return False, f"Probe query against {name} returned no documents"
+    return True, f"{name} holds {count} records and answers probe queries"
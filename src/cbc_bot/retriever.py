@@ -1,54 +1,166 @@
+import json
 import os
 import requests
 import re
-from typing import List
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
+from .cache import TwoTierCache, shared_store
+from .config import Config
+from .chroma import ChromaHTTPClient
+from .epoch import CorpusEpoch
+from .metrics import CONTEXT_CHARS, CONTEXT_FRAGMENTS, span
+from .registry import CollectionRegistry, EmbeddingModelMismatch
+from .singleflight import SingleFlight, normalize_text
 
 load_dotenv()
 
+# Fixed "drill" searches added when the query mentions one of the trigger words
+DRILL_TERMS = [
+    (("reporting", "these"), ["Grade 10 reporting date January 12", "placement review window January 6-9"]),
+    (("grade", "marks", "score"), ["60/20/20 rule KJSEA KPSEA SBA", "Achievement Levels EE1 EE2 ME1 ME2"]),
+    (("engineer", "medicine", "stem"), ["STEM Pure Sciences mandatory subjects", "Orange Book Addendum June 2025 engineering"]),
+]
+
+# (model id, drill term) -> vector. The drill terms never change, so they are embedded
+# once per process (or once in a preloading master before fork) instead of on every chat.
+TERM_EMBEDDINGS: Dict[Tuple[str, str], List[float]] = {}
+
+
+def precompute_term_embeddings(hf_token: Optional[str] = None) -> int:
+    """Embeds every drill term in one HF call; returns how many vectors are cached."""
+    terms = [t for _, group in DRILL_TERMS for t in group if (Config.EMBED_MODEL_ID, t) not in TERM_EMBEDDINGS]
+    if terms:
+        # No pooled session: this may run in a pre-fork master whose sockets must not leak into workers
+        response = requests.post(f"{Config.HF_ROUTER_URL}/{Config.EMBED_MODEL_ID}",
+                                 headers={"Authorization": f"Bearer {hf_token or os.getenv('HUGGINGFACE_TOKEN')}"},
+                                 json={"inputs": terms, "options": {"wait_for_model": True}}, timeout=60)
+        response.raise_for_status()
+        vectors = response.json()
+        if not isinstance(vectors, list) or len(vectors) != len(terms):
+            raise RuntimeError(f"Expected {len(terms)} vectors, got {str(vectors)[:200]}")
+        TERM_EMBEDDINGS.update({(Config.EMBED_MODEL_ID, t): v for t, v in zip(terms, vectors)})
+    return sum(1 for model_id, _ in TERM_EMBEDDINGS if model_id == Config.EMBED_MODEL_ID)
+
+
 class CBCRetriever:
     """
     MASTER ENTITY RETRIEVER (v6.5):
     Specifically optimized for vague queries like "what are these" or "tell me more."
     Automatically extracts technical CBC terms from the conversation history.
     """
-    def __init__(self):
+    def __init__(self, expand_queries: bool = True):
+        # Add the fixed "drill" searches for reporting dates, grading and STEM questions
+        self.expand_queries = expand_queries
+        # Identical concurrent retrievals share one embed + query round trip
+        self.inflight = SingleFlight("retrieval") if Config.SINGLE_FLIGHT else None
         self.host = os.getenv('CHROMA_HOST', 'https://api.trychroma.com').rstrip('/')
         self.api_key = os.getenv('CHROMA_API_KEY')
         self.tenant = os.getenv('CHROMA_TENANT')
         self.database = os.getenv('CHROMA_DATABASE')
         self.hf_token = os.getenv("HUGGINGFACE_TOKEN")
+        # Pooled so the TLS connection to the HF router is reused across chats
+        self.session = requests.Session()
+        # Query-term vectors, shared with the other workers through the SQLite tier
+        self.embedding_cache = TwoTierCache("embedding", shared_store(), Config.EMBED_CACHE_ITEMS,
+                                            version=lambda: Config.EMBED_MODEL_ID)
+        # Expanded term list + n_results -> ranked fragment ids, and fragment id -> fragment, per corpus epoch.
+        # Follow-ups like "tell me more" expand to the same terms and skip both embedding and the query.
+        self.retrieval_cache = self.fragment_cache = None
+        if Config.RETRIEVAL_CACHE_TTL_S > 0:
+            self.retrieval_cache = TwoTierCache("retrieval", shared_store(), Config.RETRIEVAL_CACHE_ITEMS,
+                                                ttl=Config.RETRIEVAL_CACHE_TTL_S, version=self.corpus_version)
+            self.fragment_cache = TwoTierCache("fragment", shared_store(), Config.RETRIEVAL_CACHE_ITEMS * 8,
+                                               ttl=Config.RETRIEVAL_CACHE_TTL_S, version=self.corpus_version)
         
-        self.headers = {
-            "x-chroma-token": self.api_key,
-            "Content-Type": "application/json"
-        }
-        self.base_url = f"{self.host}/api/v2/tenants/{self.tenant}/databases/{self.database}"
+        self.chroma = ChromaHTTPClient(host=self.host, api_key=self.api_key, tenant=self.tenant, database=self.database)
+        # Logical name -> live versioned collection for our embedding model (see registry.py)
+        self.registry = CollectionRegistry(self.chroma)
+        # Bumped by every ingest and alias switch; re-read at most every EPOCH_POLL_SECONDS
+        self.epoch = CorpusEpoch(self.chroma)
+
+        # Optional in-process index loaded from a .cbcsnap snapshot
+        self.local_index = None
+        if Config.SNAPSHOT_PATH:
+            from .local_index import LocalVectorIndex, shared_index
+            if Config.SNAPSHOT_MMAP:
+                self.local_index = shared_index(Config.SNAPSHOT_PATH)
+            else:
+                self.local_index = LocalVectorIndex.from_snapshot(Config.SNAPSHOT_PATH)
+            if self.local_index.model_id != Config.EMBED_MODEL_ID:
+                print(f"Ignoring snapshot: vectors are {self.local_index.model_id}, queries use {Config.EMBED_MODEL_ID}")
+                self.local_index = None
+
+    def get_collection_name(self) -> str:
+        with span("collection_lookup"):
+            return self.registry.resolve_namespace(Config.COLLECTION_NAME, Config.EMBED_MODEL_ID)
+
+    def corpus_version(self) -> str:
+        """Changes whenever chat would read a different corpus; part of every answer-cache key."""
+        if self.local_index is not None:
+            return f"snapshot:{os.path.basename(Config.SNAPSHOT_PATH)}:{len(self.local_index)}"
+        return f"{self.get_collection_name()}@{self.epoch.current()}"
 
     def get_collection_id(self):
         try:
-            resp = requests.get(f"{self.base_url}/collections", headers=self.headers)
-            resp.raise_for_status()
-            for coll in resp.json():
-                if coll['name'] == "Curriculumnpdfs":
-                    return coll['id']
+            return self.chroma.get_collection_id(self.get_collection_name(), create=False)
         except: return None
 
-    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
-        api_url = "https://router.huggingface.co/hf-inference/models/BAAI/bge-small-en-v1.5"
-        try:
-            response = requests.post(
-                api_url, 
-                headers={"Authorization": f"Bearer {self.hf_token}"}, 
-                json={"inputs": texts, "options": {"wait_for_model": True}}
-            )
-            return response.json()
-        except: return []
+    def get_embeddings(self, texts: List[str], timeout: float = Config.EMBED_QUERY_TIMEOUT_S) -> List[List[float]]:
+        api_url = f"{Config.HF_ROUTER_URL}/{Config.EMBED_MODEL_ID}"
+        with span("embed") as timer:
+            try:
+                response = self.session.post(
+                    api_url, 
+                    headers={"Authorization": f"Bearer {self.hf_token}"}, 
+                    json={"inputs": texts, "options": {"wait_for_model": True}},
+                    timeout=timeout
+                )
+                if response.status_code != 200: timer.outcome = f"http_{response.status_code}"
+                return response.json()
+            except:
+                timer.outcome = "error"
+                return []
+
+    def warm_up(self) -> dict:
+        """
+        Resolves the collection, embeds a probe query (waking the HF model) and
+        runs it against the local index or Chroma. Raises if any part fails.
+        """
+        # A cold HF model can take a while to load; same allowance as precompute_term_embeddings
+        vectors = self.get_embeddings(["When do Grade 10 learners report to senior school?"], timeout=60)
+        if not isinstance(vectors, list) or not vectors or not isinstance(vectors[0], list):
+            raise RuntimeError(f"Probe embedding failed: {str(vectors)[:200]}")
+        if self.local_index is not None:
+            self.query(vectors, 1)
+            return {"index": "local", "vectors": len(self.local_index), "dimension": len(vectors[0])}
+        name = self.get_collection_name()
+        if not self.chroma.get_collection_id(name, create=False):
+            raise RuntimeError(f"Collection {name} not found")
+        self.query(vectors, 1)
+        return {"index": "chroma", "collection": name, "dimension": len(vectors[0])}
+
+    def query(self, vectors: List[List[float]], n_results: int) -> dict:
+        """Runs a vector query against the local snapshot index or Chroma Cloud."""
+        if self.local_index is not None:
+            with span("local_query"):
+                return self.local_index.query(vectors, n_results)
+
+        name = self.get_collection_name()
+        with span("chroma_query"):
+            return self.chroma.query(name, vectors, n_results)
 
     def find_relevant_context(self, user_query: str, history_context: str = "", n_results: int = 15) -> str:
         """
         Deep Drill with History Awareness.
         """
+        fragments = self.retrieve(user_query, history_context, n_results)
+        context = "\n\n---\n\n".join(f["document"] for f in fragments)
+        CONTEXT_CHARS.observe(len(context))
+        CONTEXT_FRAGMENTS.observe(len(fragments))
+        return context
+
+    def search_terms(self, user_query: str, history_context: str = "") -> List[str]:
+        """The query, its history-augmented form and any drill searches, in query order."""
         # Combine query with previous assistant entities if query is short
         search_query = user_query
         if len(user_query.split()) < 4 and history_context:
@@ -59,36 +171,90 @@ class CBCRetriever:
         search_terms = [search_query, user_query]
         # Drill for the specific components
         query_l = search_query.lower()
-        if "reporting" in query_l or "these" in query_l:
-            search_terms.extend(["Grade 10 reporting date January 12", "placement review window January 6-9"])
-        
-        if "grade" in query_l or "marks" in query_l or "score" in query_l:
-            search_terms.extend(["60/20/20 rule KJSEA KPSEA SBA", "Achievement Levels EE1 EE2 ME1 ME2"])
-            
-        if "engineer" in query_l or "medicine" in query_l or "stem" in query_l:
-            search_terms.extend(["STEM Pure Sciences mandatory subjects", "Orange Book Addendum June 2025 engineering"])
-        
-        vectors = self.get_embeddings(search_terms)
-        coll_id = self.get_collection_id()
-        if not coll_id or not vectors: return ""
+        for triggers, terms in DRILL_TERMS:
+            if any(word in query_l for word in triggers):
+                search_terms.extend(terms)
+
+        return search_terms if self.expand_queries else search_terms[:2]
+
+    def retrieve(self, user_query: str, history_context: str = "", n_results: int = 15) -> List[dict]:
+        """Unique fragments ({"id", "document", "metadata"}) in the order they go into the prompt."""
+        with span("retrieval") as timer:
+            terms = self.search_terms(user_query, history_context)
+            # Normalized but ordered: drill searches are merged in term order, so the order shapes the ranking
+            key = json.dumps([[normalize_text(t) for t in terms], n_results])
+            fragments = self._cached_fragments(key)
+            if fragments is not None:
+                timer.outcome = "cached"
+            elif self.inflight is None:
+                fragments = self._find_and_cache(key, terms, n_results)
+            else:
+                fragments, shared = self.inflight.do(key, lambda: self._find_and_cache(key, terms, n_results))
+                if shared: timer.outcome = "coalesced"
+            if not fragments: timer.outcome = "empty"
+        return fragments
+
+    def _cached_fragments(self, key: str) -> Optional[List[dict]]:
+        """The cached ranking for `key`, or None on a miss or if any of its fragments has been evicted."""
+        if self.retrieval_cache is None: return None
+        ids = self.retrieval_cache.get(key)
+        if not ids: return None
+        stored = self.fragment_cache.get_many(ids)
+        if len(stored) < len(set(ids)): return None
+        return [dict(stored[fid], id=fid) for fid in ids]
+
+    def _find_and_cache(self, key: str, terms: List[str], n_results: int) -> List[dict]:
+        fragments = self._find_fragments(terms, n_results)
+        # Empty results are usually a failed embed or query, so they are never cached
+        if fragments and self.retrieval_cache is not None and all(f.get("id") for f in fragments):
+            self.fragment_cache.set_many({f["id"]: {"document": f["document"], "metadata": f["metadata"]}
+                                          for f in fragments})
+            self.retrieval_cache.set(key, [f["id"] for f in fragments])
+        return fragments
+
+    def embed_search_terms(self, search_terms: List[str]) -> List[List[float]]:
+        """
+        Like get_embeddings, but drill terms come from TERM_EMBEDDINGS, previously seen
+        terms from the embedding cache, and only the rest go to HF (in one call).
+        """
+        model_id = Config.EMBED_MODEL_ID
+        missing = [t for t in dict.fromkeys(search_terms) if (model_id, t) not in TERM_EMBEDDINGS]
+        fresh = self.embedding_cache.get_many(missing) if missing else {}
+        missing = [t for t in missing if t not in fresh]
+        if missing:
+            vectors = self.get_embeddings(missing)
+            if not isinstance(vectors, list) or len(vectors) != len(missing): return []
+            embedded = dict(zip(missing, vectors))
+            drills = {t for _, group in DRILL_TERMS for t in group}
+            TERM_EMBEDDINGS.update({(model_id, t): v for t, v in embedded.items() if t in drills})
+            self.embedding_cache.set_many({t: v for t, v in embedded.items() if t not in drills})
+            fresh.update(embedded)
+        return [fresh[t] if t in fresh else TERM_EMBEDDINGS[(model_id, t)] for t in search_terms]
+
+    def _find_fragments(self, search_terms: List[str], n_results: int) -> List[dict]:
+        vectors = self.embed_search_terms(search_terms)
+        if not vectors: return []
 
         try:
-            resp = requests.post(f"{self.base_url}/collections/{coll_id}/query", headers=self.headers, json={
-                "query_embeddings": vectors,
-                "n_results": n_results,
-                "include": ["documents", "metadatas"]
-            })
-            data = resp.json()
+            data = self.query(vectors, n_results)
             
             unique_docs = []
             seen = set()
-            for group in data.get("documents", []):
-                for doc in group:
+            id_groups = data.get("ids") or []
+            metadata_groups = data.get("metadatas") or []
+            for n, group in enumerate(data.get("documents", [])):
+                ids = id_groups[n] if n < len(id_groups) else []
+                metadatas = metadata_groups[n] if n < len(metadata_groups) else []
+                for i, doc in enumerate(group):
                     if not doc: continue
                     fingerprint = doc[:50].lower()
                     if fingerprint not in seen:
-                        unique_docs.append(doc)
+                        unique_docs.append({"id": ids[i] if i < len(ids) else None, "document": doc,
+                                            "metadata": (metadatas[i] if i < len(metadatas) else None) or {}})
                         seen.add(fingerprint)
             
-            return "\n\n---\n\n".join(unique_docs)
-        except: return ""
+            return unique_docs
+        except EmbeddingModelMismatch as e:
+            print(f"Refusing retrieval: {e}")
+            return []
+        except: return []
@@ -0,0 +1,68 @@
+"""
+Single-flight coalescing for identical concurrent work.
+
+When many users ask the same question at once (e.g. right after a placement
+announcement), the first caller for a key runs the computation and every
+caller that arrives while it is in flight waits for that result instead of
+repeating the embedding, Chroma and LLM calls. Nothing is cached: once the
+leader finishes, the next caller for the key starts a fresh computation.
+"""
+import re
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from .metrics import COALESCED
+
+_SPACE = re.compile(r"\s+")
+_TRAILING = re.compile(r"[\s?.!,;:]+$")
+
+
+def normalize_text(text: str) -> str:
+    """Case, runs of whitespace and trailing punctuation do not change the answer."""
+    return _TRAILING.sub("", _SPACE.sub(" ", (text or "").lower())).strip()
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs `fn` once per key among concurrent callers; all of them get its result (or exception)."""
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Returns (result, shared); `shared` is True when another caller's computation was reused."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            COALESCED.inc(layer=self.name, role="follower")
+            call.done.wait()
+            if call.error is not None: raise call.error
+            return call.result, True
+
+        COALESCED.inc(layer=self.name, role="leader")
+        try:
+            call.result = fn()
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
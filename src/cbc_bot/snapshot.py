@@ -0,0 +1,203 @@
+"""
+Compact binary snapshot format for vector collections (.cbcsnap).
+
+Layout:
+    b"CBCSNAP1"
+    u32 header length, JSON header {version, collection, model_id, dimension, dtype}
+    blocks, each:
+        u32 record count (0 marks the end of the file)
+        count * dimension vector values (float16 or float32, little-endian)
+        u32 length, zstd(JSON {"ids": [...], "metadatas": [...]})   -- metadata table
+        u32 length, zstd(JSON [documents...])                        -- document text
+
+Blocks are written one page at a time, so snapshots can be produced and
+consumed without holding the collection in memory.
+"""
+import json
+import os
+import struct
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import zstandard
+
+MAGIC = b"CBCSNAP1"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_EXTENSION = ".cbcsnap"
+DTYPES = {"float16": "<f2", "float32": "<f4"}
+
+_U32 = struct.Struct("<I")
+
+
+def is_compact_snapshot(path: str) -> bool:
+    return path.endswith(SNAPSHOT_EXTENSION)
+
+
+def _read_exact(f, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise EOFError("Truncated snapshot block")
+    return data
+
+
+def _read_header(f) -> dict:
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a .cbcsnap snapshot")
+    (size,) = _U32.unpack(_read_exact(f, 4))
+    header = json.loads(_read_exact(f, size))
+    if header.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {header.get('version')}")
+    return header
+
+
+def _read_block_ids(f, header: dict, decompressor) -> Optional[List[str]]:
+    """Reads past one block; returns its ids (None at the end marker). Raises EOFError if it is torn."""
+    (count,) = _U32.unpack(_read_exact(f, 4))
+    if count == 0: return None
+    itemsize = np.dtype(DTYPES[header["dtype"]]).itemsize
+    _read_exact(f, count * header["dimension"] * itemsize)
+    (size,) = _U32.unpack(_read_exact(f, 4))
+    table = json.loads(decompressor.decompress(_read_exact(f, size)))
+    (size,) = _U32.unpack(_read_exact(f, 4))
+    _read_exact(f, size)
+    return table["ids"]
+
+
+class CompactSnapshotWriter:
+    """
+    Writes pages (dicts of ids/embeddings/documents/metadatas) as snapshot blocks.
+    If `dimension` is None it is taken from the first page written.
+    """
+    def __init__(self, path: str, model_id: str, dimension: Optional[int] = None,
+                 collection_name: str = "Curriculumnpdfs", dtype: str = "float16",
+                 resume_after: Optional[str] = None, compression_level: int = 9):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {sorted(DTYPES)}")
+        self.path = path
+        self.records = 0
+        self._compressor = zstandard.ZstdCompressor(level=compression_level)
+
+        if resume_after is not None:
+            if not os.path.exists(path):
+                raise ValueError(f"Checkpoint is at {resume_after!r} but {path} is missing; rerun with --restart")
+            self._file = open(path, "r+b")
+            self.header = _read_header(self._file)
+            if self.header["model_id"] != model_id or dimension not in (None, self.header["dimension"]):
+                raise ValueError(f"Cannot append {model_id} vectors to a "
+                                 f"{self.header['model_id']}/{self.header['dimension']}d snapshot")
+            # Keep the blocks up to the checkpointed id; drop the end marker, any block written after the
+            # checkpoint (a crash before it was saved) and anything torn by a crash
+            end, last_id = self._file.tell(), None
+            decompressor = zstandard.ZstdDecompressor()
+            while True:
+                try:
+                    ids = _read_block_ids(self._file, self.header, decompressor)
+                except (EOFError, zstandard.ZstdError, ValueError):
+                    break
+                if not ids or ids[0] > resume_after: break
+                if ids[-1] > resume_after:
+                    raise ValueError(f"Block {ids[0]!r}..{ids[-1]!r} straddles the checkpoint {resume_after!r}")
+                end, last_id = self._file.tell(), ids[-1]
+            if last_id != resume_after:
+                raise ValueError(f"{path} ends at {last_id!r}, not at the checkpoint {resume_after!r}; "
+                                 f"rerun with --restart")
+            self._file.seek(end)
+            self._file.truncate()
+            self._header_written = True
+        else:
+            self._file = open(path, "wb")
+            self.header = {"version": SNAPSHOT_VERSION, "collection": collection_name,
+                           "model_id": model_id, "dimension": dimension, "dtype": dtype}
+            self._header_written = False
+            if dimension is not None:
+                self._write_header()
+        self._dtype = np.dtype(DTYPES[self.header["dtype"]])
+
+    def _write_header(self):
+        raw = json.dumps(self.header).encode("utf-8")
+        self._file.write(MAGIC + _U32.pack(len(raw)) + raw)
+        self._header_written = True
+
+    def _write_section(self, obj):
+        data = self._compressor.compress(json.dumps(obj).encode("utf-8"))
+        self._file.write(_U32.pack(len(data)) + data)
+
+    def write_page(self, page: dict):
+        count = len(page["ids"])
+        if count == 0: return
+        vectors = np.asarray(page["embeddings"], dtype=np.float32)
+        if not self._header_written:
+            self.header["dimension"] = int(vectors.shape[-1])
+            self._write_header()
+        if vectors.shape != (count, self.header["dimension"]):
+            raise ValueError(f"Expected {count}x{self.header['dimension']} vectors, got {vectors.shape}")
+        self._file.write(_U32.pack(count))
+        self._file.write(vectors.astype(self._dtype).tobytes())
+        self._write_section({"ids": list(page["ids"]), "metadatas": [m or {} for m in page["metadatas"]]})
+        self._write_section(list(page["documents"]))
+        self._file.flush()
+        self.records += count
+
+    def close(self):
+        if not self._file.closed:
+            if not self._header_written:
+                self.header["dimension"] = self.header["dimension"] or 0
+                self._write_header()
+            self._file.write(_U32.pack(0))
+            self._file.close()
+
+
+class CompactSnapshotReader:
+    """Reads .cbcsnap files page by page, or all at once as a float32 matrix."""
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.header = _read_header(f)
+        self.model_id: str = self.header["model_id"]
+        self.dimension: int = self.header["dimension"]
+        self.collection: str = self.header["collection"]
+        self._dtype = np.dtype(DTYPES[self.header["dtype"]])
+
+    def iter_blocks(self) -> Iterator[Tuple[List[str], np.ndarray, List[str], List[dict]]]:
+        decompressor = zstandard.ZstdDecompressor()
+        with open(self.path, "rb") as f:
+            _read_header(f)
+            while True:
+                (count,) = _U32.unpack(_read_exact(f, 4))
+                if count == 0: return
+                raw = _read_exact(f, count * self.dimension * self._dtype.itemsize)
+                vectors = np.frombuffer(raw, dtype=self._dtype).reshape(count, self.dimension)
+                (size,) = _U32.unpack(_read_exact(f, 4))
+                table = json.loads(decompressor.decompress(_read_exact(f, size)))
+                (size,) = _U32.unpack(_read_exact(f, 4))
+                documents = json.loads(decompressor.decompress(_read_exact(f, size)))
+                yield table["ids"], vectors, documents, table["metadatas"]
+
+    def iter_pages(self, page_size: int = 500, after_id: Optional[str] = None) -> Iterator[dict]:
+        """Pages in the same shape migration sinks accept, with embeddings as float lists."""
+        page = {"ids": [], "embeddings": [], "documents": [], "metadatas": []}
+        for ids, vectors, documents, metadatas in self.iter_blocks():
+            for record_id, vector, document, metadata in zip(ids, vectors, documents, metadatas):
+                # Ids are written in increasing order; anything else is a block repeated by an old resumed run
+                if after_id is not None and record_id <= after_id: continue
+                after_id = record_id
+                page["ids"].append(record_id)
+                page["embeddings"].append(vector.astype(np.float32).tolist())
+                page["documents"].append(document)
+                page["metadatas"].append(metadata)
+                if len(page["ids"]) >= page_size:
+                    yield page
+                    page = {"ids": [], "embeddings": [], "documents": [], "metadatas": []}
+        if page["ids"]:
+            yield page
+
+    def load(self) -> Tuple[List[str], np.ndarray, List[str], List[dict]]:
+        """Returns (ids, float32 matrix, documents, metadatas) for the whole snapshot."""
+        ids, blocks, documents, metadatas = [], [], [], []
+        for block_ids, vectors, block_docs, block_meta in self.iter_blocks():
+            ids.extend(block_ids)
+            blocks.append(vectors)
+            documents.extend(block_docs)
+            metadatas.extend(block_meta)
+        matrix = np.concatenate(blocks).astype(np.float32) if blocks else np.zeros((0, self.dimension), np.float32)
+        return ids, matrix, documents, metadatas
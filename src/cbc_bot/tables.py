@@ -0,0 +1,351 @@
+"""
+Structured tables extracted from data/processed: the KICD list of approved
+Grade 10 course books and the Senior School subject-combination codes.
+
+These documents are tables flattened to text by PDF/HTML extraction, so as
+chunks they only help after the LLM reads 20 of them. `build_tables()` runs the
+extractors over every processed file once and `TableIndex` serves exact
+lookups (books per learning area, combination by code or by subjects) in
+microseconds. The engine calls `TableIndex.answer()` before retrieval and only
+falls through to generation when the question is not a table lookup.
+"""
+import json
+import os
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from .config import Config
+
+# Track -> pathway, as the Ministry groups them
+TRACKS = {
+    "Arts": "Arts and Sports Science",
+    "Sports Science": "Arts and Sports Science",
+    "Languages and Literature": "Social Sciences",
+    "Humanities & Business Studies": "Social Sciences",
+    "Pure Sciences": "STEM",
+    "Applied Sciences": "STEM",
+    "Technical Studies": "STEM",
+}
+_SMALL_WORDS = {"and", "in", "of", "ya", "&"}
+
+
+def _squash(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _title(caps: str) -> str:
+    """"CHRISTIAN RELIGIOUS EDUCATION (CRE)" -> "Christian Religious Education (CRE)"."""
+    words = []
+    for i, word in enumerate(_squash(caps).split(" ")):
+        lower = word.lower()
+        if word.startswith("("): words.append(word)
+        elif i and lower in _SMALL_WORDS: words.append(lower)
+        else: words.append(lower.capitalize())
+    return " ".join(words)
+
+
+def _track(text: str) -> Optional[str]:
+    key = _squash(text).lower()
+    return next((track for track in TRACKS if track.lower() == key), None)
+
+
+# --- Approved course books ---
+
+_FOOTER = re.compile(r"^Approved by Kenya Institute of Curriculum Development - [A-Za-z]+,? \d{4}\s*")
+_PAGE = re.compile(r"^Page \| \d+\s*$")
+_COLUMNS_HEADER = re.compile(r"^LEARNING AREA\s+NO\.\s+TITLE")
+_PATHWAY = re.compile(r"^([A-Z][A-Z ,&()]+?)\s+PATHWAYS?\s*$")
+_CAPS_LINE = re.compile(r"^[A-Z][A-Z &()'’,.\-]*$")
+_AREA_START = re.compile(r"^([A-Z][A-Z &()'’,.\-]*[A-Z)])\s+(\d+)\.?\s+(\S.*)$")
+_ENTRY_START = re.compile(r"^(\d+)\.?\s+(\S.*)$")
+# "Grade 10" ends a title; one row lost its "10" in the source
+_GRADE_10 = re.compile(r"(?:Grade|Gredi ya)(?:\s*10\b)?", re.I)
+_GUIDE = re.compile(r"Teacher|Mwongozo|Guide")
+_COLUMNS = re.compile(r"\s{2,}")
+
+
+def _parse_book(lines: List[str]) -> dict:
+    """One numbered entry: learner's book title, publisher, authors and (if listed) the teacher's guide."""
+    text = "\n".join(line.rstrip() for line in lines)
+    match = _GRADE_10.search(text)
+    if not match:
+        # Set books have no "Grade 10" suffix: title, publisher and author are plain columns
+        columns = _COLUMNS.split(lines[0].strip())
+        return {"title": columns[0], "publisher": columns[1] if len(columns) > 1 else None,
+                "authors": _squash(" ".join(columns[2:] + [l.strip() for l in lines[1:]])) or None,
+                "teacher_guide": None}
+
+    title = _squash(text[:match.end()])
+    rest = text[match.end():].split("\n")
+    columns = [c for c in _COLUMNS.split(rest[0].strip()) if c]
+    publisher = columns[0] if columns else None
+    authors = columns[1:]
+    series = title.split(" ")[0]
+    guide_at = len(rest)
+    for i, line in enumerate(rest[1:], 1):
+        if line.strip().startswith(series) or _GUIDE.search(line):
+            guide_at = i
+            break
+        authors.append(line.strip())
+    guide = "\n".join(rest[guide_at:])
+    guide_end = _GRADE_10.search(guide)
+    return {"title": title, "publisher": publisher, "authors": _squash(" ".join(authors)) or None,
+            "teacher_guide": _squash(guide[:guide_end.end()]) if guide_end else None}
+
+
+def extract_course_books(text: str) -> List[dict]:
+    """Rows of the KICD "List of Approved Course Materials" tables; [] for any other document."""
+    if "APPROVED" not in text or not re.search(r"^LEARNING AREA\s+NO\.", text, re.M):
+        return []
+    rows = []
+    pathway = track = area = None
+    pending: List[str] = []  # caps lines that may start the next learning area's name
+    entry: Optional[dict] = None
+
+    def finish():
+        nonlocal entry
+        if entry is not None:
+            rows.append(dict(entry["meta"], **_parse_book(entry["lines"])))
+            entry = None
+
+    for raw in text.split("\n"):
+        line = _FOOTER.sub("", raw).rstrip()
+        if not line.strip() or _PAGE.match(line) or _COLUMNS_HEADER.match(line):
+            continue
+        if pathway and line.strip().startswith("ADDENDUM TO ORANGE BOOK"):
+            break
+        match = _PATHWAY.match(line.strip())
+        if match:
+            finish()
+            name = match.group(1)
+            pathway = "STEM" if "(STEM)" in name else _title(name)
+            pending = []
+            continue
+        if pathway is None:
+            continue
+        if _track(line):
+            finish()
+            track, pending = _track(line), []
+            continue
+        match = _AREA_START.match(line.strip())
+        if match:
+            finish()
+            area = _title(" ".join(pending + [match.group(1)]))
+            pending = []
+            entry = {"no": int(match.group(2)), "lines": [match.group(3)],
+                     "meta": {"pathway": pathway, "track": track, "learning_area": area, "no": int(match.group(2))}}
+            continue
+        match = _ENTRY_START.match(line.strip())
+        # Numbers run 1, 2, 3... within a learning area; "10 Longhorn ..." is the end of a "Grade 10" title
+        if match and entry is not None and int(match.group(1)) == entry["no"] + 1:
+            finish()
+            number = int(match.group(1))
+            entry = {"no": number, "lines": [match.group(2)],
+                     "meta": {"pathway": pathway, "track": track, "learning_area": area, "no": number}}
+            continue
+        if _CAPS_LINE.match(line.strip()):
+            pending.append(line.strip())
+            continue
+        if entry is not None:
+            entry["lines"].extend(pending + [line])
+            pending = []
+    finish()
+    return rows
+
+
+# --- Subject combinations ---
+
+_TRACK_PATTERN = "|".join(r"\s*".join(map(re.escape, track.split(" "))) for track in TRACKS)
+_COMBINATION = re.compile(r"\b([A-Z]{2}\d{2})\s*\n\s*(\d{2})\s*([^\n].{0,150}?)(" + _TRACK_PATTERN + ")", re.S)
+
+
+def extract_combinations(text: str) -> List[dict]:
+    """Rows like "ST10 / 44Biology, Building & Construction, ChemistryPure Sciences" from the combination tables."""
+    if "Combination" not in text:
+        return []
+    rows = {}
+    for match in _COMBINATION.finditer(text):
+        subjects = [_squash(s) for s in match.group(3).split(",") if _squash(s)]
+        track = _track(match.group(4))
+        code = match.group(1) + match.group(2)
+        if len(subjects) == 3 and track:
+            rows[code] = {"code": code, "subjects": subjects, "track": track, "pathway": TRACKS[track]}
+    return [rows[code] for code in sorted(rows)]
+
+
+EXTRACTORS = {"course_books": extract_course_books, "combinations": extract_combinations}
+
+
+def build_tables(source_dir: str = Config.PROCESSED_DIR) -> dict:
+    """Runs every extractor over every processed text file."""
+    tables = {name: [] for name in EXTRACTORS}
+    for filename in sorted(os.listdir(source_dir)):
+        if not filename.endswith(".txt"): continue
+        with open(os.path.join(source_dir, filename), encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        for name, extract in EXTRACTORS.items():
+            tables[name].extend(dict(row, source=filename) for row in extract(text))
+    return tables
+
+
+def _sources_stamp(source_dir: str) -> List[list]:
+    return sorted([name, int(os.path.getmtime(os.path.join(source_dir, name)))]
+                  for name in os.listdir(source_dir) if name.endswith(".txt"))
+
+
+def load_tables(path: str = Config.TABLES_PATH, source_dir: str = Config.PROCESSED_DIR, rebuild: bool = False) -> dict:
+    """The saved tables, rebuilt (and re-saved) when a processed file was added, removed or changed."""
+    stamp = _sources_stamp(source_dir) if os.path.isdir(source_dir) else None
+    if not rebuild and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            saved = json.load(f)
+        if stamp is None or saved.get("sources") == stamp:
+            return saved["tables"]
+    if stamp is None:
+        raise FileNotFoundError(f"No saved tables at {path} and no source directory {source_dir}")
+    tables = build_tables(source_dir)
+    if os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"sources": stamp, "tables": tables}, f, ensure_ascii=False, indent=1)
+    os.replace(path + ".tmp", path)
+    return tables
+
+
+# --- Lookups ---
+
+# Common names people use for learning areas and subjects
+ALIASES = {
+    "maths": "core mathematics", "math": "core mathematics", "mathematics": "core mathematics",
+    "home science": "homescience", "metalwork": "metal work", "wood work": "woodwork",
+    "computer science": "computer studies", "ict": "information communication technology",
+    "literature": "literature in english", "fasihi": "fasihi ya kiswahili", "history": "history & citizenship",
+    "business": "business studies", "music": "music and dance",
+    # The book list and the combination table spell some subjects differently
+    "woodwork": "wood work", "homescience": "home science", "metal work": "metalwork",
+    "building construction": "building & construction", "building and construction": "building & construction",
+    "marine and fisheries": "marine & fisheries", "marine & fisheries": "marine & fishries",
+}
+_CODE = re.compile(r"\b([A-Z]{2}\d{4})\b")
+_ASKS_BOOKS = re.compile(r"\b(books?|textbooks?|course ?books?|course materials?|set books?|teacher'?s guides?|"
+                         r"publishers?|titles?)\b", re.I)
+_ASKS_COMBINATIONS = re.compile(r"\bcombinations?\b", re.I)
+# School-level questions need data these tables do not have
+_ASKS_SCHOOLS = re.compile(r"\bschools?\b.*\b(offer|offers|offering|have|has)\b|\bwhich schools?\b", re.I)
+
+
+def _phrase_index(names: Iterable[str]) -> Dict[str, str]:
+    """Lower-case phrase -> canonical name, including the abbreviation in brackets ("cre")."""
+    phrases = {}
+    for name in names:
+        lower = name.lower()
+        phrases[lower] = name
+        bare = _squash(re.sub(r"\(.*?\)", "", lower))
+        phrases.setdefault(bare, name)
+        for abbreviation in re.findall(r"\((\w+)\)", lower):
+            phrases.setdefault(abbreviation, name)
+    for alias, target in ALIASES.items():
+        if target in phrases: phrases.setdefault(alias, phrases[target])
+    return phrases
+
+
+def _find_phrases(text: str, phrases: Dict[str, str]) -> List[str]:
+    """Canonical names mentioned in `text`, longest phrase first, without overlaps."""
+    lower = " " + re.sub(r"[^a-z0-9&' ]+", " ", text.lower()) + " "
+    found, taken = [], []
+    for phrase in sorted(phrases, key=len, reverse=True):
+        for match in re.finditer(rf"(?<=\s){re.escape(phrase)}(?=\s)", lower):
+            span = range(match.start(), match.end())
+            if any(set(span) & set(t) for t in taken): continue
+            taken.append(span)
+            if phrases[phrase] not in found: found.append(phrases[phrase])
+    return found
+
+
+class TableIndex:
+    def __init__(self, tables: dict):
+        self.books_by_area: Dict[str, List[dict]] = defaultdict(list)
+        for row in tables.get("course_books", []):
+            self.books_by_area[row["learning_area"]].append(row)
+        self.combinations_by_code = {row["code"]: row for row in tables.get("combinations", [])}
+        self.combinations_by_subject: Dict[str, List[dict]] = defaultdict(list)
+        for row in self.combinations_by_code.values():
+            for subject in row["subjects"]:
+                self.combinations_by_subject[subject].append(row)
+        self._areas = _phrase_index(self.books_by_area)
+        self._subjects = _phrase_index(self.combinations_by_subject)
+        self._tracks = _phrase_index(TRACKS)
+
+    def books(self, learning_area: str) -> List[dict]:
+        area = self._areas.get(learning_area.lower())
+        return self.books_by_area.get(area, []) if area else []
+
+    def combination(self, code: str) -> Optional[dict]:
+        return self.combinations_by_code.get(code.upper())
+
+    def combinations(self, subjects: Iterable[str] = (), track: Optional[str] = None) -> List[dict]:
+        """Combinations containing every subject given (and in `track`, if given), by code."""
+        wanted = [self._subjects.get(s.lower(), s) for s in subjects]
+        rows = self.combinations_by_code.values()
+        return sorted((row for row in rows if all(s in row["subjects"] for s in wanted)
+                       and (track is None or row["track"] == track)), key=lambda row: row["code"])
+
+    def answer(self, text: str) -> Optional[str]:
+        """A complete reply when the question is an exact table lookup, otherwise None."""
+        if _ASKS_SCHOOLS.search(text):
+            return None
+        code = _CODE.search(text.upper())
+        if code and self.combination(code.group(1)):
+            row = self.combination(code.group(1))
+            return (f"{row['code']} is a {row['track']} ({row['pathway']} pathway) combination: "
+                    f"{', '.join(row['subjects'])}.")
+
+        if _ASKS_BOOKS.search(text) and self.books_by_area:
+            areas = _find_phrases(text, self._areas)
+            if len(areas) == 1:
+                return self._format_books(areas[0])
+
+        if _ASKS_COMBINATIONS.search(text) and self.combinations_by_code:
+            subjects = _find_phrases(text, self._subjects)
+            tracks = _find_phrases(text, self._tracks)
+            if subjects or tracks:
+                return self._format_combinations(subjects, tracks[0] if tracks else None)
+        return None
+
+    def _format_books(self, area: str) -> str:
+        rows = self.books_by_area[area]
+        head = rows[0]
+        lines = [f"KICD-approved Grade 10 course books for {area} ({head['track']} track, "
+                 f"{head['pathway']} pathway):"]
+        for row in rows:
+            publisher = f" ({row['publisher']})" if row.get("publisher") else ""
+            lines.append(f"{row['no']}. {row['title']}{publisher}")
+        if any(row.get("teacher_guide") for row in rows):
+            lines.append("\nEach learner's book has a matching Teacher's Guide.")
+        return "\n".join(lines)
+
+    def _format_combinations(self, subjects: List[str], track: Optional[str]) -> Optional[str]:
+        rows = self.combinations(subjects, track)
+        scope = " + ".join(subjects) if subjects else ""
+        scope = f"{scope} ({track})" if track and scope else scope or track
+        if not rows:
+            return None  # the tables are not exhaustive (no Social Sciences rows, for one): let retrieval try
+        lines = [f"{len(rows)} subject combination{'s' if len(rows) != 1 else ''} with {scope}:"]
+        lines += [f"- {row['code']}: {', '.join(row['subjects'])} ({row['track']})" for row in rows[:25]]
+        if len(rows) > 25:
+            lines.append(f"...and {len(rows) - 25} more. Add a subject to narrow it down.")
+        return "\n".join(lines)
+
+
+_shared: Optional[TableIndex] = None
+_shared_lock = threading.Lock()
+
+
+def shared_tables() -> TableIndex:
+    """Process-wide index, loaded (or built from Config.PROCESSED_DIR) on first use."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = TableIndex(load_tables())
+        return _shared
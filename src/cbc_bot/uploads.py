@@ -0,0 +1,192 @@
+"""
+Streaming upload handling for the ingestion API.
+Uploads are hashed, size-checked and chunked while the request body is still
+arriving, so a file is never copied to a temp file and re-read before indexing.
+"""
+import codecs
+import hashlib
+import tempfile
+from typing import Iterator, List, Optional
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13 only ships the old package name
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from .extraction import LineChunker
+
+# PDFs are kept in memory up to this size before spilling to disk.
+PDF_SPOOL_BYTES = 8 * 1024 * 1024
+# Allowance for multipart boundaries and part headers on top of the file itself.
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadRejected(Exception):
+    """The request body is not a usable file upload."""
+
+
+class UploadTooLarge(UploadRejected):
+    """The upload exceeded the configured size limit."""
+
+
+class StreamingUpload:
+    """
+    Receives one uploaded file piece by piece.
+    Text files go straight into the chunker; PDFs are spooled once (their
+    page index sits at the end of the file) and parsed page by page afterwards.
+    """
+    def __init__(self, filename: str, max_bytes: int, chunk_size_lines: int = 15):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.is_pdf = filename.lower().endswith(".pdf")
+        self.size = 0
+        self.chunker = LineChunker(chunk_size_lines)
+        self._hash = hashlib.sha256()
+        self._digest: Optional[str] = None
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._pending_cr = False
+        self._pdf_buffer = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_BYTES) if self.is_pdf else None
+        self._pdf_parsed = False
+
+    def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(f"{self.filename} exceeds the {self.max_bytes // (1024 * 1024)} MB upload limit")
+        self._hash.update(data)
+        if self._pdf_buffer is not None:
+            self._pdf_buffer.write(data)
+        else:
+            self.chunker.feed(self._normalise(self._decoder.decode(data)))
+
+    def _normalise(self, text: str, final: bool = False) -> str:
+        # Universal newlines, carrying a trailing '\r' over in case its '\n' is in the next piece
+        if self._pending_cr:
+            text = "\r" + text
+        self._pending_cr = text.endswith("\r") and not final
+        if self._pending_cr:
+            text = text[:-1]
+        return text.replace("\r\n", "\n").replace("\r", "\n")
+
+    def finish(self) -> str:
+        """Marks the upload as complete and returns its SHA-256 digest."""
+        if self._digest is None:
+            if self._pdf_buffer is None:
+                self.chunker.feed(self._normalise(self._decoder.decode(b"", final=True), final=True))
+                self.chunker.close()
+            self._digest = self._hash.hexdigest()
+        return self._digest
+
+    @property
+    def sha256(self) -> str:
+        return self.finish()
+
+    def iter_pdf_pages(self) -> Iterator[str]:
+        import PyPDF2
+
+        self._pdf_buffer.seek(0)
+        reader = PyPDF2.PdfReader(self._pdf_buffer)
+        for page in reader.pages:
+            extracted = page.extract_text()
+            if extracted: yield extracted + "\n"
+
+    def chunks(self) -> List[str]:
+        """All chunks of the upload, parsing PDF pages on first use."""
+        self.finish()
+        if self._pdf_buffer is not None and not self._pdf_parsed:
+            self._pdf_parsed = True
+            try:
+                for page_text in self.iter_pdf_pages():
+                    self.chunker.feed(page_text)
+            except Exception as e:
+                print(f"Error reading PDF: {e}")
+            self.chunker.close()
+        return self.chunker.chunks
+
+    def close(self):
+        if self._pdf_buffer is not None:
+            self._pdf_buffer.close()
+
+
+class _MultipartReceiver:
+    """Callback sink for MultipartParser that routes one file field into a StreamingUpload."""
+    def __init__(self, field_name: str, max_bytes: int):
+        self.field_name = field_name
+        self.max_bytes = max_bytes
+        self.upload: Optional[StreamingUpload] = None
+        self._headers = {}
+        self._field = b""
+        self._value = b""
+        self._target: Optional[StreamingUpload] = None
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        }
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._target = None
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._field.lower()] = self._value
+        self._field, self._value = b"", b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        filename = options.get(b"filename")
+        if options.get(b"name") == self.field_name.encode() and filename and self.upload is None:
+            self.upload = StreamingUpload(filename.decode("utf-8", errors="replace"), self.max_bytes)
+            self._target = self.upload
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._target is not None:
+            self._target.write(data[start:end])
+
+    def _on_part_end(self):
+        self._target = None
+
+
+async def read_multipart_upload(request, max_bytes: int, field_name: str = "file") -> StreamingUpload:
+    """
+    Consumes a multipart/form-data request body chunk by chunk and returns the
+    finished upload for `field_name`. Raises UploadTooLarge as soon as the
+    declared or received size passes `max_bytes`.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadRejected("Expected a multipart/form-data upload")
+
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes + MULTIPART_OVERHEAD_BYTES:
+        raise UploadTooLarge(f"Upload exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+
+    receiver = _MultipartReceiver(field_name, max_bytes)
+    parser = MultipartParser(boundary, callbacks=receiver.callbacks())
+    try:
+        async for data in request.stream():
+            parser.write(data)
+        parser.finalize()
+    except UploadRejected:
+        if receiver.upload: receiver.upload.close()
+        raise
+    except Exception as e:
+        if receiver.upload: receiver.upload.close()
+        raise UploadRejected(f"Malformed multipart upload: {e}")
+
+    if receiver.upload is None:
+        raise UploadRejected(f"No '{field_name}' file field in upload")
+    receiver.upload.finish()
+    return receiver.upload
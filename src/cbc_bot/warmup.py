@@ -0,0 +1,73 @@
+"""
+Startup warm-up and keep-warm steps.
+
+A Warmup is a list of named, blocking steps (resolve collections, open pooled
+connections, embed a probe query, touch the local index). `run()` executes
+them once and records per-step status for the /ready endpoint; `refresh()`
+re-runs the steps marked `keep_warm` so connections and the HF model stay hot
+between bursts of traffic.
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from .metrics import span
+
+
+class Warmup:
+    def __init__(self):
+        self._steps: List[tuple] = []
+        self._lock = threading.Lock()
+        self.results: Dict[str, dict] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.last_refresh: Optional[float] = None
+
+    def step(self, name: str, func: Callable[[], object], keep_warm: bool = False, on_startup: bool = True):
+        self._steps.append((name, func, keep_warm, on_startup))
+
+    def _run_step(self, name: str, func: Callable[[], object]):
+        with span(f"warmup_{name}") as timer:
+            try:
+                detail = func()
+                result = {"ok": True}
+                if detail is not None: result["detail"] = detail
+            except Exception as e:
+                timer.outcome = "error"
+                result = {"ok": False, "error": str(e)[:300]}
+        result["seconds"] = round(timer.elapsed, 3)
+        self.results[name] = result
+        return result
+
+    def run(self) -> Dict[str, dict]:
+        """Runs every step once; failures are recorded, never raised."""
+        with self._lock:
+            self.started_at = time.time()
+            for name, func, _, on_startup in self._steps:
+                if not on_startup: continue
+                result = self._run_step(name, func)
+                status = f"{result['seconds']:.2f}s" if result["ok"] else f"FAILED: {result['error']}"
+                print(f"Warm-up {name}: {status}")
+            self.finished_at = time.time()
+        return self.results
+
+    def refresh(self) -> Dict[str, dict]:
+        """Re-runs the keep-warm steps (skipped while a full run is still in progress)."""
+        if not self._lock.acquire(blocking=False): return {}
+        try:
+            refreshed = {name: self._run_step(name, func) for name, func, keep, _ in self._steps if keep}
+            self.last_refresh = time.time()
+            return refreshed
+        finally:
+            self._lock.release()
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    def status(self) -> dict:
+        failed = sorted(name for name, result in self.results.items() if not result["ok"])
+        status = {"ready": self.done, "degraded": bool(failed), "failed": failed, "steps": self.results}
+        if self.done: status["warmup_seconds"] = round(self.finished_at - self.started_at, 3)
+        if self.last_refresh: status["last_keep_warm"] = round(time.time() - self.last_refresh, 1)
+        return status